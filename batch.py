@@ -0,0 +1,489 @@
+'''
+@Author: Spyros Tsattalios
+
+Command-line batch mode of the Shortest Path Finder.
+
+It loads a map (or generates a random one), runs the Dijkstra and the A* algorithm on many (source, target) queries
+and prints the cost of each path and the time that each algorithm needed. No display is needed.
+
+Examples:
+    python batch.py --rows 100 --columns 100 --obstacle-density 0.2 --queries 1000 --seed 42
+    python batch.py --map my_map.json --queries 5000 --quiet
+    python batch.py --rows 50 --columns 50 --queries 200 --validate
+    python batch.py --map my_map.json --source 0,0 --queries 1000 --trees
+    python batch.py --rows 300 --columns 300 --queries 10000 --workers 8 --quiet
+    python batch.py --maps 1000 --rows 100 --columns 100 --queries 50 --seed 0 --workers 8
+    python batch.py --rows 500 --columns 500 --queries 200 --hpa --cluster-size 20 --quiet
+    python batch.py --rows 200 --columns 200 --queries 100 --compare-heuristics --quiet
+    python batch.py --rows 2000 --columns 2000 --pattern clustered --seed 7 --queries 10 --quiet
+    python batch.py --rows 500 --columns 500 --queries 20 --nearest 50 --quiet
+    python batch.py --rows 300 --columns 300 --source 0,0 --target 299,299 --queries 1000 --cache-size 1024 --quiet
+'''
+
+from engine import GridMap, Solver, NoPathError, ALGORITHMS, BACKENDS, validate
+from heuristics import HEURISTICS, make_heuristic
+import argparse
+import random
+import time
+import sys
+
+
+def random_queries(grid_map, count, seed=None, source=None, target=None):
+    '''
+    This function will create random (source, target) queries between cells that are not obstacles.
+
+    @param grid_map: the map of the queries
+    @param count: the number of queries
+    @param seed: the seed of the random generator
+    @param source: if given, every query starts at this cell
+    @param target: if given, every query ends at this cell
+    @return: a list of (source, target) tuples
+    '''
+
+    rng = random.Random(seed)
+    free_cells = grid_map.free_cells()
+
+    if len(free_cells) < 2:
+        raise ValueError("The map needs at least two cells that are not obstacles")
+
+    if source is not None:
+        return [(source, rng.choice(free_cells)) for _ in range(count)]
+    if target is not None:
+        return [(rng.choice(free_cells), target) for _ in range(count)]
+
+    return [tuple(rng.sample(free_cells, 2)) for _ in range(count)]
+
+
+def run_queries(solver, queries, algorithms=ALGORITHMS):
+    '''
+    This function will run every algorithm on every query.
+
+    @param solver: the Solver of the map
+    @param queries: a list of (source, target) tuples
+    @param algorithms: the algorithms to run
+    @return: a list of (source, target, algorithm, cost, seconds) tuples. The cost is None if there is no path.
+    '''
+
+    results = []
+
+    for source, target in queries:
+        for algorithm in algorithms:
+            start_time = time.perf_counter()
+            try:
+                cost = solver.shortest_path(source, target, algorithm).cost
+            except NoPathError:
+                cost = None
+            results.append((source, target, algorithm, cost, time.perf_counter() - start_time))
+
+    return results
+
+
+def run_tree_queries(solver, queries):
+    '''
+    This function will answer every query from shared shortest path trees (see Solver.solve_pairs).
+
+    @return: a list of (source, target, "dijkstra-tree", cost, seconds) tuples. The time of the searches is spread evenly
+             over the queries, because a tree answers many queries at once.
+    '''
+
+    start_time = time.perf_counter()
+    path_results = solver.solve_pairs(queries)
+    seconds = (time.perf_counter() - start_time) / max(len(queries), 1)
+
+    return [(source, target, "dijkstra-tree", None if result is None else result.cost, seconds) for (source, target), result in zip(queries, path_results)]
+
+
+def run_hierarchical_queries(planner, queries):
+    '''
+    This function will answer every query with HPA* (see hierarchical.py).
+
+    @return: a list of (source, target, "hpa*", cost, seconds) tuples
+    '''
+
+    results = []
+
+    for source, target in queries:
+        start_time = time.perf_counter()
+        try:
+            cost = planner.shortest_path(source, target).cost
+        except NoPathError:
+            cost = None
+        results.append((source, target, "hpa*", cost, time.perf_counter() - start_time))
+
+    return results
+
+
+def optimality_gaps(results, exact_algorithm="dijkstra"):
+    '''
+    @return: the list of the gaps (HPA* cost / exact cost - 1) of the queries that both HPA* and the exact algorithm solved
+    '''
+
+    exact = {(source, target): cost for source, target, algorithm, cost, _ in results if algorithm == exact_algorithm}
+
+    return [cost / exact[(source, target)] - 1 for source, target, algorithm, cost, _ in results
+            if algorithm == "hpa*" and cost is not None and exact.get((source, target))]
+
+
+def compare_heuristics(grid_map, queries, overlay=None, names=HEURISTICS):
+    '''
+    This function will run A* with every heuristic (and Dijkstra as the reference) on every query.
+
+    @return: a dictionary with the preparation time, the mean number of expanded cells, the mean time and the number of
+             non-optimal paths (that must stay 0, every heuristic is admissible) of each heuristic
+    '''
+
+    exact_solver = Solver(grid_map, overlay=overlay)
+    exact = {}
+    expanded = 0
+    for query in queries:
+        try:
+            result = exact_solver.shortest_path(query[0], query[1], "dijkstra")
+            exact[query] = result.cost
+            expanded += result.stats.expanded
+        except NoPathError:
+            exact[query] = None
+
+    comparison = {"dijkstra": {"prepare_seconds": 0.0, "mean_expanded": expanded / max(len(queries), 1), "mean_ms": None, "not_optimal": 0}}
+
+    for name in names:
+        heuristic = make_heuristic(name, grid_map, overlay)
+        start_time = time.perf_counter()
+        heuristic.prepare()
+        prepare_seconds = time.perf_counter() - start_time
+
+        solver = Solver(grid_map, overlay=overlay, heuristic=heuristic)
+        expanded, seconds, not_optimal = 0, 0.0, 0
+        for query in queries:
+            try:
+                result = solver.shortest_path(query[0], query[1], "astar")
+                cost = result.cost
+                expanded += result.stats.expanded
+                seconds += result.stats.seconds
+            except NoPathError:
+                cost = None
+            if cost != exact[query]:
+                not_optimal += 1
+
+        heuristic.close()
+        comparison[name] = {"prepare_seconds": prepare_seconds, "mean_expanded": expanded / max(len(queries), 1), "mean_ms": 1000 * seconds / max(len(queries), 1), "not_optimal": not_optimal}
+
+    return comparison
+
+
+def compare_nearest(solver, queries, count, seed=None, algorithms=ALGORITHMS):
+    '''
+    This function will give the source of every query count random candidate destinations and find the path to the nearest
+    one with a single search (see Solver.nearest_path) and with one search per destination.
+
+    @return: a dictionary with the total time of both ways and the number of queries where their costs differ (that must stay 0)
+             for each algorithm
+    '''
+
+    rng = random.Random(seed)
+    free_cells = solver.grid_map.free_cells()
+    candidates = [rng.sample(free_cells, min(count, len(free_cells))) for _ in queries]
+
+    report = {}
+    for algorithm in algorithms:
+        single_seconds = separate_seconds = 0.0
+        mismatches = 0
+
+        for (source, _), targets in zip(queries, candidates):
+            start_time = time.perf_counter()
+            try:
+                cost = solver.nearest_path([source], targets, algorithm).cost
+            except NoPathError:
+                cost = None
+            single_seconds += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            best = None
+            for target in targets:
+                try:
+                    separate_cost = solver.shortest_path(source, target, algorithm).cost
+                except NoPathError:
+                    continue
+                if best is None or separate_cost < best:
+                    best = separate_cost
+            separate_seconds += time.perf_counter() - start_time
+
+            mismatches += cost != best
+
+        report[algorithm] = {"single_seconds": single_seconds, "separate_seconds": separate_seconds, "mismatches": mismatches}
+
+    return report
+
+
+def summarize(results, algorithms=ALGORITHMS):
+    '''
+    @return: a dictionary with the number of queries, the number of queries without a path and the total / mean time of each algorithm
+    '''
+
+    summary = {}
+
+    for algorithm in algorithms:
+        times = [seconds for _, _, name, _, seconds in results if name == algorithm]
+        summary[algorithm] = {
+            "queries": len(times),
+            "no_path": sum(1 for _, _, name, cost, _ in results if name == algorithm and cost is None),
+            "total_seconds": sum(times),
+            "mean_ms": 1000 * sum(times) / len(times) if times else 0.0
+        }
+
+    return summary
+
+
+def parse_cell(text):
+    row, column = text.split(",")
+    return (int(row), int(column))
+
+
+def add_random_influence_areas(grid_map, count, seed=None, radius=None, falloff=None):
+    '''
+    This function will add count random areas of attraction/repulsion (half of each) to the map. A new radius or falloff
+    also applies to the areas that the map already has.
+
+    @return: the number of cells of the overlay
+    '''
+
+    overlay = grid_map.overlay
+    if (radius is not None and radius != overlay.radius) or (falloff is not None and falloff != overlay.falloff):
+        overlay.rebuild(radius, falloff)
+
+    # the centres are random cells that are not obstacles
+    rng = random.Random(seed)
+    size = grid_map.rows * grid_map.columns
+    cells = []
+    while len(cells) < count and len(grid_map.obstacles) < size:
+        index = rng.randrange(size)
+        if not grid_map.blocked[index]:
+            cells.append(divmod(index, grid_map.columns))
+
+    overlay.add_influence_areas(cells[:count // 2], attraction=True)
+    overlay.add_influence_areas(cells[count // 2:], attraction=False)
+
+    return len(overlay.weights)
+
+
+def export_first_path(solver, query, algorithm, file_name):
+    '''
+    This function will search the query again and stream its path to the file (see paths.py).
+    '''
+
+    from paths import EncodedPath, export_path
+
+    source, target = query
+    try:
+        result = solver.shortest_path(source, target, algorithm)
+    except NoPathError:
+        print(f"Path export: there is no path from {source} to {target}", file=sys.stderr)
+        return
+
+    encoded = EncodedPath.from_cells(result.path)
+    export_path(encoded, file_name, {"algorithm": algorithm, "cost": result.cost})
+    print(f"Path export: {len(encoded)} cells ({len(encoded.runs)} runs of moves) written to {file_name}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Solve shortest path queries on a map without the GUI.")
+
+    parser.add_argument("--map", help="load the map from this file instead of generating a random one")
+    parser.add_argument("--save-map", help="save the (loaded or generated) map to this file")
+    parser.add_argument("--rows", type=int, default=15, help="number of rows of a generated map")
+    parser.add_argument("--columns", type=int, default=15, help="number of columns of a generated map")
+    parser.add_argument("--obstacle-density", type=float, default=0.1, help="fraction of the cells of a generated map that are obstacles")
+    parser.add_argument("--obstacle-mask", help="add the obstacles of this mask file (see editing.py) to the map")
+    parser.add_argument("--pattern", choices=("uniform", "clustered"), default=None, help="generate the terrain with NumPy (see terrain.py) instead of the random module, with independent cells or with regions")
+    parser.add_argument("--feature-size", type=float, default=16.0, help="size of the regions of the clustered pattern (cells)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the map generation and of the random queries")
+    parser.add_argument("--queries", type=int, default=100, help="number of random queries")
+    parser.add_argument("--source", type=parse_cell, help="start every query at this cell, given as row,column (a single query if --target is given too)")
+    parser.add_argument("--target", type=parse_cell, help="end every query at this cell, given as row,column (a single query if --source is given too)")
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS), help="algorithms to run")
+    parser.add_argument("--backend", choices=BACKENDS, default="grid", help="search the grid directly or build a networkx graph")
+    parser.add_argument("--trees", action="store_true", help="also answer the queries from shortest path trees shared by the queries with the same source (or target), always on the grid backend")
+    parser.add_argument("--influence-areas", type=int, default=0, help="add this many random areas of attraction/repulsion (half of each) to the map, in one vectorised pass")
+    parser.add_argument("--influence-radius", type=int, default=None, help="radius of the areas of attraction/repulsion (defaults to the radius of the map)")
+    parser.add_argument("--influence-falloff", choices=("constant", "linear", "gaussian"), default=None, help="falloff of the areas of attraction/repulsion (defaults to the falloff of the map)")
+    parser.add_argument("--base-weights", action="store_true", help="ignore the areas of attraction/repulsion of the map")
+    parser.add_argument("--hpa", action="store_true", help="also answer the queries with hierarchical pathfinding (HPA*) and report its gap against Dijkstra")
+    parser.add_argument("--cluster-size", type=int, default=16, help="size of the HPA* clusters (cells per side)")
+    parser.add_argument("--corridor", type=int, default=1, help="how many clusters around the HPA* path its smoothing may search (-1 to not smooth the paths)")
+    parser.add_argument("--compare-heuristics", action="store_true", help="also run A* with every heuristic of heuristics.py and report the expanded cells side by side")
+    parser.add_argument("--nearest", type=int, default=None, help="give the source of every query this many random destinations and compare one search to the nearest of them with one search per destination")
+    parser.add_argument("--cache-size", type=int, default=0, help="keep the results of this many queries in an LRU path cache (see pathcache.py), so repeated queries need no search")
+    parser.add_argument("--validate", action="store_true", help="also run every query with networkx and report the queries where the results differ")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes (more than 1 spreads the queries or the maps over a process pool)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="number of queries (or maps with --maps) that a process receives at a time")
+    parser.add_argument("--maps", type=int, default=None, help="solve this many generated maps (with the seeds --seed, --seed + 1, ...) and print one summary per map")
+    parser.add_argument("--quiet", action="store_true", help="print only the summary")
+    parser.add_argument("--export-path", help="write the path of the first query (with the first algorithm) to this .csv, .json or .geojson file")
+
+    return parser
+
+
+def run_maps(args):
+    '''
+    This function will solve --maps generated maps, in parallel when --workers is more than 1.
+    '''
+
+    import parallel
+
+    first_seed = args.seed if args.seed is not None else 0
+    scenarios = [(args.rows, args.columns, args.obstacle_density, first_seed + number, args.queries, tuple(args.algorithms)) for number in range(args.maps)]
+
+    start_time = time.perf_counter()
+    if args.workers > 1:
+        results = parallel.solve_scenarios(scenarios, args.workers, max(1, args.chunk_size // max(args.queries, 1)))
+    else:
+        results = [parallel.solve_scenario(scenario) for scenario in scenarios]
+    seconds = time.perf_counter() - start_time
+
+    if not args.quiet:
+        print("seed\talgorithm\tqueries\tno_path\tmean_ms")
+        for result in results:
+            for algorithm, stats in result["summary"].items():
+                print(f"{result['seed']}\t{algorithm}\t{stats['queries']}\t{stats['no_path']}\t{stats['mean_ms']:.3f}")
+
+    print(f"{len(results)} maps of {args.rows}x{args.columns} with {args.queries} queries each in {seconds:.3f} s ({args.workers} workers)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not args.map and (args.rows < 1 or args.columns < 1 or args.rows * args.columns < 2):
+        parser.error("the map must have at least one row, one column and two cells (e.g. 1x2)")
+
+    if args.maps is not None:
+        # a map whose obstacles leave fewer than two free cells cannot have queries
+        try:
+            run_maps(args)
+        except ValueError as error:
+            parser.error(str(error))
+        return
+
+    start_time = time.perf_counter()
+    if args.map:
+        try:
+            grid_map = GridMap.load(args.map)
+        except (OSError, ValueError) as error:
+            parser.error(f"the map {args.map} could not be loaded: {error}")
+    elif args.pattern is not None:
+        from terrain import generate_map
+        grid_map = generate_map(args.rows, args.columns, pattern=args.pattern, obstacle_density=args.obstacle_density, seed=args.seed, feature_size=args.feature_size)
+    else:
+        grid_map = GridMap.generate(args.rows, args.columns, obstacle_density=args.obstacle_density, seed=args.seed)
+    map_seconds = time.perf_counter() - start_time
+
+    if args.obstacle_mask:
+        from editing import load_mask
+        start_time = time.perf_counter()
+        added = grid_map.add_obstacles(load_mask(args.obstacle_mask, grid_map.rows, grid_map.columns))
+        print(f"Obstacle mask: {len(added)} new obstacles ({1000 * (time.perf_counter() - start_time):.1f} ms)", file=sys.stderr)
+
+    if args.influence_areas or args.influence_radius is not None or args.influence_falloff is not None:
+        start_time = time.perf_counter()
+        changed = add_random_influence_areas(grid_map, args.influence_areas, args.seed, args.influence_radius, args.influence_falloff)
+        print(f"Areas of attraction/repulsion: {len(grid_map.attraction_areas)} + {len(grid_map.repulsion_areas)} with radius {grid_map.overlay.radius} ({grid_map.overlay.falloff}), {changed} cells changed ({1000 * (time.perf_counter() - start_time):.1f} ms)", file=sys.stderr)
+
+    if args.save_map:
+        grid_map.save(args.save_map)
+
+    overlay = None if args.base_weights else grid_map.overlay
+
+    cache = None
+    if args.cache_size > 0:
+        from pathcache import PathCache
+        cache = PathCache(grid_map, max_entries=args.cache_size)
+
+    start_time = time.perf_counter()
+    solver = Solver(grid_map, backend=args.backend, overlay=overlay, cache=cache)
+    solver_seconds = time.perf_counter() - start_time
+
+    if args.source is not None and args.target is not None:
+        queries = [(args.source, args.target)] * (args.queries if cache is not None else 1)
+    else:
+        try:
+            queries = random_queries(grid_map, args.queries, args.seed, args.source, args.target)
+        except ValueError as error:
+            parser.error(str(error))
+
+    start_time = time.perf_counter()
+    worker_cache_stats = {}
+    if args.workers > 1:
+        # every worker builds its own solver with the same backend and its own cache of the same size
+        import parallel
+        results = parallel.solve_queries(grid_map, queries, args.algorithms, args.workers, args.chunk_size, use_overlay=not args.base_weights, backend=args.backend, cache_size=args.cache_size, cache_stats=worker_cache_stats)
+    else:
+        results = run_queries(solver, queries, args.algorithms)
+    queries_seconds = time.perf_counter() - start_time
+
+    summary_algorithms = list(args.algorithms)
+    if args.trees:
+        # the trees are searched on the grid arrays, whatever the backend of the other queries
+        tree_solver = solver if args.backend == "grid" else Solver(grid_map, overlay=overlay, cache=cache)
+        results += run_tree_queries(tree_solver, queries)
+        summary_algorithms.append("dijkstra-tree")
+
+    if args.hpa:
+        from hierarchical import HierarchicalPlanner
+        start_time = time.perf_counter()
+        planner = HierarchicalPlanner(grid_map, args.cluster_size, overlay, None if args.corridor < 0 else args.corridor)
+        hpa_seconds = time.perf_counter() - start_time
+        results += run_hierarchical_queries(planner, queries)
+        summary_algorithms.append("hpa*")
+
+    if not args.quiet:
+        print("source\ttarget\talgorithm\tcost\tms")
+        for source, target, algorithm, cost, seconds in results:
+            print(f"{source}\t{target}\t{algorithm}\t{'-' if cost is None else cost}\t{1000 * seconds:.3f}")
+
+    print(f"Map: {grid_map.rows}x{grid_map.columns}, {len(grid_map.obstacles)} obstacles ({1000 * map_seconds:.1f} ms)", file=sys.stderr)
+    print(f"Solver setup: {1000 * solver_seconds:.1f} ms", file=sys.stderr)
+    print(f"Queries: {queries_seconds:.3f} s wall time ({args.workers} workers)", file=sys.stderr)
+    for algorithm, stats in summarize(results, summary_algorithms).items():
+        print(f"{algorithm}: {stats['queries']} queries, {stats['no_path']} without a path, {stats['total_seconds']:.3f} s total, {stats['mean_ms']:.3f} ms per query", file=sys.stderr)
+
+    if worker_cache_stats:
+        lookups = worker_cache_stats["hits"] + worker_cache_stats["misses"]
+        print(f"Path cache ({args.workers} workers, one cache each): {worker_cache_stats['hits']} hits, {worker_cache_stats['misses']} misses ({100 * worker_cache_stats['hits'] / max(lookups, 1):.1f}% hit rate), {worker_cache_stats['evictions']} evictions", file=sys.stderr)
+    elif cache is not None:
+        cache_stats = cache.stats()
+        print(f"Path cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({100 * cache_stats['hit_rate']:.1f}% hit rate), {cache_stats['entries']} entries, {cache_stats['evictions']} evictions", file=sys.stderr)
+
+    if args.hpa:
+        print(f"HPA* abstract graph: {args.cluster_size}x{args.cluster_size} clusters, built in {hpa_seconds:.3f} s", file=sys.stderr)
+        gaps = optimality_gaps(results)
+        if gaps:
+            print(f"HPA* gap against Dijkstra: {100 * sum(gaps) / len(gaps):.2f}% mean, {100 * max(gaps):.2f}% max, {sum(1 for gap in gaps if gap == 0)} of {len(gaps)} paths optimal", file=sys.stderr)
+        else:
+            print("HPA* gap against Dijkstra: run Dijkstra too (--algorithms dijkstra) to measure it", file=sys.stderr)
+
+    if args.compare_heuristics:
+        print(f"{'heuristic':<10} {'prepare (s)':>12} {'expanded':>10} {'ms':>10} {'not optimal':>12}", file=sys.stderr)
+        for name, stats in compare_heuristics(grid_map, queries, overlay).items():
+            mean_ms = "-" if stats["mean_ms"] is None else f"{stats['mean_ms']:.3f}"
+            print(f"{name:<10} {stats['prepare_seconds']:>12.3f} {stats['mean_expanded']:>10.1f} {mean_ms:>10} {stats['not_optimal']:>12}", file=sys.stderr)
+
+    if args.nearest:
+        if args.backend != "grid":
+            print("Nearest destination queries need the grid backend", file=sys.stderr)
+            sys.exit(2)
+        for algorithm, stats in compare_nearest(solver, queries, args.nearest, args.seed, args.algorithms).items():
+            print(f"Nearest of {args.nearest} destinations ({algorithm}): {stats['single_seconds']:.3f} s with one search per query, {stats['separate_seconds']:.3f} s with one search per destination, {stats['mismatches']} cost mismatches", file=sys.stderr)
+
+    if args.export_path and queries:
+        export_first_path(solver, queries[0], args.algorithms[0], args.export_path)
+
+    if args.validate:
+        mismatches = validate(grid_map, queries, args.algorithms, overlay)
+        for source, target, algorithm, grid_result, networkx_result in mismatches:
+            print(f"Mismatch {source} -> {target} ({algorithm}): grid {grid_result}, networkx {networkx_result}", file=sys.stderr)
+        print(f"Validation: {len(mismatches)} mismatches in {len(queries) * len(args.algorithms)} searches", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+'''
+@Author: Spyros Tsattalios
+
+Benchmarks of the map generation, the graph construction and every search algorithm.
+
+For every map size and obstacle density, a seeded map is generated and every phase is measured:
+    - "generate": GridMap.generate
+    - "generate numpy" / "generate clustered": terrain.generate_map with the uniform / clustered pattern
+    - "cost field": CostOverlay.add_influence_areas with 1000 areas of attraction / repulsion of radius 3
+    - "build graph": GridMap.to_graph (the networkx graph that the GUI used to build)
+    - "networkx dijkstra" / "networkx astar": nx.shortest_path(method='dijkstra') / nx.astar_path on that graph
+    - "grid dijkstra" / "grid astar": the searches of search.py on the arrays of the map
+
+Every phase is run --repeat times and reports its best wall time (with the median and the worst time as its spread), its
+peak memory (with tracemalloc, in a separate run so that tracing does not slow down the timed runs) and, for the searches,
+the number of expanded nodes. The results are saved as JSON, so that a later run can be compared with them (--compare) to
+find regressions between versions: a phase regressed if its best time is more than --threshold slower than the best time
+of the baseline, and slower by at least --min-ms.
+
+Examples:
+    python benchmark.py
+    python benchmark.py --sizes 100 500 --densities 0.1 0.3 --queries 10 --output benchmark_results/after.json
+    python benchmark.py --compare benchmark_results/before.json --fail-on-regression
+'''
+
+from engine import GridMap, Solver, heuristic
+from terrain import generate_map
+import networkx as nx
+import subprocess
+import statistics
+import tracemalloc
+import argparse
+import platform
+import random
+import time
+import json
+import sys
+import os
+
+
+# the number and the radius of the areas of attraction / repulsion of the "cost field" phase
+INFLUENCE_AREAS = 1000
+INFLUENCE_RADIUS = 3
+
+
+def traced(function, *args):
+    '''
+    @return: the result of the function and the peak of the memory that Python allocated while it was running (in bytes)
+    '''
+
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, peak
+
+
+def timed(function, *args, repeat=1):
+    '''
+    @param repeat: the number of runs of the function (the first run also warms up the caches and the lazy imports)
+    @return: the result of the last run of the function and the list of the wall times of the runs in seconds
+    '''
+
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start_time)
+
+    return result, times
+
+
+def summary(times):
+    '''
+    @return: the {"seconds", "median_seconds", "max_seconds"} of a list of wall times, seconds being the best time
+    '''
+
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "max_seconds": max(times)}
+
+
+def counting_weight(expanded):
+    '''
+    @return: a networkx weight function that records every node whose edges are scanned, i.e. every expanded node
+    '''
+
+    def weight(u, v, data):
+        expanded.add(u)
+        return data["weight"]
+
+    return weight
+
+
+def benchmark_map(rows, columns, density, seed, queries_count, use_networkx, measure_memory, repeat=1):
+    '''
+    @param repeat: the number of timed runs of every phase (of every query for the searches)
+    @return: a list of result dictionaries, one per phase
+    '''
+
+    results = []
+
+    def record(phase, times, peak, expanded=None, runs=1):
+        results.append({
+            "size": f"{rows}x{columns}",
+            "density": density,
+            "phase": phase,
+            "runs": runs,
+            "repeat": repeat,
+            **summary(times),
+            "peak_bytes": peak,
+            "expanded": expanded
+        })
+
+    # Map generation
+    grid_map, times = timed(GridMap.generate, rows, columns, None, density, seed, repeat=repeat)
+    peak = traced(GridMap.generate, rows, columns, None, density, seed)[1] if measure_memory else None
+    record("generate", times, peak)
+
+    for phase, pattern in (("generate numpy", "uniform"), ("generate clustered", "clustered")):
+        times = timed(generate_map, rows, columns, None, None, pattern, density, seed, repeat=repeat)[1]
+        peak = traced(generate_map, rows, columns, None, None, pattern, density, seed)[1] if measure_memory else None
+        record(phase, times, peak)
+
+    rng = random.Random(seed)
+    free_cells = grid_map.free_cells()
+    queries = [tuple(rng.sample(free_cells, 2)) for _ in range(queries_count)]
+
+    # The cost field of many areas of attraction / repulsion, applied to a new overlay every run
+    centres = [rng.choice(free_cells) for _ in range(INFLUENCE_AREAS)] if free_cells else []
+
+    def cost_field():
+        overlay = grid_map.new_overlay()
+        overlay.radius = INFLUENCE_RADIUS
+        overlay.add_influence_areas(centres[:len(centres) // 2], attraction=True)
+        overlay.add_influence_areas(centres[len(centres) // 2:], attraction=False)
+
+    times = timed(cost_field, repeat=repeat)[1]
+    peak = traced(cost_field)[1] if measure_memory else None
+    record("cost field", times, peak)
+
+    # The searches on the arrays of the map. Every run times all the queries, so its time is the mean time of a query
+    solver = Solver(grid_map)
+    for algorithm, search in (("dijkstra", solver.search.bidirectional_dijkstra), ("astar", solver.search.astar)):
+        arguments = [(grid_map.index(source), grid_map.index(target)) for source, target in queries]
+        times = [seconds / len(queries) for seconds in timed(lambda: [search(*query) for query in arguments], repeat=repeat)[1]]
+
+        peak, expanded = 0, 0
+        for query in arguments:
+            search(*query)
+            expanded += solver.search.stats.expanded
+            if measure_memory:
+                peak = max(peak, traced(search, *query)[1])
+        record(f"grid {algorithm}", times, peak if measure_memory else None, expanded / len(queries), len(queries))
+
+    if not use_networkx:
+        return results
+
+    # The networkx graph and the networkx searches
+    graph, times = timed(grid_map.to_graph, repeat=repeat)
+    peak = traced(grid_map.to_graph)[1] if measure_memory else None
+    record("build graph", times, peak)
+
+    searches = (
+        ("dijkstra", lambda source, target, weight: nx.shortest_path(graph, source, target, weight=weight, method="dijkstra")),
+        ("astar", lambda source, target, weight: nx.astar_path(graph, source, target, heuristic=heuristic, weight=weight))
+    )
+
+    for algorithm, search in searches:
+        # the queries without a path are left out of the timed runs
+        paths, peak, expanded = [], 0, 0
+        for source, target in queries:
+            try:
+                expanded_nodes = set()
+                search(source, target, counting_weight(expanded_nodes))
+                expanded += len(expanded_nodes)
+                paths.append((source, target))
+                if measure_memory:
+                    peak = max(peak, traced(search, source, target, "weight")[1])
+            except nx.NetworkXNoPath:
+                pass
+
+        times = [seconds / len(queries) for seconds in timed(lambda: [search(source, target, "weight") for source, target in paths], repeat=repeat)[1]]
+        record(f"networkx {algorithm}", times, peak if measure_memory else None, expanded / len(queries), len(queries))
+
+    return results
+
+
+def version_label():
+    '''
+    @return: the current git commit (or "unknown" outside a git checkout)
+    '''
+
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, threshold, min_seconds=0.0):
+    '''
+    This function will print the best time of every phase next to the best time of the same phase in the baseline.
+
+    @param min_seconds: a phase must also be slower than the baseline by at least this many seconds to count as a regression
+    @return: the list of (size, density, phase, ratio) of the phases that are slower than the baseline by more than the threshold
+    '''
+
+    old = {(result["size"], result["density"], result["phase"]): result for result in baseline["results"]}
+    regressions = []
+
+    print(f"\nComparison with {baseline['version']} ({baseline['date']}):")
+    for result in results:
+        key = (result["size"], result["density"], result["phase"])
+        if key not in old or not old[key]["seconds"]:
+            continue
+        ratio = result["seconds"] / old[key]["seconds"]
+        flag = ""
+        if ratio > 1 + threshold and result["seconds"] - old[key]["seconds"] >= min_seconds:
+            regressions.append(key + (ratio,))
+            flag = "  <-- regression"
+        print(f"{key[0]:>11} {key[1]:>6} {key[2]:<18} {1000 * old[key]['seconds']:>12.3f} ms -> {1000 * result['seconds']:>12.3f} ms (worst {1000 * result.get('max_seconds', result['seconds']):.3f} ms)  x{ratio:.2f}{flag}")
+
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the map generation, the graph construction and the search algorithms.")
+
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15, 100, 500, 2000], help="map sizes (N for an NxN map)")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.0, 0.1, 0.3], help="obstacle densities")
+    parser.add_argument("--queries", type=int, default=5, help="number of random queries per map")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs of every phase, the best time is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the maps and of the queries")
+    parser.add_argument("--networkx-max-size", type=int, default=500, help="skip the networkx phases for maps larger than NxN")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory (faster)")
+    parser.add_argument("--output", default=None, help="where to save the results (defaults to benchmark_results/<version>.json)")
+    parser.add_argument("--compare", default=None, help="a saved result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown of the best time that counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.1, help="a regression must also be slower than the baseline by at least this many milliseconds")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if a phase regressed")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = []
+
+    print(f"{'size':>11} {'density':>7} {'phase':<18} {'best (ms)':>12} {'median (ms)':>12} {'peak (KiB)':>12} {'expanded':>10}")
+    for size in args.sizes:
+        for density in args.densities:
+            use_networkx = size <= args.networkx_max_size
+            for result in benchmark_map(size, size, density, args.seed, args.queries, use_networkx, not args.no_memory, max(1, args.repeat)):
+                results.append(result)
+                peak = "-" if result["peak_bytes"] is None else f"{result['peak_bytes'] / 1024:.1f}"
+                expanded = "-" if result["expanded"] is None else f"{result['expanded']:.0f}"
+                print(f"{result['size']:>11} {result['density']:>7} {result['phase']:<18} {1000 * result['seconds']:>12.3f} {1000 * result['median_seconds']:>12.3f} {peak:>12} {expanded:>10}")
+            sys.stdout.flush()
+
+    report = {
+        "version": version_label(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "networkx": nx.__version__,
+        "platform": platform.platform(),
+        "arguments": vars(args),
+        "results": results
+    }
+
+    output = args.output or os.path.join("benchmark_results", f"{report['version']}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_ms / 1000)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
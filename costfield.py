@@ -0,0 +1,183 @@
+'''
+@Author: Spyros Tsattalios
+
+Vectorised cost fields of the areas of attraction / repulsion.
+
+An area of influence multiplies the weight of every cell within its radius (Manhattan distance) by
+    1 + (multiplier - 1) * falloff(distance)
+where multiplier is the multiplier of its centre (e.g. 0.5 for attraction, 2 for repulsion) and falloff goes from 1 at the
+centre to 0 beyond the radius:
+    - "constant": 1 everywhere within the radius
+    - "linear": 1 - distance / (radius + 1), so with radius 1 the neighbours get half the change of the centre
+    - "gaussian": exp(-distance^2 / (2 sigma^2)) with sigma = (radius + 1) / 2
+
+The areas combine by multiplying their factors, so the field is the sum of the logarithms of the factors and the whole
+field of any number of areas is one convolution of the counts of the centres with the log kernel:
+    - a few areas (the kernel cells of all the areas cover less than a quarter of the map): the kernel offsets are added to
+      every centre at once and the contributions of the same cell are summed with np.bincount, so the work depends on the
+      areas, not on the size of the map
+    - many areas: the centres and the kernel are convolved with the FFT, in time O(n log n) in the size of the map
+'''
+
+import numpy as np
+
+
+FALLOFFS = ("constant", "linear", "gaussian")
+
+# the fraction of the map that the kernel cells of the areas may cover before the FFT convolution is used
+DENSE_FRACTION = 0.25
+
+# a field value smaller than this is FFT noise, not a change
+EPSILON = 1e-9
+
+
+def falloff_weights(distances, radius, falloff):
+    '''
+    @param distances: an array of Manhattan distances from the centre
+    @return: the falloff of each distance, between 0 and 1
+    '''
+
+    distances = np.asarray(distances, dtype=np.float64)
+
+    if falloff == "constant":
+        weights = np.ones_like(distances)
+    elif falloff == "linear":
+        weights = 1 - distances / (radius + 1)
+    elif falloff == "gaussian":
+        sigma = (radius + 1) / 2
+        weights = np.exp(-0.5 * (distances / sigma) ** 2)
+    else:
+        raise ValueError(f"Unknown falloff {falloff!r}, expected one of {FALLOFFS}")
+
+    weights[distances > radius] = 0
+    return weights
+
+
+def log_kernel(radius, falloff, multiplier):
+    '''
+    @return: the (row offsets, column offsets, log factors) of the cells that an area changes, relative to its centre
+    @raise ValueError: if the radius is negative, the falloff is unknown or the multiplier is not positive
+    '''
+
+    if radius < 0 or int(radius) != radius:
+        raise ValueError("The radius of an area of influence must be a non-negative integer")
+    if multiplier <= 0:
+        raise ValueError("The multiplier of an area of influence must be positive")
+
+    radius = int(radius)
+    row_offsets, column_offsets = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    distances = np.abs(row_offsets) + np.abs(column_offsets)
+    inside = distances <= radius
+
+    factors = 1 + (multiplier - 1) * falloff_weights(distances[inside], radius, falloff)
+    logs = np.log(factors)
+    changed = logs != 0
+
+    return row_offsets[inside][changed], column_offsets[inside][changed], logs[changed]
+
+
+def influence_field(rows, columns, groups, radius=1, falloff="linear"):
+    '''
+    This function will compute the combined field of areas of influence.
+
+    @param groups: a list of (centres, multiplier) tuples, centres being an array of the flat indices of the centres of
+                   the areas with that multiplier (a centre can appear more than once)
+    @return: the (indices, log factors) of the cells that the areas change, as numpy arrays
+    '''
+
+    kernels = [(np.asarray(centres, dtype=np.int64), log_kernel(radius, falloff, multiplier)) for centres, multiplier in groups]
+    kernels = [(centres, kernel) for centres, kernel in kernels if len(centres) and len(kernel[2])]
+
+    if not kernels:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    footprint = sum(len(centres) * len(kernel[2]) for centres, kernel in kernels)
+
+    if footprint <= DENSE_FRACTION * rows * columns:
+        # Let's add the kernel offsets to every centre and sum the contributions of each cell
+        all_indices, all_logs = [], []
+        for centres, (row_offsets, column_offsets, logs) in kernels:
+            cell_rows = centres[:, None] // columns + row_offsets
+            cell_columns = centres[:, None] % columns + column_offsets
+            inside = (cell_rows >= 0) & (cell_rows < rows) & (cell_columns >= 0) & (cell_columns < columns)
+            all_indices.append((cell_rows * columns + cell_columns)[inside])
+            all_logs.append(np.broadcast_to(logs, inside.shape)[inside])
+
+        indices, inverse = np.unique(np.concatenate(all_indices), return_inverse=True)
+        field = np.bincount(inverse.ravel(), weights=np.concatenate(all_logs), minlength=len(indices))
+
+    else:
+        # Let's convolve the counts of the centres with the kernel of each group. The arrays are padded by the radius, so
+        # the convolution does not wrap around the edges of the map
+        shape = (rows + 2 * radius, columns + 2 * radius)
+        spectrum = np.zeros((shape[0], shape[1] // 2 + 1), dtype=np.complex128)
+
+        for centres, (row_offsets, column_offsets, logs) in kernels:
+            counts = np.bincount(centres, minlength=rows * columns).reshape(rows, columns).astype(np.float64)
+            kernel = np.zeros((2 * radius + 1, 2 * radius + 1))
+            kernel[row_offsets + radius, column_offsets + radius] = logs
+            spectrum += np.fft.rfft2(counts, shape) * np.fft.rfft2(kernel, shape)
+
+        field = np.fft.irfft2(spectrum, shape)[radius:radius + rows, radius:radius + columns].ravel()
+        indices = np.flatnonzero(np.abs(field) > EPSILON)
+        field = field[indices]
+
+    changed = field != 0
+    return indices[changed], field[changed]
+
+
+def base_weights(overlay, indices):
+    '''
+    @return: the base weights of the cells (without the overlay) as a float64 array
+    '''
+
+    grid_map_weights = overlay.grid_map.weights
+
+    # a few cells are looked up one by one, many cells with one conversion of the whole weights array
+    if len(indices) * 8 < len(grid_map_weights):
+        return np.array([grid_map_weights[index] for index in indices.tolist()], dtype=np.float64)
+
+    return np.array(grid_map_weights, dtype=np.float64)[indices]
+
+
+def area_logs(overlay, groups):
+    '''
+    @param groups: see influence_field (the centres are (row, column) cells here)
+    @return: the (indices, log factors) of the free cells that the areas change, as numpy arrays
+    '''
+
+    grid_map = overlay.grid_map
+    columns = grid_map.columns
+
+    groups = [(np.fromiter((row * columns + column for row, column in centres), dtype=np.int64, count=len(centres)), multiplier) for centres, multiplier in groups]
+    indices, logs = influence_field(grid_map.rows, columns, groups, overlay.radius, overlay.falloff)
+
+    free = np.frombuffer(grid_map.blocked, dtype=np.uint8)[indices] == 0
+    return indices[free], logs[free]
+
+
+def apply_influence(overlay, groups):
+    '''
+    This function will add the fields of areas of influence to the field of an overlay and compute the new weights of the
+    cells that they change. Obstacles are not changed and no weight drops below 1.
+
+    The overlay keeps the sum of the log factors of all its areas for every cell (overlay.logs), and the weight of a cell
+    is always its base weight times the exponential of that sum, floored once. So the weights only depend on the set of
+    areas: adding them one by one gives the same weights as adding them all at once (see CostOverlay.rebuild).
+
+    @param overlay: the CostOverlay, whose radius and falloff are used
+    @param groups: see influence_field (the centres are (row, column) cells here)
+    @return: the lists of the (indices, new weights) of the changed cells
+    '''
+
+    indices, logs = area_logs(overlay, groups)
+
+    accumulated = overlay.logs
+    for index, log in zip(indices.tolist(), logs.tolist()):
+        accumulated[index] = accumulated.get(index, 0.0) + log
+    totals = np.fromiter((accumulated[index] for index in indices.tolist()), dtype=np.float64, count=len(indices))
+
+    # the small epsilon keeps e.g. 3 * 0.5 * 2 at 3 when exp(log) is a hair below the exact product
+    weights = np.maximum(np.floor(base_weights(overlay, indices) * np.exp(totals) + 1e-6), 1).astype(np.int64)
+
+    return indices.tolist(), weights.tolist()
@@ -0,0 +1,279 @@
+'''
+@Author: Spyros Tsattalios
+
+The cost-to-go field: the cost of the cheapest path from every cell of the map to the destination.
+
+One reverse Dijkstra from the destination (or from several destinations at once, each with distance 0) gives the
+distance of every cell and the next cell of its path. After that a "cost and path from here" query is a walk along the
+next cells, in time O(path length), with no new search.
+
+The field listens to the map like the planners do. When a cell becomes an obstacle or more expensive, only the cells whose
+path goes through it (its subtree in the tree of the field) lose their distance; they are given the best distance through
+their neighbours outside the subtree and a Dijkstra that starts from them repairs the subtree. When a cell becomes cheaper,
+a Dijkstra that starts from its neighbours only visits the cells that get a cheaper path. The rest of the field is not
+touched.
+'''
+
+from engine import PathResult, NoPathError
+from search import GridSearch, INF
+from heapq import heappush, heappop, heapify
+
+
+class DistanceField(object):
+
+    '''
+    The reverse shortest path tree of one or more destinations of a GridMap.
+
+    distance[v] is the sum of the weights of the cells after v on its cheapest path, up to and including the destination
+    (like GridSearch.shortest_path_tree with reverse=True) and next_cell[v] is the cell after v on that path (-1 for the
+    destinations and for the cells that cannot reach any destination).
+    '''
+
+    def __init__(self, grid_map, targets=None, overlay=None):
+
+        self.grid_map = grid_map
+        self.overlay = overlay
+        self.columns = grid_map.columns
+
+        if targets is None:
+            targets = [grid_map.end_point]
+        self.targets = [grid_map.index(cell) for cell in targets]
+
+        # GridSearch gives us the neighbours of a cell on the obstacle bitmap of the map
+        self.grid = GridSearch(grid_map.weights, grid_map.blocked, grid_map.rows, grid_map.columns)
+
+        size = grid_map.rows * grid_map.columns
+        self.distance = [INF] * size
+        self.next_cell = [-1] * size
+
+        self.changed_cells = set()  # the cells that changed since the last update
+        self.expanded = 0  # the number of cells that the last computation or repair expanded
+
+        self.compute()
+
+        grid_map.add_listener(self)
+        if overlay is not None:
+            overlay.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map.
+        '''
+
+        self.grid_map.remove_listener(self)
+        if self.overlay is not None:
+            self.overlay.remove_listener(self)
+
+
+    def obstacle_added(self, cell):
+        self.changed_cells.add(self.grid_map.index(cell))
+
+
+    def obstacles_added(self, cells):
+        index = self.grid_map.index
+        self.changed_cells.update(index(cell) for cell in cells)
+
+
+    def weight_changed(self, cell, weight):
+        self.changed_cells.add(self.grid_map.index(cell))
+
+
+    def weight(self, index):
+        if self.overlay is not None and index in self.overlay.weights:
+            return self.overlay.weights[index]
+        return self.grid_map.weights[index]
+
+
+    def compute(self):
+        '''
+        This function will compute the whole field with one Dijkstra from all the destinations.
+        '''
+
+        size = len(self.distance)
+        distance = self.distance = [INF] * size
+        self.next_cell = [-1] * size
+        blocked = self.grid_map.blocked
+
+        heap = []
+        for target in self.targets:
+            if not blocked[target] and distance[target] != 0:
+                distance[target] = 0
+                heap.append((0, target))
+
+        self.changed_cells = set()
+        self.expanded = self.propagate(heap)
+
+
+    def propagate(self, heap, old_distance=None):
+        '''
+        Dijkstra on the reverse edges: the edge u -> v costs the weight of v, so every neighbour u of a settled cell v can
+        reach the destination through v for distance[v] + weight(v).
+
+        @param heap: (distance, cell) entries of the cells whose distance was lowered and whose neighbours must be updated
+        @param old_distance: if given, the distance that every lowered cell had before is added to it (once per cell)
+        @return: the number of expanded cells
+        '''
+
+        distance, next_cell = self.distance, self.next_cell
+        neighbours, weight = self.grid.neighbours, self.weight
+        expanded = 0
+
+        heapify(heap)
+        while heap:
+            d, v = heappop(heap)
+            if d > distance[v]:
+                continue  # a stale entry
+            expanded += 1
+
+            new_distance = d + weight(v)
+            for u in neighbours(v):
+                if new_distance < distance[u]:
+                    if old_distance is not None and u not in old_distance:
+                        old_distance[u] = distance[u]
+                    distance[u] = new_distance
+                    next_cell[u] = v
+                    heappush(heap, (new_distance, u))
+
+        return expanded
+
+
+    def children(self, index):
+        # the cells whose next cell is this one, found among its neighbours
+        next_cell = self.next_cell
+        return [neighbour for neighbour in self.grid.neighbours(index) if next_cell[neighbour] == index]
+
+
+    def update(self):
+        '''
+        This function will repair the field around the cells that changed since the last update.
+
+        @return: the list of the indices of the cells whose distance changed
+        '''
+
+        if not self.changed_cells:
+            self.expanded = 0
+            return []
+
+        distance, next_cell, blocked = self.distance, self.next_cell, self.grid_map.blocked
+        changed_cells, self.changed_cells = self.changed_cells, set()
+        neighbours, weight = self.grid.neighbours, self.weight
+
+        # The cells that became obstacles or more expensive: the weight of a cell is the difference between the distances of
+        # its children and its own, so the old weight is known without keeping a copy of the weights
+        roots = []
+        for index in changed_cells:
+            if distance[index] == INF:
+                continue
+            if blocked[index]:
+                roots.append(index)
+            else:
+                children = self.children(index)
+                if children and distance[children[0]] - distance[index] < weight(index):
+                    roots.extend(children)
+
+        old_distance = {}
+
+        # Let's remove the distance of every cell whose path goes through a root
+        invalid = []
+        stack = roots
+        while stack:
+            index = stack.pop()
+            if index in old_distance:
+                continue
+            old_distance[index] = distance[index]
+            invalid.append(index)
+            stack.extend(self.children(index))
+
+        for index in invalid:
+            distance[index] = INF
+            next_cell[index] = -1
+
+        heap = []
+
+        # every cell of the subtrees takes the best path through its neighbours outside the subtrees
+        for index in invalid:
+            if blocked[index]:
+                continue
+            for neighbour in neighbours(index):
+                new_distance = distance[neighbour] + weight(neighbour)
+                if new_distance < distance[index]:
+                    distance[index] = new_distance
+                    next_cell[index] = neighbour
+            if distance[index] != INF:
+                heap.append((distance[index], index))
+
+        # every changed cell that is still free may give its neighbours a cheaper path (its weight may have dropped)
+        for index in changed_cells:
+            if blocked[index] or distance[index] == INF:
+                continue
+            new_distance = distance[index] + weight(index)
+            for neighbour in neighbours(index):
+                if new_distance < distance[neighbour]:
+                    old_distance.setdefault(neighbour, distance[neighbour])
+                    distance[neighbour] = new_distance
+                    next_cell[neighbour] = index
+                    heap.append((new_distance, neighbour))
+
+        self.expanded = self.propagate(heap, old_distance)
+
+        return [index for index, old in old_distance.items() if distance[index] != old]
+
+
+    def reaches(self, cell):
+        self.update()
+        return self.distance[self.grid_map.index(cell)] != INF
+
+
+    def path(self, cell):
+        '''
+        @return: the cheapest path from the cell to the nearest destination
+        @raise NoPathError: if no destination can be reached from the cell
+        '''
+
+        self.update()
+
+        index = self.grid_map.index(cell)
+        if self.distance[index] == INF:
+            raise NoPathError(f"There is no valid path from {cell} to the destination")
+
+        next_cell = self.next_cell
+        path = [index]
+        while next_cell[path[-1]] != -1:
+            path.append(next_cell[path[-1]])
+
+        columns = self.columns
+        return [divmod(index, columns) for index in path]
+
+
+    def cost(self, cell):
+        '''
+        @return: the cost of the cheapest path from the cell to the nearest destination (see GridMap.path_cost)
+        @raise NoPathError: if no destination can be reached from the cell
+        '''
+
+        return self.result(cell).cost
+
+
+    def result(self, cell):
+        '''
+        @return: the PathResult from the cell to the nearest destination, with the algorithm "distance field"
+        '''
+
+        path = self.path(cell)
+        if len(path) == 1:
+            return PathResult("distance field", path, 0)
+
+        # the distance includes the weight of the destination, which the cost of a path does not
+        destination = self.grid_map.index(path[-1])
+        return PathResult("distance field", path, self.distance[self.grid_map.index(cell)] - self.weight(destination))
+
+
+    def costs(self):
+        '''
+        @return: the flat list of the distances of the cells (INF for the cells that cannot reach a destination), e.g. to draw
+                 the field as a heat map
+        '''
+
+        self.update()
+        return self.distance
@@ -0,0 +1,133 @@
+'''
+@Author: Spyros Tsattalios
+
+Bulk obstacle editing.
+
+Every tool returns the list of the cells that it selects and the caller turns them into obstacles with one call of
+GridMap.add_obstacles, so the listeners of the map (the networkx graph, the heuristics, the planners) and the renderer are
+updated once per operation instead of once per cell:
+    - rectangle_cells: a filled (or outlined) rectangle between two corners
+    - line_cells: a 4-connected line between two cells, so a path can never slip through it diagonally
+    - flood_fill: the connected region of the cells with the same type of area as a seed cell
+    - load_mask: the obstacles of a mask file, a text file with one line per row of the map, where "#", "X", "x" or "1"
+                 is an obstacle and any other character is a free cell, or a NumPy .npy array of rows x columns
+'''
+
+from collections import deque
+
+
+OBSTACLE_CHARACTERS = "#Xx1"
+
+
+def rectangle_cells(corner, opposite_corner, filled=True):
+    '''
+    @param filled: False for the outline of the rectangle only
+    @return: the cells of the rectangle, row by row
+    '''
+
+    top, bottom = sorted((corner[0], opposite_corner[0]))
+    left, right = sorted((corner[1], opposite_corner[1]))
+
+    if filled:
+        return [(row, column) for row in range(top, bottom + 1) for column in range(left, right + 1)]
+
+    cells = [(top, column) for column in range(left, right + 1)]
+    if bottom != top:
+        cells += [(bottom, column) for column in range(left, right + 1)]
+    cells += [(row, column) for row in range(top + 1, bottom) for column in sorted({left, right})]
+
+    return cells
+
+
+def line_cells(start, end):
+    '''
+    A line that takes a single step (up, down, left or right) at a time, so consecutive cells are always neighbours.
+    At every step it moves along the axis whose next cell centre comes first on the exact segment.
+
+    @return: the cells of the line from start to end
+    '''
+
+    row, column = start
+    end_row, end_column = end
+
+    row_distance = abs(end_row - row)
+    column_distance = abs(end_column - column)
+    row_step = 1 if end_row > row else -1
+    column_step = 1 if end_column > column else -1
+
+    cells = [(row, column)]
+    row_steps = column_steps = 0
+
+    while row_steps < row_distance or column_steps < column_distance:
+        # (column_steps + 0.5) / column_distance < (row_steps + 0.5) / row_distance, without fractions
+        if (2 * column_steps + 1) * row_distance < (2 * row_steps + 1) * column_distance:
+            column += column_step
+            column_steps += 1
+        else:
+            row += row_step
+            row_steps += 1
+        cells.append((row, column))
+
+    return cells
+
+
+def flood_fill(grid_map, seed):
+    '''
+    @param seed: the cell to start from
+    @return: the cells that are connected to the seed (up, down, left, right) through free cells of its type of area
+    '''
+
+    if not grid_map.is_free(seed):
+        return []
+
+    rows, columns = grid_map.rows, grid_map.columns
+    terrain = grid_map.terrain
+    blocked = grid_map.blocked
+
+    start = grid_map.index(seed)
+    area = terrain[start]
+
+    visited = bytearray(rows * columns)
+    visited[start] = 1
+    queue = deque([start])
+    region = []
+
+    while queue:
+        index = queue.popleft()
+        region.append(index)
+        row, column = divmod(index, columns)
+
+        for adjacent, inside in ((index - columns, row > 0), (index + columns, row < rows - 1), (index - 1, column > 0), (index + 1, column < columns - 1)):
+            if inside and not visited[adjacent] and not blocked[adjacent] and terrain[adjacent] == area:
+                visited[adjacent] = 1
+                queue.append(adjacent)
+
+    return [divmod(index, columns) for index in region]
+
+
+def load_mask(path, rows, columns):
+    '''
+    @return: the obstacle cells of the mask file
+    @raise ValueError: if the size of the mask is not rows x columns
+    '''
+
+    if path.lower().endswith(".npy"):
+        import numpy as np
+
+        mask = np.load(path)
+        if mask.shape != (rows, columns):
+            raise ValueError(f"The mask is {'x'.join(map(str, mask.shape))}, the map is {rows}x{columns}")
+
+        return [divmod(index, columns) for index in np.flatnonzero(mask).tolist()]
+
+    with open(path) as f:
+        lines = [line.rstrip("\r\n") for line in f]
+
+    # trailing empty lines are ignored, every other line is a row of the map
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    if len(lines) != rows or any(len(line) != columns for line in lines):
+        raise ValueError(f"The mask must have {rows} lines of {columns} characters")
+
+    return [(row, column) for row, line in enumerate(lines) for column, character in enumerate(line) if character in OBSTACLE_CHARACTERS]
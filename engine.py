@@ -0,0 +1,1032 @@
+'''
+@Author: Spyros Tsattalios
+
+GUI-free core of the Shortest Path Finder.
+
+The map is a rows x columns grid. Each cell has a type of area (road, meadow, forest, hill, mountain, lake) and a weight,
+which is the cost of moving INTO that cell. The user can turn cells into obstacles and can add areas of attraction
+(cheaper cells) and areas of repulsion (more expensive cells). Moves are allowed up, down, left and right.
+
+This module has no dependency on tkinter, so maps can be generated, loaded and solved on headless machines.
+networkx is only imported by the "networkx" backend, so the grid searches start without it.
+'''
+
+from search import GridSearch, SearchStats, INF
+from contextlib import contextmanager
+from array import array
+import random
+import time
+import json
+
+
+# The default cost of each type of area, in the same order that the start screen of the GUI shows them
+DEFAULT_AREAS = [
+    {"weight": 1, "type": "road"},
+    {"weight": 2, "type": "meadow"},
+    {"weight": 3, "type": "forest"},
+    {"weight": 4, "type": "hill"},
+    {"weight": 8, "type": "mountain"},
+    {"weight": 5, "type": "lake"}
+]
+
+# An area of attraction halves the cost of the cell itself, an area of repulsion doubles it
+ATTRACTION_COST_MULT = 0.5
+REPULSION_COST_MULT = 2
+
+# The cells around the centre get a smaller change (see costfield.py). With the default radius 1 and linear falloff the
+# neighbours of an area of attraction are 25% cheaper and the neighbours of an area of repulsion 50% more expensive
+INFLUENCE_RADIUS = 1
+INFLUENCE_FALLOFF = "linear"
+
+ALGORITHMS = ("dijkstra", "astar")
+
+# "grid" searches the flat arrays of the map directly (see search.py), "networkx" builds an nx.DiGraph and is kept to validate the results
+BACKENDS = ("grid", "networkx")
+
+
+class NoPathError(Exception):
+    '''
+    Raised when there is no valid path between the source and the target.
+    '''
+
+
+def heuristic(src, target):
+    '''
+    This function will calculate the heuristic of the A* algorithm.
+    The heuristic will be the Manhattan distance between the two nodes.
+
+    @param src: the first node as a (row, column) tuple
+    @param target: the second node as a (row, column) tuple
+    @return: the heuristic of the A* algorithm
+    '''
+
+    return abs(src[0] - target[0]) + abs(src[1] - target[1])
+
+
+class GridMap(object):
+
+    '''
+    The map of the game without any widgets.
+
+    The terrain and the weights are stored in flat lists in row-major order, so the cell (i, j) is at the index i * columns + j.
+    The obstacles are indexed twice: as a set of (row, column) tuples and as a bytearray bitmap in row-major order
+    (1 for an obstacle), so both "is this cell an obstacle?" and the searches on the flat arrays are O(1) per cell.
+    The start / end points are stored as (row, column) tuples.
+
+    The weights of the map are the base costs of the areas. The areas of attraction / repulsion do not change them: they
+    live in a sparse CostOverlay (self.overlay) on top of the base weights, so the map "with" and "without" the areas of
+    attraction / repulsion share the same arrays and any number of other overlays (scenarios) can be compared on one map.
+
+    Objects that keep their own view of the map (e.g. the networkx graph of a Solver) can register themselves with
+    add_listener() and they will be told about every new obstacle and every weight change, so they never need a rebuild.
+    '''
+
+    def __init__(self, rows, columns, areas, terrain, weights=None, copy=True):
+
+        if rows < 1 or columns < 1:
+            raise ValueError("The map must have at least one row and one column")
+        if rows * columns < 2:
+            raise ValueError("The map must have at least two cells, one for the source and one for the destination")
+
+        if len(terrain) != rows * columns:
+            raise ValueError(f"Expected {rows * columns} terrain cells, got {len(terrain)}")
+
+        self.rows = rows
+        self.columns = columns
+        self.areas = areas  # a list of dictionaries with (at least) the "weight" and the "type" of each area
+        # With copy=False the terrain and the weights are used as they are, e.g. the memory-mapped arrays of a map file
+        # (see mapfile.py). Any sequence of ints works, the weights must be writable if they are going to change.
+        self.terrain = list(terrain) if copy else terrain  # the index in self.areas of the type of each cell
+
+        # the base weight of each cell is the cost of its type of area
+        if weights is None:
+            weights = [areas[area]["weight"] for area in self.terrain]
+        self.weights = list(weights) if copy else weights
+
+        self.obstacles = set()
+        self.blocked = bytearray(rows * columns)  # the obstacle bitmap
+        self.start_point = None
+        self.end_point = None
+
+        self.listeners = []
+
+        self.overlay = CostOverlay(self)  # the areas of attraction / repulsion of the map
+
+
+    @classmethod
+    def generate(cls, rows, columns, areas=None, obstacle_density=0.0, seed=None):
+        '''
+        This function will create a random map. Each cell gets a random type of area, just like in the GUI.
+
+        @param rows: the number of rows of the map
+        @param columns: the number of columns of the map
+        @param areas: the list of areas to choose from (defaults to DEFAULT_AREAS)
+        @param obstacle_density: the fraction of the cells that will become obstacles
+        @param seed: the seed of the random generator, to be able to reproduce a map
+        @return: the new GridMap
+        '''
+
+        if areas is None:
+            areas = DEFAULT_AREAS
+
+        rng = random.Random(seed)
+
+        terrain = rng.choices(range(len(areas)), k=rows * columns)
+        grid_map = cls(rows, columns, areas, terrain)
+
+        obstacles_count = int(obstacle_density * rows * columns)
+        for index in rng.sample(range(rows * columns), obstacles_count):
+            grid_map.add_obstacle(divmod(index, columns))
+
+        return grid_map
+
+
+    def copy(self):
+        '''
+        @return: an independent copy of the map
+        '''
+
+        new_map = GridMap(self.rows, self.columns, self.areas, self.terrain, self.weights)
+        new_map.obstacles = set(self.obstacles)
+        new_map.blocked = bytearray(self.blocked)
+        new_map.start_point = self.start_point
+        new_map.end_point = self.end_point
+        new_map.overlay = self.overlay.copy(new_map)
+
+        return new_map
+
+
+    @property
+    def attraction_areas(self):
+        return self.overlay.attraction_areas
+
+
+    @property
+    def repulsion_areas(self):
+        return self.overlay.repulsion_areas
+
+
+    def new_overlay(self):
+        '''
+        @return: a new empty CostOverlay on this map, to try other areas of attraction / repulsion without touching self.overlay
+        '''
+
+        return CostOverlay(self)
+
+
+    def index(self, cell):
+        return cell[0] * self.columns + cell[1]
+
+
+    def in_bounds(self, cell):
+        return 0 <= cell[0] < self.rows and 0 <= cell[1] < self.columns
+
+
+    def weight(self, cell):
+        return self.weights[self.index(cell)]
+
+
+    def area_type(self, cell):
+        return self.areas[self.terrain[self.index(cell)]]["type"]
+
+
+    def is_obstacle(self, cell):
+        return self.blocked[self.index(cell)] == 1
+
+
+    def is_free(self, cell):
+        return self.in_bounds(cell) and not self.blocked[self.index(cell)]
+
+
+    def free_cells(self):
+        columns = self.columns
+        return [divmod(index, columns) for index, blocked in enumerate(self.blocked) if not blocked]
+
+
+    def neighbours(self, cell):
+        '''
+        @param cell: a (row, column) tuple
+        @return: the cells above, below, left and right of the cell that are inside the map and are not obstacles
+        '''
+
+        i, j = cell
+        return [adjacent for adjacent in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)) if self.is_free(adjacent)]
+
+
+    def add_listener(self, listener):
+        '''
+        @param listener: an object with the methods obstacle_added(cell), obstacles_added(cells) and weight_changed(cell, weight)
+        '''
+
+        self.listeners.append(listener)
+
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+
+    def add_obstacle(self, cell):
+        '''
+        @return: True if the cell became an obstacle, False if it already was one
+        '''
+
+        index = self.index(cell)
+        if self.blocked[index]:
+            return False
+
+        self.blocked[index] = 1
+        self.obstacles.add(cell)
+
+        for listener in self.listeners:
+            listener.obstacle_added(cell)
+
+        return True
+
+
+    def add_obstacles(self, cells):
+        '''
+        This function will turn many cells into obstacles and tell the listeners once, with the list of the new obstacles
+        (e.g. the networkx graph of a Solver removes them with a single remove_nodes_from).
+
+        @param cells: the cells, the cells outside the map and the cells that are already obstacles are skipped
+        @return: the list of the cells that became obstacles
+        '''
+
+        blocked = self.blocked
+        columns = self.columns
+        added = []
+
+        for cell in cells:
+            if self.in_bounds(cell):
+                index = cell[0] * columns + cell[1]
+                if not blocked[index]:
+                    blocked[index] = 1
+                    added.append(tuple(cell))
+
+        self.obstacles.update(added)
+
+        if added:
+            for listener in self.listeners:
+                listener.obstacles_added(added)
+
+        return added
+
+
+    def set_weight(self, cell, weight):
+        '''
+        This function will change the base weight of a cell.
+        The overlays keep their own weights, so a cell that an overlay has changed keeps its weight in that overlay.
+        '''
+
+        self.weights[self.index(cell)] = weight
+
+        for listener in self.listeners:
+            listener.weight_changed(cell, weight)
+
+
+    def add_influence_area(self, cell, attraction):
+        '''
+        This function will add an area of attraction or repulsion to the overlay of the map (see CostOverlay.add_influence_area).
+        '''
+
+        return self.overlay.add_influence_area(cell, attraction)
+
+
+    def path_cost(self, path, overlay=None):
+        '''
+        The cost of a path is the sum of the weights of the cells between the start and the end point.
+
+        @param overlay: the CostOverlay whose weights to use, None for the base weights
+        '''
+
+        if overlay is None:
+            return sum(self.weight(cell) for cell in path[1:-1])
+
+        return sum(overlay.weight(cell) for cell in path[1:-1])
+
+
+    def to_graph(self, overlay=None):
+        '''
+        This function will create the networkx graph of the map.
+
+        We use a directed graph because all edges are bidirectional BUT the cost of each edge between the same two nodes
+        is not the same e.g. (1, 2) -> (2, 2) costs the weight of (2, 2) and (2, 2) -> (1, 2) costs the weight of (1, 2)
+
+        @param overlay: the CostOverlay whose weights to use, None for the base weights
+        @return: an nx.DiGraph with a node for every cell that is not an obstacle
+        '''
+
+        import networkx as nx  # networkx is only needed by the graph, so it is imported the first time a graph is built
+
+        weight = self.weight if overlay is None else overlay.weight
+
+        graph = nx.DiGraph()
+
+        for cell in self.free_cells():
+            graph.add_node(cell, weight=weight(cell))
+
+        for cell in graph.nodes:
+            for adjacent in self.neighbours(cell):
+                graph.add_edge(cell, adjacent, weight=weight(adjacent))
+
+        return graph
+
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "columns": self.columns,
+            "areas": [{"weight": area["weight"], "type": area["type"]} for area in self.areas],
+            "terrain": list(self.terrain),
+            "weights": list(self.weights),
+            "obstacles": sorted(self.obstacles),
+            "start_point": self.start_point,
+            "end_point": self.end_point,
+            "attraction_areas": self.attraction_areas,
+            "repulsion_areas": self.repulsion_areas,
+            "influence": {"radius": self.overlay.radius, "falloff": self.overlay.falloff},
+            "overlay_weights": sorted(self.overlay.weights.items())
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+        grid_map = cls(data["rows"], data["columns"], data["areas"], data["terrain"], data.get("weights"))
+
+        for cell in data.get("obstacles", []):
+            grid_map.add_obstacle(tuple(cell))
+
+        if data.get("start_point") is not None:
+            grid_map.start_point = tuple(data["start_point"])
+        if data.get("end_point") is not None:
+            grid_map.end_point = tuple(data["end_point"])
+
+        grid_map.overlay.attraction_areas = [tuple(cell) for cell in data.get("attraction_areas", [])]
+        grid_map.overlay.repulsion_areas = [tuple(cell) for cell in data.get("repulsion_areas", [])]
+        grid_map.overlay.radius = data.get("influence", {}).get("radius", INFLUENCE_RADIUS)
+        grid_map.overlay.falloff = data.get("influence", {}).get("falloff", INFLUENCE_FALLOFF)
+        grid_map.overlay.weights = {index: weight for index, weight in data.get("overlay_weights", [])}
+
+        return grid_map
+
+
+    def pack(self):
+        '''
+        This function will pack the map into a few flat byte strings, e.g. to send it to another process.
+        It is much smaller and much faster to pickle than the lists of the map (or a graph).
+
+        @return: a dictionary of plain values and bytes
+        '''
+
+        return {
+            "rows": self.rows,
+            "columns": self.columns,
+            "areas": [{"weight": area["weight"], "type": area["type"]} for area in self.areas],
+            "terrain": bytes(self.terrain),
+            "weights": array("i", self.weights).tobytes(),
+            "blocked": bytes(self.blocked),
+            "start_point": self.start_point,
+            "end_point": self.end_point,
+            "attraction_areas": self.attraction_areas,
+            "repulsion_areas": self.repulsion_areas,
+            "influence": {"radius": self.overlay.radius, "falloff": self.overlay.falloff},
+            "overlay_cells": array("i", self.overlay.weights.keys()).tobytes(),
+            "overlay_weights": array("i", self.overlay.weights.values()).tobytes()
+        }
+
+
+    @classmethod
+    def unpack(cls, packed):
+        '''
+        @param packed: the result of pack()
+        @return: a new GridMap
+        '''
+
+        grid_map = cls(packed["rows"], packed["columns"], packed["areas"], packed["terrain"], array("i", packed["weights"]))
+
+        grid_map.blocked = bytearray(packed["blocked"])
+        grid_map.obstacles = {divmod(index, grid_map.columns) for index, blocked in enumerate(grid_map.blocked) if blocked}
+        grid_map.start_point = packed["start_point"]
+        grid_map.end_point = packed["end_point"]
+
+        grid_map.overlay.attraction_areas = list(packed["attraction_areas"])
+        grid_map.overlay.repulsion_areas = list(packed["repulsion_areas"])
+        grid_map.overlay.radius = packed["influence"]["radius"]
+        grid_map.overlay.falloff = packed["influence"]["falloff"]
+        grid_map.overlay.weights = dict(zip(array("i", packed["overlay_cells"]), array("i", packed["overlay_weights"])))
+
+        return grid_map
+
+
+    def save(self, path):
+        '''
+        This function will save the map as JSON, or in the binary map format of mapfile.py if the path ends with ".spmap".
+        '''
+
+        import mapfile
+
+        if path.endswith(mapfile.EXTENSION):
+            mapfile.save_map(self, path)
+            return
+
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+
+    @classmethod
+    def load(cls, path):
+        '''
+        This function will load a map saved by save(), in either format (a binary map file is memory-mapped, see mapfile.py).
+        '''
+
+        import mapfile
+
+        if mapfile.is_map_file(path):
+            return mapfile.load_map(path)
+
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class CostOverlay(object):
+
+    '''
+    A sparse layer of weights on top of the base weights of a GridMap.
+
+    It only stores the cells whose weight differs from the base weight, as a {cell index: weight} dictionary, and it is the
+    place where the areas of attraction / repulsion are applied. Looking up a weight costs one dictionary lookup, so
+    searching "base + overlay" costs almost the same as searching the base weights, and an overlay costs memory only for
+    the cells that it changes.
+    '''
+
+    def __init__(self, grid_map, radius=INFLUENCE_RADIUS, falloff=INFLUENCE_FALLOFF):
+        self.grid_map = grid_map
+        self.weights = {}
+        self.attraction_areas = []
+        self.repulsion_areas = []
+        self.radius = radius  # the radius (Manhattan distance) of the areas of attraction / repulsion
+        self.falloff = falloff  # how their change fades with the distance from their centre (see costfield.FALLOFFS)
+        self.logs = None  # {cell index: sum of the log factors of the areas}, computed from the areas when it is first needed
+        self.listeners = []
+
+
+    def copy(self, grid_map=None):
+        new_overlay = CostOverlay(self.grid_map if grid_map is None else grid_map, self.radius, self.falloff)
+        new_overlay.weights = dict(self.weights)
+        new_overlay.attraction_areas = list(self.attraction_areas)
+        new_overlay.repulsion_areas = list(self.repulsion_areas)
+        new_overlay.logs = None if self.logs is None else dict(self.logs)
+
+        return new_overlay
+
+
+    def add_listener(self, listener):
+        '''
+        @param listener: an object with the method weight_changed(cell, weight)
+        '''
+
+        self.listeners.append(listener)
+
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+
+    def weight(self, cell):
+        index = self.grid_map.index(cell)
+        return self.weights.get(index, self.grid_map.weights[index])
+
+
+    def set_weight(self, cell, weight):
+
+        self.weights[self.grid_map.index(cell)] = weight
+
+        for listener in self.listeners:
+            listener.weight_changed(cell, weight)
+
+
+    def set_weights(self, indices, weights):
+        '''
+        This function will change the weights of many cells at once.
+
+        @param indices: the cell indices
+        @param weights: their new weights
+        '''
+
+        self.weights.update(zip(indices, weights))
+
+        columns = self.grid_map.columns
+        for listener in self.listeners:
+            for index, weight in zip(indices, weights):
+                listener.weight_changed(divmod(index, columns), weight)
+
+
+    def add_influence_area(self, cell, attraction):
+        '''
+        This function will add an area of attraction or repulsion centred at the cell (see add_influence_areas).
+
+        @param cell: the centre of the area
+        @param attraction: True for an area of attraction, False for an area of repulsion
+        @return: a list of (cell, new_weight) tuples with the cells that changed
+        '''
+
+        indices, weights = self.add_influence_areas([cell], attraction)
+        return [(divmod(index, self.grid_map.columns), weight) for index, weight in zip(indices, weights)]
+
+
+    def add_influence_areas(self, cells, attraction):
+        '''
+        This function will add any number of areas of attraction or repulsion with one vectorised pass (see costfield.py).
+        The cells within self.radius of each centre get their weights multiplied, obstacles excepted, and no weight drops
+        below 1. The weights are the same as those that rebuild() computes for the same areas.
+
+        @param cells: the centres of the areas
+        @param attraction: True for areas of attraction, False for areas of repulsion
+        @return: the lists of the (indices, new weights) of the cells that changed
+        '''
+
+        import costfield
+
+        cells = [tuple(cell) for cell in cells if self.grid_map.in_bounds(cell)]
+        if not cells:
+            return [], []
+
+        # the field of the areas that the overlay already has (e.g. the areas of a loaded map)
+        if self.logs is None:
+            self.logs = {}
+            costfield.apply_influence(self, [(self.attraction_areas, ATTRACTION_COST_MULT), (self.repulsion_areas, REPULSION_COST_MULT)])
+
+        if attraction:
+            self.attraction_areas.extend(cells)
+            multiplier = ATTRACTION_COST_MULT
+        else:
+            self.repulsion_areas.extend(cells)
+            multiplier = REPULSION_COST_MULT
+
+        indices, weights = costfield.apply_influence(self, [(cells, multiplier)])
+
+        # a small change of a heavy cell can be floored away, only the cells whose weight changed are reported
+        base_weights = self.grid_map.weights
+        changed = [(index, weight) for index, weight in zip(indices, weights) if self.weights.get(index, base_weights[index]) != weight]
+        indices, weights = [index for index, _ in changed], [weight for _, weight in changed]
+        self.set_weights(indices, weights)
+
+        return indices, weights
+
+
+    def rebuild(self, radius=None, falloff=None):
+        '''
+        This function will compute the weights of the overlay again from the base weights and all its areas, in one pass,
+        e.g. after a change of the radius or the falloff of the areas.
+
+        @return: the number of cells whose weight changed
+        '''
+
+        import costfield
+
+        if radius is not None:
+            self.radius = radius
+        if falloff is not None:
+            self.falloff = falloff
+
+        self.logs = {}
+        indices, weights = costfield.apply_influence(self, [(self.attraction_areas, ATTRACTION_COST_MULT), (self.repulsion_areas, REPULSION_COST_MULT)])
+
+        # the dictionary is updated in place: the solvers and the searches keep a reference to it
+        old_weights = dict(self.weights)
+        self.weights.clear()
+        self.weights.update(zip(indices, weights))
+
+        # the cells that lost their overlay weight are back to their base weight
+        base_weights = self.grid_map.weights
+        changed = [index for index in old_weights.keys() | self.weights.keys() if old_weights.get(index, base_weights[index]) != self.weights.get(index, base_weights[index])]
+
+        columns = self.grid_map.columns
+        for listener in self.listeners:
+            for index in changed:
+                listener.weight_changed(divmod(index, columns), self.weights.get(index, base_weights[index]))
+
+        return len(changed)
+
+
+class PathResult(object):
+
+    '''
+    The result of a single shortest path query.
+    '''
+
+    def __init__(self, algorithm, path, cost, stats=None, cached=False):
+        self.algorithm = algorithm
+        self.path = path  # the list of (row, column) cells from the source to the target
+        self.cost = cost  # the cost of the path, as defined by GridMap.path_cost
+        self.stats = stats  # the SearchStats of the search that found the path (if it was measured)
+        self.cached = cached  # True if the result came from a PathCache instead of a search
+
+
+    def __repr__(self):
+        return f"PathResult(algorithm={self.algorithm!r}, cost={self.cost}, length={len(self.path)})"
+
+
+class PhaseTimer(object):
+
+    '''
+    Measures the wall time of the phases of a run (generating the map, setting up the solvers, each search, ...).
+
+        timer = PhaseTimer()
+        with timer.phase("generate map"):
+            grid_map = GridMap.generate(100, 100)
+    '''
+
+    def __init__(self):
+        self.phases = []  # (name, seconds) tuples in the order that the phases ran
+
+
+    @contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start_time))
+
+
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+
+    def to_dict(self):
+        return {name: seconds for name, seconds in self.phases}
+
+
+class ShortestPathTree(object):
+
+    '''
+    All the shortest paths from one cell (or, in reverse, to one cell) of a map, computed with a single Dijkstra search.
+
+    After the search every path / cost query is a walk along the parent pointers, so any number of queries that share the
+    root cost one search in total.
+    '''
+
+    def __init__(self, grid_map, root, reverse, distance, parent, overlay=None):
+        self.grid_map = grid_map
+        self.root = root  # the (row, column) of the root
+        self.reverse = reverse  # False: the paths start at the root, True: the paths end at the root
+        self.distance = distance
+        self.parent = parent
+        self.overlay = overlay
+
+
+    def reaches(self, cell):
+        return self.distance[self.grid_map.index(cell)] != INF
+
+
+    def cost(self, cell):
+        '''
+        @return: the cost of the shortest path between the root and the cell (see GridMap.path_cost)
+        @raise NoPathError: if there is no path between the root and the cell
+        '''
+
+        index = self.grid_map.index(cell)
+        distance = self.distance[index]
+
+        if distance == INF:
+            raise NoPathError(f"There is no valid path between {self.root} and {cell}")
+
+        if cell == self.root:
+            return 0
+
+        # the distance includes the weight of the last cell of the path, which the cost of a path does not
+        last = self.root if self.reverse else cell
+        last_weight = self.grid_map.weight(last) if self.overlay is None else self.overlay.weight(last)
+
+        return distance - last_weight
+
+
+    def path(self, cell):
+        '''
+        @return: the shortest path from the root to the cell (from the cell to the root for a reverse tree)
+        @raise NoPathError: if there is no path between the root and the cell
+        '''
+
+        columns = self.grid_map.columns
+        index = self.grid_map.index(cell)
+
+        if self.distance[index] == INF:
+            raise NoPathError(f"There is no valid path between {self.root} and {cell}")
+
+        path = [index]
+        while self.parent[path[-1]] != -1:
+            path.append(self.parent[path[-1]])
+
+        if not self.reverse:
+            path.reverse()
+
+        return [divmod(index, columns) for index in path]
+
+
+    def result(self, cell):
+        '''
+        @return: the PathResult between the root and the cell
+        '''
+
+        return PathResult("dijkstra-tree", self.path(cell), self.cost(cell))
+
+
+class Solver(object):
+
+    '''
+    Finds shortest paths on a GridMap with the Dijkstra and the A* algorithm.
+
+    With the "grid" backend the searches run directly on the weights and the obstacle bitmap of the map and no graph is built.
+    With the "networkx" backend the graph of the map is built once, when the solver is created. After that the solver
+    listens to the map and keeps the edges up to date as obstacles and weights change, so a query never rebuilds the graph.
+
+    Without an overlay the solver uses the base weights of the map. With an overlay (e.g. grid_map.overlay) it uses the
+    weights of the overlay, which fall back to the base weights for every cell that the overlay did not change.
+
+    The A* algorithm uses the Manhattan distance, unless a heuristic object of heuristics.py is given. It must follow the
+    same map and overlay as the solver.
+
+    With a PathCache (see pathcache.py), shortest_path() answers a query that was already answered on the same cost grid
+    without a search. The solvers of one map can share a cache.
+    '''
+
+    def __init__(self, grid_map, backend="grid", overlay=None, heuristic=None, cache=None):
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+        self.grid_map = grid_map
+        self.backend = backend
+        self.overlay = overlay
+        self.heuristic = heuristic
+        self.cache = cache
+        self.cancel_event = None  # see set_cancel_event
+
+        if backend == "grid":
+            self.search = GridSearch(grid_map.weights, grid_map.blocked, grid_map.rows, grid_map.columns, None if overlay is None else overlay.weights)
+        else:
+            self.graph = grid_map.to_graph(overlay)
+            grid_map.add_listener(self)
+            if overlay is not None:
+                overlay.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map.
+        '''
+
+        if self.backend == "networkx":
+            self.grid_map.remove_listener(self)
+            if self.overlay is not None:
+                self.overlay.remove_listener(self)
+
+
+    def set_cancel_event(self, event):
+        '''
+        The grid searches of this solver, and the searches that compute the landmark tables of its heuristic, will raise
+        search.SearchCancelled when the event (a threading.Event) is set. A networkx search cannot be interrupted, so on the
+        networkx backend the event only stops the landmark tables.
+        '''
+
+        self.cancel_event = event
+        if self.backend == "grid":
+            self.search.cancel_event = event
+
+
+    def cell_weight(self, cell):
+        return self.grid_map.weight(cell) if self.overlay is None else self.overlay.weight(cell)
+
+
+    def obstacle_added(self, cell):
+        # an obstacle has no edges, removing its node removes every edge from and to it
+        if cell in self.graph:
+            self.graph.remove_node(cell)
+
+
+    def obstacles_added(self, cells):
+        self.graph.remove_nodes_from(cells)
+
+
+    def weight_changed(self, cell, weight):
+        if cell in self.graph:
+            # a change of the base weight does not matter if the overlay has its own weight for the cell
+            weight = self.cell_weight(cell)
+
+            # moving into the cell costs its weight, so only the edges that end at the cell change
+            self.graph.nodes[cell]["weight"] = weight
+            for predecessor in self.graph.predecessors(cell):
+                self.graph.edges[predecessor, cell]["weight"] = weight
+
+
+    def shortest_path(self, source=None, target=None, algorithm="dijkstra"):
+        '''
+        @param source: the start cell (defaults to the start point of the map)
+        @param target: the end cell (defaults to the end point of the map)
+        @param algorithm: "dijkstra" or "astar"
+        @return: a PathResult
+        @raise NoPathError: if there is no valid path between the source and the target
+        '''
+
+        if source is None:
+            source = self.grid_map.start_point
+        if target is None:
+            target = self.grid_map.end_point
+
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+
+        start_time = time.perf_counter()
+
+        if self.cache is not None:
+            found, result = self.cache.get(self.overlay, source, target, algorithm)
+            if found:
+                if result is None:
+                    raise NoPathError(f"There is no valid path between {source} and {target}")
+                return PathResult(algorithm, result.path, result.cost, SearchStats(seconds=time.perf_counter() - start_time), cached=True)
+
+        if self.backend == "grid":
+            path = self.grid_path(source, target, algorithm)
+            stats = self.search.stats
+        else:
+            # networkx does not tell us how much work it did, only the time is measured
+            path = self.networkx_path(source, target, algorithm)
+            stats = SearchStats(expanded=None, pushes=None, pops=None, peak_open=None)
+        stats.seconds = time.perf_counter() - start_time
+
+        result = None if path is None else PathResult(algorithm, path, self.grid_map.path_cost(path, self.overlay), stats)
+        if self.cache is not None:
+            self.cache.put(self.overlay, source, target, algorithm, result)
+
+        if result is None:
+            raise NoPathError(f"There is no valid path between {source} and {target}")
+
+        return result
+
+
+    def grid_path(self, source, target, algorithm):
+
+        if not (self.grid_map.in_bounds(source) and self.grid_map.in_bounds(target)):
+            return None
+
+        if algorithm == "dijkstra":
+            path, _ = self.search.bidirectional_dijkstra(self.grid_map.index(source), self.grid_map.index(target))
+        elif self.heuristic is None:
+            path, _ = self.search.astar(self.grid_map.index(source), self.grid_map.index(target))
+        else:
+            self.heuristic.prepare(self.cancel_event)
+            target_index = self.grid_map.index(target)
+            path, _ = self.search.astar(self.grid_map.index(source), target_index, self.heuristic.for_target(target_index), self.heuristic.scale)
+
+        if path is None:
+            return None
+
+        columns = self.grid_map.columns
+        return [divmod(index, columns) for index in path]
+
+
+    def tree(self, root, reverse=False):
+        '''
+        This function will compute the shortest path tree of a cell with one Dijkstra search.
+
+        @param root: the (row, column) of the root
+        @param reverse: False for the paths from the root to every cell, True for the paths from every cell to the root
+        @return: a ShortestPathTree
+        '''
+
+        if self.backend != "grid":
+            raise ValueError("Shortest path trees need the grid backend")
+
+        distance, parent = self.search.shortest_path_tree(self.grid_map.index(root), reverse)
+
+        return ShortestPathTree(self.grid_map, root, reverse, distance, parent, self.overlay)
+
+
+    def nearest_path(self, sources, targets, algorithm="dijkstra"):
+        '''
+        This function will find the cheapest path from any of the sources to the nearest of the targets with one search,
+        instead of one search per (source, target) pair. The cost of a path ending at a target does not include the weight
+        of that target (see GridMap.path_cost), so that is the cost that the targets are compared by.
+
+        @param sources: a list of start cells
+        @param targets: a list of end cells
+        @param algorithm: "dijkstra" or "astar" (the Manhattan distance to the nearest target, times the scale of the heuristic)
+        @return: a PathResult, whose path starts at the chosen source and ends at the nearest target
+        @raise NoPathError: if no target can be reached from any source
+        '''
+
+        if self.backend != "grid":
+            raise ValueError("Nearest target queries need the grid backend")
+
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+
+        grid_map = self.grid_map
+        source_indices = [grid_map.index(cell) for cell in sources if grid_map.in_bounds(cell)]
+        target_indices = [grid_map.index(cell) for cell in targets if grid_map.in_bounds(cell)]
+
+        heuristic = None
+        if algorithm == "astar" and target_indices:
+            if self.heuristic is None:
+                from heuristics import nearest_target_heuristic
+                heuristic = nearest_target_heuristic(grid_map.rows, grid_map.columns, target_indices)
+            else:
+                self.heuristic.prepare(self.cancel_event)
+                heuristic = self.heuristic.for_targets(target_indices)
+
+        start_time = time.perf_counter()
+        path, _ = self.search.nearest_search(source_indices, target_indices, heuristic)
+        stats = self.search.stats
+        stats.seconds = time.perf_counter() - start_time
+
+        if path is None:
+            raise NoPathError(f"There is no valid path from {len(sources)} sources to {len(targets)} targets")
+
+        path = [divmod(index, grid_map.columns) for index in path]
+        return PathResult(algorithm, path, grid_map.path_cost(path, self.overlay), stats)
+
+
+    def solve_pairs(self, pairs):
+        '''
+        This function will answer many (source, target) queries with as few searches as possible.
+
+        The queries are grouped by source and each source gets one shortest path tree. If the queries have fewer distinct
+        targets than distinct sources, they are grouped by target instead and each target gets one reverse tree.
+
+        @param pairs: a list of (source, target) tuples
+        @return: a list with a PathResult (or None if there is no path) for every pair, in the order of the pairs
+        '''
+
+        by_target = len({target for _, target in pairs}) < len({source for source, _ in pairs})
+
+        groups = {}
+        for position, (source, target) in enumerate(pairs):
+            root = target if by_target else source
+            groups.setdefault(root, []).append(position)
+
+        results = [None] * len(pairs)
+
+        for root, positions in groups.items():
+            tree = self.tree(root, reverse=by_target)
+            for position in positions:
+                source, target = pairs[position]
+                cell = source if by_target else target
+                if tree.reaches(cell):
+                    results[position] = tree.result(cell)
+
+        return results
+
+
+    def networkx_path(self, source, target, algorithm):
+
+        import networkx as nx
+
+        try:
+            if algorithm == "dijkstra":
+                return nx.shortest_path(G=self.graph, source=source, target=target, method="dijkstra", weight="weight")
+            elif self.heuristic is None:
+                return nx.astar_path(G=self.graph, source=source, target=target, heuristic=heuristic, weight="weight")
+            else:
+                self.heuristic.prepare(self.cancel_event)
+                target_index = self.grid_map.index(target)
+                return nx.astar_path(G=self.graph, source=source, target=target, heuristic=lambda cell, _: self.heuristic.estimate(self.grid_map.index(cell), target_index), weight="weight")
+        except (nx.exception.NetworkXNoPath, nx.exception.NodeNotFound):
+            return None
+
+
+def validate(grid_map, queries, algorithms=ALGORITHMS, overlay=None):
+    '''
+    This function will run every query with both backends and compare the results.
+
+    @param grid_map: the map of the queries
+    @param queries: a list of (source, target) tuples
+    @param algorithms: the algorithms to compare
+    @param overlay: the CostOverlay whose weights to use, None for the base weights
+    @return: a list of (source, target, algorithm, grid_result, networkx_result) tuples for every query where the
+             two backends disagree on the path or on its cost. The results are None when there is no path.
+    '''
+
+    grid_solver = Solver(grid_map, backend="grid", overlay=overlay)
+    networkx_solver = Solver(grid_map, backend="networkx", overlay=overlay)
+
+    mismatches = []
+
+    networkx_solver.close()
+
+    for source, target in queries:
+        for algorithm in algorithms:
+            results = []
+            for solver in (grid_solver, networkx_solver):
+                try:
+                    results.append(solver.shortest_path(source, target, algorithm))
+                except NoPathError:
+                    results.append(None)
+
+            grid_result, networkx_result = results
+            if (grid_result is None) != (networkx_result is None):
+                mismatches.append((source, target, algorithm, grid_result, networkx_result))
+            elif grid_result is not None and (grid_result.path != networkx_result.path or grid_result.cost != networkx_result.cost):
+                mismatches.append((source, target, algorithm, grid_result, networkx_result))
+
+    return mismatches
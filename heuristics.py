@@ -0,0 +1,290 @@
+'''
+@Author: Spyros Tsattalios
+
+The heuristics of the A* algorithm.
+
+Moving into a cell costs at least the cheapest weight of the map, so the plain Manhattan distance underestimates the cost
+of a path by a factor of the average weight and A* expands almost as many cells as Dijkstra. The heuristics here stay
+admissible (they never overestimate) but are tighter:
+    - "manhattan": the Manhattan distance (every weight is at least 1)
+    - "scaled": the Manhattan distance times the cheapest weight of the map
+    - "alt": A*, Landmarks and the Triangle inequality. The exact distances from and to a few landmark cells are computed
+             once per map; by the triangle inequality d(v, t) >= d(v, L) - d(t, L) and d(v, t) >= d(L, t) - d(L, v)
+             for every landmark L. The estimate is the best of these bounds and of the scaled Manhattan distance.
+
+A heuristic object follows the map (and the overlay) like a Solver does. The landmark tables are only valid for the map that
+they were computed on, so an edit marks them stale and they are computed again before the next search.
+
+A search towards the nearest of several targets (GridSearch.nearest_search) uses the scaled Manhattan distance to the nearest
+target, from a minimum over a few targets or from a distance transform of many (see nearest_target_heuristic).
+'''
+
+from search import GridSearch, INF
+from array import array
+import random
+
+
+HEURISTICS = ("manhattan", "scaled", "alt")
+
+# up to this many targets, the estimate of nearest_search is a minimum over the targets, beyond it a precomputed table
+NEAREST_TARGETS_LOOP = 16
+
+
+class ManhattanHeuristic(object):
+
+    '''
+    The Manhattan distance to the target, times scale. With scaled=True the scale is the cheapest weight of the map.
+    '''
+
+    def __init__(self, grid_map, overlay=None, scaled=False):
+
+        self.grid_map = grid_map
+        self.overlay = overlay
+        self.columns = grid_map.columns
+        self.scaled = scaled
+        self.scale = self.cheapest_weight() if scaled else 1
+
+        grid_map.add_listener(self)
+        if overlay is not None:
+            overlay.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map.
+        '''
+
+        self.grid_map.remove_listener(self)
+        if self.overlay is not None:
+            self.overlay.remove_listener(self)
+
+
+    def cheapest_weight(self):
+        weights = self.grid_map.weights
+        cheapest = min(weights)
+        if self.overlay is not None and self.overlay.weights:
+            cheapest = min(cheapest, min(self.overlay.weights.values()))
+        return max(cheapest, 1)
+
+
+    def obstacle_added(self, cell):
+        pass  # an obstacle makes paths longer, so the estimate stays admissible
+
+
+    def obstacles_added(self, cells):
+        pass
+
+
+    def weight_changed(self, cell, weight):
+        # a cheaper cell lowers the scale, a more expensive one is ignored (the scale stays a valid lower bound)
+        if self.scaled and weight < self.scale:
+            self.scale = max(weight, 1)
+
+
+    def prepare(self, cancel_event=None):
+        pass  # nothing to compute before a search
+
+
+    def for_target(self, target):
+        '''
+        @return: the function of a cell index that GridSearch.astar() calls, or None for its inline Manhattan distance
+                 (in that case the search multiplies it by self.scale)
+        '''
+
+        return None
+
+
+    def for_targets(self, targets):
+        '''
+        The landmark tables bound the distance to a single target only, so every heuristic estimates the distance to the
+        nearest of several targets with the (scaled) Manhattan distance, see nearest_target_heuristic.
+
+        @return: the function of a cell index that GridSearch.nearest_search() calls
+        '''
+
+        return nearest_target_heuristic(self.grid_map.rows, self.columns, targets, self.scale)
+
+
+    def estimate(self, index, target):
+        row, column = divmod(index, self.columns)
+        target_row, target_column = divmod(target, self.columns)
+        return self.scale * (abs(row - target_row) + abs(column - target_column))
+
+
+class LandmarkHeuristic(ManhattanHeuristic):
+
+    '''
+    The ALT heuristic with landmarks tables.
+
+    For every landmark there are two arrays of size rows x columns: the distance from the landmark to every cell and the
+    distance from every cell to the landmark (the weights are on the cells, so the two directions differ).
+    The landmarks are chosen greedily: each new landmark is the cell that is farthest from the landmarks chosen so far.
+    '''
+
+    def __init__(self, grid_map, overlay=None, landmarks=8, seed=0):
+
+        super().__init__(grid_map, overlay, scaled=True)
+
+        self.landmarks_count = landmarks
+        self.seed = seed
+
+        self.landmarks = []  # the cell indices of the landmarks
+        self.from_landmark = []  # from_landmark[k][v] is the distance from the k-th landmark to the cell v
+        self.to_landmark = []  # to_landmark[k][v] is the distance from the cell v to the k-th landmark
+
+        self.stale = True  # the tables are computed by the first search (see prepare)
+
+
+    def obstacle_added(self, cell):
+        self.stale = True
+
+
+    def obstacles_added(self, cells):
+        self.stale = True
+
+
+    def weight_changed(self, cell, weight):
+        super().weight_changed(cell, weight)
+        self.stale = True
+
+
+    def prepare(self, cancel_event=None):
+        '''
+        This function will compute the landmark tables again if the map changed since they were computed.
+
+        @param cancel_event: a threading.Event that stops the searches of the tables (see GridSearch.cancel_event)
+        @raise SearchCancelled: if the event is set, the tables stay stale and the next search computes them again
+        '''
+
+        if not self.stale:
+            return
+
+        grid_map = self.grid_map
+        search = GridSearch(grid_map.weights, grid_map.blocked, grid_map.rows, grid_map.columns, None if self.overlay is None else self.overlay.weights)
+        search.cancel_event = cancel_event
+
+        self.scale = self.cheapest_weight()
+        self.landmarks = []
+        self.from_landmark = []
+        self.to_landmark = []
+
+        free_cells = [index for index in range(grid_map.rows * grid_map.columns) if not grid_map.blocked[index]]
+        if free_cells:
+            # the first landmark is the cell farthest from a random cell, every next one the cell farthest from all the landmarks
+            start = random.Random(self.seed).choice(free_cells)
+            closest = search.shortest_path_tree(start)[0]
+
+            for _ in range(min(self.landmarks_count, len(free_cells))):
+                landmark = max(free_cells, key=lambda index: closest[index] if closest[index] != INF else -1)
+                if landmark in self.landmarks:
+                    break
+
+                distance_from = search.shortest_path_tree(landmark)[0]
+                distance_to = search.shortest_path_tree(landmark, reverse=True)[0]
+
+                self.landmarks.append(landmark)
+                self.from_landmark.append(array("d", distance_from))
+                self.to_landmark.append(array("d", distance_to))
+
+                closest = [min(a, b) for a, b in zip(closest, distance_from)] if len(self.landmarks) > 1 else distance_from
+
+        self.stale = False
+
+
+    def for_target(self, target):
+
+        columns, scale = self.columns, self.scale
+        target_row, target_column = divmod(target, columns)
+
+        # only the landmarks that can reach the target / that the target can reach give a bound
+        bounds = [(from_landmark, from_landmark[target], to_landmark, to_landmark[target]) for from_landmark, to_landmark in zip(self.from_landmark, self.to_landmark)]
+
+        def heuristic(index):
+            row, column = divmod(index, columns)
+            best = scale * (abs(row - target_row) + abs(column - target_column))
+
+            for from_landmark, from_to_target, to_landmark, target_to in bounds:
+                # d(v, t) >= d(v, L) - d(t, L)
+                if target_to != INF:
+                    bound = to_landmark[index] - target_to
+                    if bound > best and bound != INF:
+                        best = bound
+                # d(v, t) >= d(L, t) - d(L, v)
+                if from_to_target != INF:
+                    bound = from_to_target - from_landmark[index]
+                    if bound > best:
+                        best = bound
+
+            return best
+
+        return heuristic
+
+
+    def estimate(self, index, target):
+        return self.for_target(target)(index)
+
+
+def nearest_target_distances(rows, columns, targets):
+    '''
+    The Manhattan distance transform of the targets, one pass per axis: along an axis, the distance to the nearest marked
+    cell at or before i is i + min(f[j] - j for j <= i), a running minimum, and likewise after i.
+
+    @return: a flat list with the Manhattan distance from every cell to the nearest target
+    '''
+
+    import numpy as np
+
+    table = np.full((rows, columns), rows + columns, dtype=np.int64)
+    table.flat[np.asarray(list(targets), dtype=np.int64)] = 0
+
+    for axis, length in ((0, rows), (1, columns)):
+        position = np.arange(length).reshape((-1, 1) if axis == 0 else (1, -1))
+        table = np.minimum.accumulate(table - position, axis=axis) + position
+        table = np.flip(np.minimum.accumulate(np.flip(table + position, axis), axis=axis), axis) - position
+
+    return table.ravel().tolist()
+
+
+def nearest_target_heuristic(rows, columns, targets, scale=1):
+    '''
+    The estimate of GridSearch.nearest_search(): scale times (the Manhattan distance to the nearest target - 1), because
+    the last move into a target costs nothing there. It changes by at most scale between neighbours, so it is consistent.
+
+    @param targets: the indices of the targets
+    @param scale: at most the cheapest weight of the map
+    @return: the function of a cell index
+    '''
+
+    if len(targets) <= NEAREST_TARGETS_LOOP:
+        points = [divmod(target, columns) for target in targets]
+
+        def heuristic(index):
+            row, column = divmod(index, columns)
+            nearest = min(abs(row - target_row) + abs(column - target_column) for target_row, target_column in points)
+            return scale * (nearest - 1) if nearest > 1 else 0
+
+        return heuristic
+
+    table = nearest_target_distances(rows, columns, targets)
+
+    def heuristic(index):
+        nearest = table[index]
+        return scale * (nearest - 1) if nearest > 1 else 0
+
+    return heuristic
+
+
+def make_heuristic(name, grid_map, overlay=None, landmarks=8):
+    '''
+    @param name: one of HEURISTICS
+    @return: the heuristic object
+    '''
+
+    if name == "manhattan":
+        return ManhattanHeuristic(grid_map, overlay)
+    if name == "scaled":
+        return ManhattanHeuristic(grid_map, overlay, scaled=True)
+    if name == "alt":
+        return LandmarkHeuristic(grid_map, overlay, landmarks)
+
+    raise ValueError(f"Unknown heuristic {name!r}, expected one of {HEURISTICS}")
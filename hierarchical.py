@@ -0,0 +1,559 @@
+'''
+@Author: Spyros Tsattalios
+
+Hierarchical pathfinding (HPA*) for large maps.
+
+The map is split into square clusters of cluster_size x cluster_size cells. Where two neighbouring clusters share a run of
+free cells on both sides of their border, the run gets one transition (in its middle) or two (at its ends, for long runs).
+The cells of the transitions are the nodes of an abstract graph:
+    - an inter edge crosses the border between the two cells of a transition and costs the weight of the cell it moves into
+    - an intra edge joins two nodes of the same cluster and costs the shortest distance between them inside the cluster
+
+A query connects the source and the target to the nodes of their clusters, searches the (small) abstract graph with A* and
+then refines every abstract edge into cells with a search that never leaves one cluster. That path must cross the
+borders at the transitions, so it can be much more expensive than the exact shortest path (e.g. a detour to the middle of
+a border). The planner then smooths it: an A* searches again only the corridor of the path, i.e. the clusters that it
+crosses and the clusters within `corridor` clusters of them. The corridor contains the refined path, so the smoothed path
+is never worse, and it is optimal whenever the exact shortest path stays inside the corridor. The paths are still
+near-optimal, not optimal; the planner reports how much the smoothing saved (smoothing_gain) and batch.py reports the gap
+against Dijkstra.
+
+The abstract graph is cached. The planner listens to the map (and to the overlay) and an edit only invalidates the cluster
+of the edited cell: its intra edges are computed again before the next query and, for a new obstacle, the transitions of
+its borders too (which also invalidates a neighbouring cluster if its transitions changed).
+'''
+
+from engine import PathResult, NoPathError
+from search import SearchStats, INF
+from heapq import heappush, heappop
+import time
+
+
+ENTRANCE_SPLIT = 6  # a run of free border cells at least this long gets two transitions instead of one
+
+
+class HierarchicalPlanner(object):
+
+    '''
+    HPA* on a GridMap. The abstract graph is built when the planner is created and kept up to date as the map changes.
+    '''
+
+    def __init__(self, grid_map, cluster_size=16, overlay=None, corridor=1):
+        '''
+        @param corridor: how many clusters around the clusters of the path the smoothing may use, None to not smooth the paths
+        '''
+
+        if cluster_size < 2:
+            raise ValueError("The clusters must be at least 2x2 cells")
+        if corridor is not None and corridor < 0:
+            raise ValueError("The corridor cannot be negative")
+
+        self.grid_map = grid_map
+        self.overlay = overlay
+        self.cluster_size = cluster_size
+        self.corridor = corridor
+        self.rows = grid_map.rows
+        self.columns = grid_map.columns
+
+        self.cluster_rows = (self.rows + cluster_size - 1) // cluster_size
+        self.cluster_columns = (self.columns + cluster_size - 1) // cluster_size
+
+        self.borders = {}  # (cluster, neighbouring cluster on the right / below) -> list of (cell, cell) transitions
+        self.transitions = {}  # node -> list of the nodes on the other side of its borders (the inter edges)
+        self.intra = {}  # cluster -> {node: [(node of the same cluster, distance), ...]}
+
+        # the clusters whose borders / intra edges must be computed again before the next query
+        self.dirty_borders = set()
+        self.dirty_clusters = set()
+
+        self.stats = SearchStats()  # the work of the last query
+        self.rebuilt_clusters = 0  # the number of clusters that the last query had to compute again
+        self.smoothing_gain = 0  # how much cheaper the smoothing made the path of the last query
+
+        for cluster in range(self.cluster_rows * self.cluster_columns):
+            for neighbour in self.forward_neighbours(cluster):
+                self.set_border(cluster, neighbour, self.find_transitions(cluster, neighbour))
+
+        for cluster in range(self.cluster_rows * self.cluster_columns):
+            self.intra[cluster] = self.find_intra_edges(cluster)
+
+        grid_map.add_listener(self)
+        if overlay is not None:
+            overlay.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map.
+        '''
+
+        self.grid_map.remove_listener(self)
+        if self.overlay is not None:
+            self.overlay.remove_listener(self)
+
+
+    # ================================================================================================================
+    # Clusters
+
+    def cluster_of(self, index):
+        row, column = divmod(index, self.columns)
+        return (row // self.cluster_size) * self.cluster_columns + column // self.cluster_size
+
+
+    def bounds(self, cluster):
+        '''
+        @return: the (first row, end row, first column, end column) of the cells of the cluster
+        '''
+
+        cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+        size = self.cluster_size
+        return (cluster_row * size, min((cluster_row + 1) * size, self.rows), cluster_column * size, min((cluster_column + 1) * size, self.columns))
+
+
+    def forward_neighbours(self, cluster):
+        '''
+        @return: the clusters on the right of and below the cluster (each border is stored once, under its first cluster)
+        '''
+
+        cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+        result = []
+        if cluster_column + 1 < self.cluster_columns:
+            result.append(cluster + 1)
+        if cluster_row + 1 < self.cluster_rows:
+            result.append(cluster + self.cluster_columns)
+        return result
+
+
+    def all_neighbours(self, cluster):
+        cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+        result = self.forward_neighbours(cluster)
+        if cluster_column > 0:
+            result.append(cluster - 1)
+        if cluster_row > 0:
+            result.append(cluster - self.cluster_columns)
+        return result
+
+
+    def nodes(self, cluster):
+        '''
+        @return: the abstract nodes (cell indices) that lie in the cluster
+        '''
+
+        return self.intra[cluster].keys()
+
+
+    def weight(self, index):
+        if self.overlay is not None and index in self.overlay.weights:
+            return self.overlay.weights[index]
+        return self.grid_map.weights[index]
+
+
+    def path_cost(self, path):
+        # the cost of a path of cell indices, as defined by GridMap.path_cost
+        return sum(self.weight(index) for index in path[1:-1])
+
+
+    # ================================================================================================================
+    # The abstract graph
+
+    def find_transitions(self, cluster, neighbour):
+        '''
+        @return: the list of (cell in cluster, cell in neighbour) transitions of the border between the two clusters
+        '''
+
+        blocked, columns = self.grid_map.blocked, self.columns
+        first_row, end_row, first_column, end_column = self.bounds(cluster)
+
+        # the pairs of cells that face each other across the border
+        if neighbour // self.cluster_columns == cluster // self.cluster_columns:  # vertical border, the neighbour is on the right
+            pairs = [(row * columns + end_column - 1, row * columns + end_column) for row in range(first_row, end_row)]
+        else:  # horizontal border
+            pairs = [((end_row - 1) * columns + column, end_row * columns + column) for column in range(first_column, end_column)]
+
+        # Let's split the border into the runs where both sides are free
+        runs = []
+        run = []
+        for a, b in pairs:
+            if blocked[a] or blocked[b]:
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append((a, b))
+        if run:
+            runs.append(run)
+
+        transitions = []
+        for run in runs:
+            if len(run) >= ENTRANCE_SPLIT:
+                transitions.append(run[0])
+                transitions.append(run[-1])
+            else:
+                transitions.append(run[len(run) // 2])
+
+        return transitions
+
+
+    def set_border(self, cluster, neighbour, transitions):
+        '''
+        This function will replace the transitions of a border and their inter edges.
+        '''
+
+        for a, b in self.borders.get((cluster, neighbour), []):
+            self.transitions[a].remove(b)
+            self.transitions[b].remove(a)
+            for cell in (a, b):
+                if not self.transitions[cell]:
+                    del self.transitions[cell]
+
+        self.borders[(cluster, neighbour)] = transitions
+
+        for a, b in transitions:
+            self.transitions.setdefault(a, []).append(b)
+            self.transitions.setdefault(b, []).append(a)
+
+
+    def find_intra_edges(self, cluster):
+        '''
+        @return: {node: [(node, distance), ...]} with the shortest distances inside the cluster between its nodes
+        '''
+
+        first_row, end_row, first_column, end_column = self.bounds(cluster)
+        columns = self.columns
+
+        nodes = set()
+        for neighbour in self.all_neighbours(cluster):
+            key = (cluster, neighbour) if neighbour > cluster else (neighbour, cluster)
+            for a, b in self.borders.get(key, []):
+                nodes.add(a if first_row <= a // columns < end_row and first_column <= a % columns < end_column else b)
+
+        edges = {}
+        for node in nodes:
+            distance, _ = self.cluster_search(node, cluster)
+            edges[node] = [(other, distance[other]) for other in nodes if other != node and other in distance]
+
+        return edges
+
+
+    def update(self):
+        '''
+        This function will compute again the parts of the abstract graph that the edits of the map invalidated.
+        '''
+
+        self.rebuilt_clusters = 0
+
+        for cluster in self.dirty_borders:
+            self.dirty_clusters.add(cluster)
+            for neighbour in self.all_neighbours(cluster):
+                key = (cluster, neighbour) if neighbour > cluster else (neighbour, cluster)
+                transitions = self.find_transitions(*key)
+                if transitions != self.borders[key]:
+                    self.set_border(key[0], key[1], transitions)
+                    self.dirty_clusters.add(neighbour)
+
+        for cluster in self.dirty_clusters:
+            self.intra[cluster] = self.find_intra_edges(cluster)
+
+        self.rebuilt_clusters = len(self.dirty_clusters)
+        self.dirty_borders = set()
+        self.dirty_clusters = set()
+
+
+    def obstacle_added(self, cell):
+        # the obstacle can close a transition of the borders of its cluster and changes the distances inside the cluster
+        self.dirty_borders.add(self.cluster_of(self.grid_map.index(cell)))
+
+
+    def obstacles_added(self, cells):
+        index = self.grid_map.index
+        self.dirty_borders.update(self.cluster_of(index(cell)) for cell in cells)
+
+
+    def weight_changed(self, cell, weight):
+        # a weight only changes the distances inside its cluster, the inter edges read the weights when they are searched
+        self.dirty_clusters.add(self.cluster_of(self.grid_map.index(cell)))
+
+
+    # ================================================================================================================
+    # Searches
+
+    def cluster_search(self, source, cluster, goal=None, reverse=False):
+        '''
+        Dijkstra from the source that never leaves the cluster.
+
+        @param goal: stop as soon as this cell is settled
+        @param reverse: False for the distances from the source, True for the distances to the source
+        @return: a (distance, parent) tuple of dictionaries of the cells that the search reached
+        '''
+
+        first_row, end_row, first_column, end_column = self.bounds(cluster)
+        blocked, columns = self.grid_map.blocked, self.columns
+        weight = self.weight
+        stats = self.stats
+
+        distance = {source: 0}
+        parent = {source: -1}
+        closed = set()
+        heap = [(0, source)]
+
+        while heap:
+            d, v = heappop(heap)
+            stats.pops += 1
+
+            if v in closed:
+                continue
+            closed.add(v)
+
+            if v == goal:
+                break
+            stats.expanded += 1
+
+            row, column = divmod(v, columns)
+            cost_v = weight(v)
+
+            for neighbour_row, neighbour_column in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                if not (first_row <= neighbour_row < end_row and first_column <= neighbour_column < end_column):
+                    continue
+
+                u = neighbour_row * columns + neighbour_column
+                if blocked[u] or u in closed:
+                    continue
+
+                # moving into a cell costs its weight, so the reverse search pays the weight of v to go from u to v
+                new_distance = d + (cost_v if reverse else weight(u))
+
+                if new_distance < distance.get(u, INF):
+                    distance[u] = new_distance
+                    parent[u] = v
+                    heappush(heap, (new_distance, u))
+                    stats.pushes += 1
+
+        return distance, parent
+
+
+    def abstract_search(self, source, target, source_edges, target_edges):
+        '''
+        A* on the abstract graph, with the source and the target connected to the nodes of their clusters.
+
+        @param source_edges: [(node, distance)] from the source to the nodes of its cluster (and to the target)
+        @param target_edges: {node: distance} from the nodes of the cluster of the target to the target
+        @return: the list of the abstract nodes from the source to the target, or None
+        '''
+
+        columns = self.columns
+        target_row, target_column = divmod(target, columns)
+        stats = self.stats
+
+        def heuristic(index):
+            row, column = divmod(index, columns)
+            return abs(row - target_row) + abs(column - target_column)
+
+        distance = {source: 0}
+        parent = {source: -1}
+        closed = set()
+        heap = [(heuristic(source), 0, source)]
+        counter = 1
+
+        while heap:
+            _, _, v = heappop(heap)
+            stats.pops += 1
+
+            if v == target:
+                path = [target]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+
+            if v in closed:
+                continue
+            closed.add(v)
+            stats.expanded += 1
+
+            if v == source:
+                edges = list(source_edges)
+                edges.extend((u, self.weight(u)) for u in self.transitions.get(v, ()))
+            else:
+                edges = list(self.intra[self.cluster_of(v)].get(v, ()))
+                edges.extend((u, self.weight(u)) for u in self.transitions.get(v, ()))
+                if v in target_edges:
+                    edges.append((target, target_edges[v]))
+
+            d = distance[v]
+            for u, cost in edges:
+                new_distance = d + cost
+                if new_distance < distance.get(u, INF):
+                    distance[u] = new_distance
+                    parent[u] = v
+                    heappush(heap, (new_distance + heuristic(u), counter, u))
+                    counter += 1
+                    stats.pushes += 1
+                    stats.peak_open = max(stats.peak_open, len(heap))
+
+        return None
+
+
+    def refine(self, abstract_path):
+        '''
+        @return: the cells of the abstract path, with every intra edge replaced by a search inside its cluster
+        '''
+
+        path = [abstract_path[0]]
+
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            if b in self.transitions.get(a, ()) and self.cluster_of(a) != self.cluster_of(b):
+                path.append(b)  # an inter edge: the two cells are neighbours
+                continue
+
+            _, parent = self.cluster_search(a, self.cluster_of(a), goal=b)
+            segment = [b]
+            while parent[segment[-1]] != -1:
+                segment.append(parent[segment[-1]])
+            path.extend(reversed(segment[:-1]))
+
+        return path
+
+
+    def corridor_of(self, path):
+        '''
+        @return: the set of the clusters that the path (of cell indices) crosses and of the clusters within self.corridor of them
+        '''
+
+        corridor = set()
+        for cluster in {self.cluster_of(index) for index in path}:
+            cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+            for row in range(max(0, cluster_row - self.corridor), min(self.cluster_rows, cluster_row + self.corridor + 1)):
+                for column in range(max(0, cluster_column - self.corridor), min(self.cluster_columns, cluster_column + self.corridor + 1)):
+                    corridor.add(row * self.cluster_columns + column)
+
+        return corridor
+
+
+    def corridor_search(self, source, target, corridor):
+        '''
+        A* from the source to the target that never leaves the clusters of the corridor. Every weight is at least 1, so the
+        Manhattan distance is admissible.
+
+        @return: the list of the cell indices of the path, or None if the target is not reachable inside the corridor
+        '''
+
+        blocked, columns, rows = self.grid_map.blocked, self.columns, self.rows
+        cluster_size, cluster_columns = self.cluster_size, self.cluster_columns
+        weight = self.weight
+        stats = self.stats
+        target_row, target_column = divmod(target, columns)
+
+        distance = {source: 0}
+        parent = {source: -1}
+        closed = set()
+        heap = [(0, source)]
+
+        while heap:
+            _, v = heappop(heap)
+            stats.pops += 1
+
+            if v in closed:
+                continue
+            closed.add(v)
+
+            if v == target:
+                path = [target]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+            stats.expanded += 1
+
+            row, column = divmod(v, columns)
+            d = distance[v]
+
+            for neighbour_row, neighbour_column in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                if not (0 <= neighbour_row < rows and 0 <= neighbour_column < columns):
+                    continue
+                if (neighbour_row // cluster_size) * cluster_columns + neighbour_column // cluster_size not in corridor:
+                    continue
+
+                u = neighbour_row * columns + neighbour_column
+                if blocked[u] or u in closed:
+                    continue
+
+                new_distance = d + weight(u)
+                if new_distance < distance.get(u, INF):
+                    distance[u] = new_distance
+                    parent[u] = v
+                    heappush(heap, (new_distance + abs(neighbour_row - target_row) + abs(neighbour_column - target_column), u))
+                    stats.pushes += 1
+                    stats.peak_open = max(stats.peak_open, len(heap))
+
+        return None
+
+
+    def smooth(self, path):
+        '''
+        @param path: the refined path (cell indices)
+        @return: the shortest path between its ends inside its corridor, which is never more expensive than the path
+        '''
+
+        smoothed = self.corridor_search(path[0], path[-1], self.corridor_of(path))
+        return path if smoothed is None else smoothed
+
+
+    def shortest_path(self, source=None, target=None):
+        '''
+        @param source: the start cell (defaults to the start point of the map)
+        @param target: the end cell (defaults to the end point of the map)
+        @return: a PathResult with the algorithm "hpa*" (its stats count the work of the query, not of the cached graph)
+        @raise NoPathError: if the abstract graph has no path between the source and the target
+        '''
+
+        start_time = time.perf_counter()
+        self.stats = SearchStats()
+
+        source = self.grid_map.index(self.grid_map.start_point if source is None else source)
+        target = self.grid_map.index(self.grid_map.end_point if target is None else target)
+
+        if self.grid_map.blocked[source] or self.grid_map.blocked[target]:
+            raise NoPathError("The source or the target is an obstacle")
+
+        self.update()
+
+        source_cluster, target_cluster = self.cluster_of(source), self.cluster_of(target)
+
+        # Let's connect the source and the target to the nodes of their clusters
+        distance, _ = self.cluster_search(source, source_cluster)
+        source_edges = [(node, distance[node]) for node in self.nodes(source_cluster) if node in distance and node != source]
+        if target in distance:
+            source_edges.append((target, distance[target]))  # the direct path inside the cluster
+
+        distance, _ = self.cluster_search(target, target_cluster, reverse=True)
+        target_edges = {node: distance[node] for node in self.nodes(target_cluster) if node in distance}
+
+        if source == target:
+            abstract_path = [source]
+        else:
+            abstract_path = self.abstract_search(source, target, source_edges, target_edges)
+
+        if abstract_path is None:
+            raise NoPathError("There is no valid path between the source and the target")
+
+        path = self.refine(abstract_path)
+        self.smoothing_gain = 0
+        if self.corridor is not None and len(path) > 2:
+            refined_cost = self.path_cost(path)
+            path = self.smooth(path)
+            self.smoothing_gain = refined_cost - self.path_cost(path)
+
+        path = [divmod(index, self.columns) for index in path]
+        self.stats.seconds = time.perf_counter() - start_time
+
+        return PathResult("hpa*", path, self.grid_map.path_cost(path, self.overlay), self.stats)
+
+
+def optimality_gap(hierarchical_result, exact_result):
+    '''
+    @return: how much more expensive the HPA* path is than the exact shortest path, as a fraction (0.05 is 5% more)
+    '''
+
+    if exact_result.cost == 0:
+        return 0.0 if hierarchical_result.cost == 0 else INF
+    return hierarchical_result.cost / exact_result.cost - 1
@@ -1,10 +1,24 @@
 from tkinter import messagebox
 from tkinter import ttk
 from tkinter import colorchooser
-from copy import deepcopy
+from tkinter import filedialog
+from engine import GridMap, Solver, NoPathError, PhaseTimer
+from search import INF
+from renderer import ButtonMapRenderer, CanvasMapRenderer
+from replanning import IncrementalPlanner
+from worker import SearchWorker
+from heuristics import make_heuristic
+from paths import EncodedPath
+from pathviewer import PathViewer
+from tiledviewer import TiledMapViewer
+from editing import rectangle_cells, line_cells, flood_fill, load_mask
+from distancefield import DistanceField
+from pathcache import PathCache
+from session import SessionRecorder
 import tkinter as tk
-import networkx as nx
 import random
+import json
+import os
 
 
 class ShortestPathFinder(object):
@@ -35,8 +49,28 @@ class ShortestPathFinder(object):
         self.hill_color = "#8B4513"
         self.mountain_color = "#FFC0CB"
         self.lake_color = "#0000FF"
+        self.hover_path_color = "#00FFFF"
+        
+        # the colors of the distance field, from the cells next to the destination to the most expensive ones
+        self.heatmap_colors = ["#FFFFCC", "#FFEDA0", "#FED976", "#FEB24C", "#FD8D3C", "#FC4E2A", "#E31A1C", "#BD0026", "#800026"]
 
         self.min_obstacles = 5  # the minimum number of obstacles that the user has to add to the map
+        self.max_button_cells = 900  # in "Auto" rendering, maps with more cells than this are drawn on a canvas instead of buttons
+        self.poll_interval = 50  # how often (in milliseconds) the window checks for the results of the background searches
+        self.sessions_directory = "sessions"  # with "Record the session", every round is recorded to a session log here (see session.py)
+        
+        # the names of the heuristics of the A* algorithm on the start screen and their names in heuristics.py
+        self.heuristic_names = {"Manhattan": "manhattan", "Scaled Manhattan": "scaled", "Landmarks (ALT)": "alt"}
+        
+        # the terrain patterns on the start screen and their names in terrain.py
+        self.terrain_patterns = {"Uniform": "uniform", "Clustered": "clustered"}
+        
+        # how the change of an area of attraction / repulsion fades around its centre, and its names in costfield.py
+        self.influence_falloffs = {"Linear": "linear", "Constant": "constant", "Gaussian": "gaussian"}
+        
+        # the tools to add obstacles (see editing.py). Every tool except "Click" adds all its obstacles in one batch.
+        # "Add destination" marks more destinations: the searches then find the path to the nearest of them
+        self.obstacle_tools = ["Click", "Paint", "Rectangle", "Line", "Fill terrain", "Add destination"]
         
         self.font = "Comic Sans MS"
         self.font_size = 18
@@ -125,6 +159,33 @@ class ShortestPathFinder(object):
         self.attraction_repulsion_label = tk.Label(self.input_frame, text="Include attraction/repulsion areas:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
         self.attraction_repulsion_label.grid(row=8, column=0, padx=self.base_padding, pady=self.base_padding)
         
+        # Let's create a label to ask the user how to draw the map
+        self.rendering_label = tk.Label(self.input_frame, text="Map rendering:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.rendering_label.grid(row=9, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to ask the user which heuristic the A* algorithm will use
+        self.heuristic_label = tk.Label(self.input_frame, text="A* heuristic:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.heuristic_label.grid(row=10, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to ask the user how the types of area are spread over the map
+        self.terrain_label = tk.Label(self.input_frame, text="Terrain pattern:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.terrain_label.grid(row=11, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to ask the user for the seed of the map
+        self.seed_label = tk.Label(self.input_frame, text="Seed (empty for a random map):", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.seed_label.grid(row=12, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create labels to ask the user how far the areas of attraction/repulsion reach and how their change fades
+        self.influence_radius_label = tk.Label(self.input_frame, text="Attraction/repulsion radius:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.influence_radius_label.grid(row=13, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        self.influence_falloff_label = tk.Label(self.input_frame, text="Attraction/repulsion falloff:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.influence_falloff_label.grid(row=14, column=0, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to ask the user if the rounds should be recorded to session logs (see session.py)
+        self.record_session_label = tk.Label(self.input_frame, text="Record the session:", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
+        self.record_session_label.grid(row=15, column=0, padx=self.base_padding, pady=self.base_padding)
+        
         # Entries section
         
         # Let's add an entry box to get the number of rows
@@ -173,6 +234,47 @@ class ShortestPathFinder(object):
         self.attraction_repulsion_combobox["values"] = ["Yes", "No"]
         self.attraction_repulsion_combobox.current(0)
         
+        # Let's add a combobox to choose between a button per cell and a single canvas for the whole map.
+        # "Auto" uses buttons for small maps and the canvas for maps with more than max_button_cells cells
+        self.rendering_combobox = ttk.Combobox(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width -1)
+        self.rendering_combobox.grid(row=9, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.rendering_combobox["values"] = ["Auto", "Buttons", "Canvas"]
+        self.rendering_combobox.current(0)
+        
+        # Let's add a combobox to choose the heuristic of the A* algorithm (see heuristics.py).
+        # Every choice is admissible, so A* still finds the shortest path; the tighter ones make it expand fewer cells
+        self.heuristic_combobox = ttk.Combobox(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width -1)
+        self.heuristic_combobox.grid(row=10, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.heuristic_combobox["values"] = list(self.heuristic_names)
+        self.heuristic_combobox.current(0)
+        
+        # Let's add a combobox to choose between independent random cells and regions of the same type of area (see terrain.py)
+        self.terrain_combobox = ttk.Combobox(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width -1)
+        self.terrain_combobox.grid(row=11, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.terrain_combobox["values"] = list(self.terrain_patterns)
+        self.terrain_combobox.current(0)
+        
+        # Let's add an entry box to get the seed, so that the same map can be generated again
+        self.seed_entry = tk.Entry(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width)
+        self.seed_entry.grid(row=12, column=1, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's add an entry box to get the radius of the areas of attraction/repulsion (1 changes a cell and its 4 neighbours)
+        self.influence_radius_entry = tk.Entry(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width)
+        self.influence_radius_entry.grid(row=13, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.influence_radius_entry.insert(0, "1")
+        
+        # Let's add a combobox to choose the falloff of the areas of attraction/repulsion (see costfield.py)
+        self.influence_falloff_combobox = ttk.Combobox(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width -1)
+        self.influence_falloff_combobox.grid(row=14, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.influence_falloff_combobox["values"] = list(self.influence_falloffs)
+        self.influence_falloff_combobox.current(0)
+        
+        # Let's add a combobox to record every round to a session log that replay.py can time again. Nothing is recorded by default
+        self.record_session_combobox = ttk.Combobox(self.input_frame, font=(self.font, self.font_size), width=self.base_entry_width -1)
+        self.record_session_combobox.grid(row=15, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.record_session_combobox["values"] = ["No", "Yes"]
+        self.record_session_combobox.current(0)
+        
         # Let's add colorchooser buttons for each area
         
         self.road_color_button = tk.Button(self.input_frame, text="Choose the road color", font=(self.font, self.font_size), bg=self.road_color, fg=self.fg, activebackground=self.road_color, activeforeground=self.fg, padx=2 * self.base_padding, command=lambda: self.choose_color("road"))
@@ -201,9 +303,22 @@ class ShortestPathFinder(object):
         self.start_button = tk.Button(self.buttons_frame, text="Start Game", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.submit_form)
         self.start_button.grid(row=0, column=0, padx=self.base_padding, pady=self.base_padding)
         
+        # Let's create a button to play on a map that was saved before
+        self.load_button = tk.Button(self.buttons_frame, text="Load Map", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.load_map)
+        self.load_button.grid(row=0, column=1, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a button to browse a tiled map that is too big for the game (see tiledmap.py)
+        self.tiled_button = tk.Button(self.buttons_frame, text="Open Tiled Map", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.open_tiled_map)
+        self.tiled_button.grid(row=0, column=2, padx=self.base_padding, pady=self.base_padding)
+        
         # Let's create a button to exit the game
         self.exit_button = tk.Button(self.buttons_frame, text="Exit Game", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.root.destroy)
-        self.exit_button.grid(row=0, column=1, padx=self.base_padding, pady=self.base_padding)
+        self.exit_button.grid(row=0, column=3, padx=self.base_padding, pady=self.base_padding)
+        
+        self.renderer = None  # the widgets of the map, kept from round to round (see start_game)
+        self.worker = None  # the thread of the searches of the current round
+        self.poll_id = None  # the pending root.after call of poll_search
+        self.recorder = None  # the session log of the current round
         
         self.root.mainloop()
         
@@ -245,16 +360,23 @@ class ShortestPathFinder(object):
             self.hill_cost = int(self.hill_cost_entry.get())
             self.mountain_cost = int(self.mountain_cost_entry.get())
             self.lake_cost = int(self.lake_cost_entry.get())
-            self.attraction_repulsion = self.attraction_repulsion_combobox.get()
+            self.seed = int(self.seed_entry.get()) if self.seed_entry.get().strip() else None
+            self.terrain_pattern = self.terrain_combobox.get()
+            
+            if self.terrain_pattern not in self.terrain_patterns:
+                messagebox.showerror("Error", "Please choose one of the terrain patterns of the list!")
+                return
             
             if self.rows < 1 or self.columns < 1 or self.road_cost < 1 or self.meadow_cost < 1 or self.forest_cost < 1 or self.hill_cost < 1 or self.mountain_cost < 1 or self.lake_cost < 1:
                 messagebox.showerror("Error", "Please enter positive integer values!")
                 return
             
-            if self.attraction_repulsion == "Yes":
-                self.attraction_repulsion = True
-            else:
-                self.attraction_repulsion = False
+            if self.rows * self.columns < 2:
+                messagebox.showerror("Error", "The map needs at least two cells, one for the start point and one for the end point!")
+                return
+            
+            if not self.read_options():
+                return
             
             # Let's create a list of dictionaries that will hold the cost of each area, the type of the area and the color that represents the area
             # We will use this list to choose a random area for each square on the map
@@ -267,6 +389,7 @@ class ShortestPathFinder(object):
                 {"weight": self.lake_cost, "type": "lake", "color": self.lake_color}
             ]
             
+            self.map_file = None
             self.start_game()
             
         except ValueError:
@@ -274,81 +397,172 @@ class ShortestPathFinder(object):
             return
 
     
-    def start_game(self):
-        # Let's first of all destroy everything that is in the root window
-        self.welcome_label.destroy()
-        self.input_frame.destroy()
-        self.buttons_frame.destroy()
+    def read_options(self):
+        # Let's get the options of the comboboxes, which apply to both a new and a loaded map
+        self.attraction_repulsion = self.attraction_repulsion_combobox.get() == "Yes"
+        self.record_session = self.record_session_combobox.get() == "Yes"
+        self.rendering = self.rendering_combobox.get()
+        self.heuristic_name = self.heuristic_combobox.get()
+        
+        if self.heuristic_name not in self.heuristic_names:
+            messagebox.showerror("Error", "Please choose one of the heuristics of the list!")
+            return False
+        
+        self.influence_falloff = self.influence_falloff_combobox.get()
+        if self.influence_falloff not in self.influence_falloffs:
+            messagebox.showerror("Error", "Please choose one of the falloffs of the list!")
+            return False
+        
+        try:
+            self.influence_radius = int(self.influence_radius_entry.get())
+        except ValueError:
+            self.influence_radius = -1
+        if self.influence_radius < 0:
+            messagebox.showerror("Error", "Please enter a non-negative integer radius!")
+            return False
+        
+        return True
+    
+    
+    def load_map(self):
+        
+        file_name = filedialog.askopenfilename(title="Load map", filetypes=[("Map files", "*.spmap *.json"), ("All files", "*.*")])
+        if not file_name or not self.read_options():
+            return
+        
+        # A map file (see mapfile.py) is memory-mapped, so even a huge map opens at once. JSON maps are supported too
+        try:
+            grid_map = GridMap.load(file_name)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror("Error", f"The map could not be loaded: {error}")
+            return
+        
+        self.rows = grid_map.rows
+        self.columns = grid_map.columns
+        
+        # the costs come from the map, the colors from the start screen
+        colors = {"road": self.road_color, "meadow": self.meadow_color, "forest": self.forest_color, "hill": self.hill_color, "mountain": self.mountain_color, "lake": self.lake_color}
+        self.areas = [{"weight": area["weight"], "type": area["type"], "color": colors.get(area["type"], self.road_color)} for area in grid_map.areas]
+        
+        self.map_file = file_name
+        self.start_game(grid_map)
+    
+    
+    def open_tiled_map(self):
         
-        # Let's create buttons that will represent the map of the game. We will use a list of lists to store the buttons of the map
-        self.map = []
+        directory = filedialog.askdirectory(title="Open tiled map")
+        if not directory:
+            return
         
-        # Let's create a graph that will represent the map. Each node will correspond to a button on the map
-        # we will use a directed graph because all edges are bidirectional BUT the cost of each edge between the same two nodes
-        # is not the same e.g. (1, 2) -> (2, 2) and (2, 2) -> (1, 2) have different costs
+        # The tiled map stays on disk: the viewer only reads the tiles that it shows and the tiles that the searches reach
+        colors = {"road": self.road_color, "meadow": self.meadow_color, "forest": self.forest_color, "hill": self.hill_color, "mountain": self.mountain_color, "lake": self.lake_color}
+        try:
+            TiledMapViewer(self.root, directory, colors, obstacle_color=self.obstacle_color, path_color=self.path_color, point_color=self.start_point_color, font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg, width=self.width - 100, height=self.height - 200, poll_interval=self.poll_interval)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror("Error", f"The tiled map could not be opened: {error}")
+    
+    
+    def save_map(self):
         
-        self.graph = nx.DiGraph()  
-        self.old_graph = None  # we will use this variable to keep a copy of the graph before the user adds areas of attraction or repulsion
+        file_name = filedialog.asksaveasfilename(title="Save map", defaultextension=".spmap", filetypes=[("Map files", "*.spmap"), ("JSON files", "*.json")])
+        if not file_name:
+            return
+        
+        try:
+            self.grid_map.save(file_name)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Error", f"The map could not be saved: {error}")
+    
+    
+    def start_game(self, grid_map=None):
+        # Let's first of all hide the start screen. Its widgets are kept for the next round (see play_again)
+        self.welcome_label.pack_forget()
+        self.input_frame.pack_forget()
+        self.buttons_frame.pack_forget()
+        
+        # Let's create the map of the game. Each cell of the map will correspond to a button and gets a random type of area
+        # (road, meadow, forest, hill, mountain, lake). The map keeps the weight of each cell, the obstacles and the start / end points
+        # and it is the one that the shortest path algorithms will run on
+        
+        # The timer keeps the wall time of every phase of the game (map, solvers, searches), see the statistics at the end
+        self.timer = PhaseTimer()
+        
+        if grid_map is None:
+            from terrain import generate_map  # NumPy is only imported when the first map is generated
+            
+            # a map without a seed gets a random one, so its session log can generate the same map again
+            self.map_seed = self.seed if self.seed is not None else random.randrange(2 ** 32)
+            with self.timer.phase("generate map"):
+                self.grid_map = generate_map(self.rows, self.columns, self.areas, pattern=self.terrain_patterns[self.terrain_pattern], seed=self.map_seed)
+            
+            # a new map gets the radius and the falloff of the start screen for its areas of attraction/repulsion
+            self.grid_map.overlay.radius = self.influence_radius
+            self.grid_map.overlay.falloff = self.influence_falloffs[self.influence_falloff]
+        else:
+            # a loaded map keeps the radius and the falloff that its areas were added with
+            self.grid_map = grid_map
+        
+        # The solvers follow the map as the user adds obstacles and areas of attraction/repulsion,
+        # so pressing "Find shortest path" only runs the searches.
+        # The areas of attraction/repulsion are kept in an overlay on top of the weights of the map, so one solver uses the
+        # map with the areas (grid_map.overlay) and the other uses the map without them, with no copy of the map
+        # The landmark tables of the ALT heuristic are computed by the first A* search, after the user has edited the map.
+        # The two solvers share a path cache: without areas of attraction/repulsion they search the same cost grid, so the
+        # searches "without areas" are answered from the cache
+        self.path_cache = PathCache(self.grid_map)
+        with self.timer.phase("set up solver"):
+            self.solver = Solver(self.grid_map, overlay=self.grid_map.overlay, heuristic=make_heuristic(self.heuristic_names[self.heuristic_name], self.grid_map, self.grid_map.overlay), cache=self.path_cache)
+        with self.timer.phase("set up solver without areas"):
+            self.old_solver = Solver(self.grid_map, heuristic=make_heuristic(self.heuristic_names[self.heuristic_name], self.grid_map), cache=self.path_cache)
+        
+        self.start_recording()
         
         # Initializations
         
         # keep track of the number of buttons clicked to check if the user has clicked on the start and end points and if he has added some obstacles
         self.clicked_buttons_count = 0
         
-        self.start_point = None  # a tuple that will hold the coordinates of the start point
-        self.end_point = None
-        self.obstacles = []  # a list that will hold the coordinates of the obstacles
+        self.attraction_fg_color = "cyan"
+        self.repulsion_fg_color = "red"
         
         if self.attraction_repulsion:
             self.obstacles_bind_still = True  # Initialization, this variable will turn to False when the user clicks to add the first area of attraction or repulsion
-            self.attraction_areas = []
-            self.repulsion_areas = []
-            self.max_attraction_areas = 5
-            self.max_repulsion_areas = 5
-            self.attraction_fg_color = "cyan"
-            self.repulsion_fg_color = "red"
-            self.attraction_cost_mult = 0.5
-            self.attraction_cost_mult_adj = 0.75
-            self.repulsion_cost_mult = 2
-            self.repulsion_cost_mult_adj = 1.5
-            
-        # Let's create a frame to hold the buttons
-        self.buttons_frame = tk.Frame(self.root, bg=self.bg)
-        self.buttons_frame.pack(pady=self.base_padding)
-        
-        for i in range(self.rows):
             
-            self.map.append([])
+        # Let's draw the map. Each cell shows its cost and its background color corresponds to the type of the area
+        use_canvas = self.rendering == "Canvas" or (self.rendering == "Auto" and self.rows * self.columns > self.max_button_cells)
+        renderer_class = CanvasMapRenderer if use_canvas else ButtonMapRenderer
+        
+        # The widgets of the previous round are reused when the new map has the same size: only their colors and texts change
+        if isinstance(self.renderer, renderer_class) and (self.renderer.grid_map.rows, self.renderer.grid_map.columns) == (self.rows, self.columns):
+            with self.timer.phase("reset map widgets"):
+                self.renderer.reset(self.grid_map, self.areas)
+            self.map_frame.pack(pady=self.base_padding)
+        
+        else:
+            if self.renderer is not None:
+                self.map_frame.destroy()
             
-            for j in range(self.columns):
+            # Let's create a frame to hold the map
+            self.map_frame = tk.Frame(self.root, bg=self.bg)
+            self.map_frame.pack(pady=self.base_padding)
             
-                # Each button will have a text that will represent the cost of the specific area
-                # The background color of the button will correspond to the type of the area
-                
-                # each button in the map will correspond to a specific area (road, meadow, forest, hill, mountain, lake) based on chance
-                
-                choice = random.choices(self.areas)[0]  # we will use random.choices() to choose a random area from the list of areas
-                new_button = tk.Button(self.buttons_frame, text=choice["weight"], font=(self.font, self.font_size), bg=choice["color"], fg=self.fg, activebackground=choice['color'], activeforeground="white", width=self.box_width, height=self.box_height)
-                
-                # let's add additional attributes to each button to keep track of the row and column that the button is in
-                new_button.row = i
-                new_button.column = j
-                
-                # Let's add the the corresponding node to the graph. The node will be represented via the coordinates of the corresponding button in the map
-                # We will use the coordinates of the button as the name of the node. We will also add the weight of the respective area as an extra
-                # attribute to the node to know the cost of each node. Each node will be represented as a tuple (row, column)
-                
-                self.graph.add_node((i, j), weight=choice["weight"])
-                
-                # let's add the button to the map list and place it in the buttons_frame
-                self.map[i].append(new_button)
-                self.map[i][j].grid(row=i, column=j, padx=0.2 * self.base_padding, pady=0.2 * self.base_padding)
-                self.map[i][j].bind("<Button-1>", self.change_area)  # we will bind the left mouse button to each button so that the user can set the start and end points and add obstacles
-
-                # Let's also bind the right and middle mouse buttons to each button if the user wants to include areas of attraction and repulsion
-                if self.attraction_repulsion:
-                    self.map[i][j].bind("<Button-3>", self.attraction)  # we will bind the right mouse button to each button so that the user can add areas of attraction
-                    self.map[i][j].bind("<Button-2>", self.repulsion)  # we will bind the middle mouse button to each button so that the user can add areas of repulsion
+            with self.timer.phase("create map widgets"):
+                if use_canvas:  # a single canvas for the whole map, the clicks are mapped to cells from their coordinates
+                    self.renderer = CanvasMapRenderer(self.map_frame, self.grid_map, self.areas, font=(self.font, self.font_size), fg=self.fg, max_width=int(0.95 * self.width), max_height=int(0.7 * self.height))
+                else:  # a button for each cell of the map
+                    self.renderer = ButtonMapRenderer(self.map_frame, self.grid_map, self.areas, font=(self.font, self.font_size), fg=self.fg, box_width=self.box_width, box_height=self.box_height, padding=0.2 * self.base_padding)
+        
+        # we will bind the left mouse button so that the user can set the start and end points and add obstacles.
+        # A press, a drag and a release of the left button go to the obstacle tool (see press_cell)
+        # Let's also bind the right and middle mouse buttons if the user wants to include areas of attraction and repulsion
+        self.on_left_click = self.change_area
+        self.stroke = None  # the cells of the current drag of the left button
+        self.planner = None  # the planner that repairs the path after "Keep editing"
+        self.destinations = []  # the destinations that the user marked after the first one (grid_map.end_point)
+        self.distance_field = None  # the cost-to-go field of the destinations, computed by "Show distance field"
+        self.renderer.bind_drag(on_press=self.press_cell, on_drag=self.drag_cell, on_release=self.release_cell)
+        if self.attraction_repulsion:
+            self.renderer.bind_clicks(on_middle=self.repulsion, on_right=self.attraction)
                 
         # Let's create a frame to hold the buttons
         self.bottom_frame = tk.Frame(self.root, bg=self.bg)
@@ -358,17 +572,70 @@ class ShortestPathFinder(object):
         self.instructions_label = tk.Label(self.bottom_frame, text="Left click to set the source", font=(self.font, self.font_size), bg=self.bg, fg=self.fg)
         self.instructions_label.grid(row=0, column=0, padx=self.base_padding, pady=self.base_padding)
         
+        self.create_tools(row=2)
+        
+        if grid_map is not None:
+            self.show_loaded_map()
+    
     
-    def change_area(self, event):
-        # Let's get the button that the user clicked
-        button = event.widget
-        button_row = button.row
-        button_column = button.column
+    def start_recording(self):
+        # The map and the options of the round are the first line of its session log, every action of the user is a line after it
         
-        button_coordinates = (button_row, button_column)
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        
+        if not self.record_session or self.sessions_directory is None:
+            return
+        
+        if self.map_file is not None:
+            header = {"file": os.path.abspath(self.map_file)}
+        else:
+            header = {"rows": self.rows, "columns": self.columns, "areas": [{"weight": area["weight"], "type": area["type"]} for area in self.areas], "pattern": self.terrain_patterns[self.terrain_pattern], "seed": self.map_seed, "radius": self.influence_radius, "falloff": self.influence_falloffs[self.influence_falloff]}
+        header.update({"heuristic": self.heuristic_names[self.heuristic_name], "attraction_repulsion": self.attraction_repulsion})
+        
+        # the game goes on without a log if it cannot be written
+        try:
+            self.recorder = SessionRecorder.in_directory(self.sessions_directory, header)
+        except OSError:
+            self.recorder = None
+    
+    
+    def record(self, kind, *args):
+        if self.recorder is not None:
+            self.recorder.record(kind, *args)
+    
+    
+    def show_loaded_map(self):
+        # A loaded map can already have its source, destination, obstacles and areas of attraction / repulsion
+        grid_map = self.grid_map
+        
+        if grid_map.start_point is None:
+            grid_map.end_point = None  # the user sets the source first, then the destination
+        
+        self.renderer.configure_cells(grid_map.obstacles, bg=self.obstacle_color, text="X")
+        
+        for index, weight in grid_map.overlay.weights.items():
+            attraction = weight < grid_map.weights[index]
+            self.renderer.configure_cell(divmod(index, self.columns), text=f"{'A' if attraction else 'R'}.{weight}", fg=self.attraction_fg_color if attraction else self.repulsion_fg_color)
+        
+        if grid_map.start_point is not None:
+            self.clicked_buttons_count = 1
+            self.renderer.configure_cell(grid_map.start_point, bg=self.start_point_color, text="S", fg="black")
+            self.instructions_label.configure(text="Left click to set the destination")
+        
+        if grid_map.end_point is not None:
+            self.clicked_buttons_count = 2 + len(grid_map.obstacles)
+            self.renderer.configure_cell(grid_map.end_point, bg=self.end_point_color, text="F", fg="black")
+            self.instructions_label.configure(text=f"Left click to to add some obstacles. Add at least {self.min_obstacles} obstacles.")
+            self.show_find_button()
+        
+    
+    def change_area(self, button_coordinates):
+        # button_coordinates is the (row, column) of the cell that the user clicked
         
         # Let's check if the user clicked on a button that he has already clicked
-        if (button_coordinates == self.start_point) or (button_coordinates == self.end_point) or (button_coordinates in self.obstacles):
+        if self.is_end_point(button_coordinates) or self.grid_map.is_obstacle(button_coordinates):
             return
         
         # Let's increment the clicked_buttons_count variable
@@ -377,372 +644,667 @@ class ShortestPathFinder(object):
         if self.clicked_buttons_count == 1:  # the first button that the user clicks will be the start point
             
             # Let's change the color of the button to represent the start point
-            button.configure(bg=self.start_point_color, text="S", fg="black")
-            self.start_point = (button_row, button_column)
+            self.renderer.configure_cell(button_coordinates, bg=self.start_point_color, text="S", fg="black")
+            self.grid_map.start_point = button_coordinates
             self.instructions_label.configure(text="Left click to set the destination")
+            self.record("source", *button_coordinates)
         
         elif self.clicked_buttons_count == 2:  # the second button that the user clicks will be the end point
             
             # Let's change the color of the button to represent the end point
-            button.configure(bg=self.end_point_color, text="F", fg="black")
-            self.end_point = (button_row, button_column)
+            self.renderer.configure_cell(button_coordinates, bg=self.end_point_color, text="F", fg="black")
+            self.grid_map.end_point = button_coordinates
             self.instructions_label.configure(text=f"Left click to to add some obstacles. Add at least {self.min_obstacles} obstacles.")
+            self.record("end point", *button_coordinates)
         
         else:  # the rest of the buttons that the user clicks will be obstacles
-            button.configure(bg=self.obstacle_color, text="X")  # change the bg color of the button to represent an obstacle
-            self.obstacles.append((button_row, button_column))  # add the coordinates of the obstacle to the obstacles list
-            self.graph.remove_node((button_row, button_column))  # remove the respective node from the graph
+            self.renderer.configure_cell(button_coordinates, bg=self.obstacle_color, text="X")  # change the bg color of the cell to represent an obstacle
+            self.grid_map.add_obstacle(button_coordinates)  # add the coordinates of the obstacle to the obstacles of the map
+            self.record("obstacle", *button_coordinates)
             
+        self.show_find_button()
+    
+    
+    def show_find_button(self):
         # After the user has added some obstacles we will allow him to start the game by clicking a button
-        if len(self.obstacles) >= self.min_obstacles:
+        if len(self.grid_map.obstacles) >= self.min_obstacles:
             self.instructions_label.configure(text=f"Right click to add areas of attraction or middle click to add areas of repulsion.")
             self.start_button = tk.Button(self.bottom_frame, text="Find shortest path", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.find_shortest_path)
             self.start_button.grid(row=1, column=0, padx=self.base_padding, pady=self.base_padding)
     
     
-    def update_adjacent_node(self, button_row, button_column, multiplier):
+    def targets(self):
+        # the first destination and the ones that the user added with the "Add destination" tool
+        return [self.grid_map.end_point] + self.destinations
+    
+    
+    def is_end_point(self, cell):
+        return cell == self.grid_map.start_point or cell == self.grid_map.end_point or cell in self.destinations
+    
+    
+    def create_tools(self, row, destinations=True):
         
-        if multiplier > 1:  # the user wants to add an area of repulsion
-            fg_color = self.repulsion_fg_color
-            letter = "R"  # R for repulsion
-        else:  # the user wants to add an area of attraction
-            fg_color = self.attraction_fg_color
-            letter = "A"  # A for attraction
+        # Let's create a frame with the obstacle tools under the instructions
+        self.tools_frame = tk.Frame(self.bottom_frame, bg=self.bg)
+        self.tools_frame.grid(row=row, column=0, columnspan=7, padx=self.base_padding, pady=self.base_padding)
         
-        if (button_row, button_column) not in self.obstacles:
-            
-            node = self.graph.nodes[(button_row, button_column)]
-            current_weight = node['weight']
-            
-            new_weight = max(int(current_weight * multiplier), 1)
-            
-            self.graph.nodes[(button_row, button_column)]['weight'] = new_weight
-            
-            self.map[button_row][button_column].configure(text=f"{letter}.{new_weight}", fg=fg_color)
+        self.tool_label = tk.Label(self.tools_frame, text="Left click tool:", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.tool_label.grid(row=0, column=0, padx=self.base_padding)
+        
+        self.tool_combobox = ttk.Combobox(self.tools_frame, font=(self.font, int(0.8 * self.font_size)), width=self.base_entry_width, state="readonly")
+        self.tool_combobox.grid(row=0, column=1, padx=self.base_padding)
+        self.tool_combobox["values"] = self.obstacle_tools if destinations else [tool for tool in self.obstacle_tools if tool != "Add destination"]
+        self.tool_combobox.current(0)
+        
+        # Let's create a button to add the obstacles of a mask file
+        self.load_mask_button = tk.Button(self.tools_frame, text="Load obstacle mask", font=(self.font, int(0.8 * self.font_size), "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.load_obstacle_mask)
+        self.load_mask_button.grid(row=0, column=2, padx=self.base_padding)
     
     
-    def attraction(self, event):
-        # Let's get the button that the user clicked
-        button = event.widget
-        button_row = button.row
-        button_column = button.column
-        button_coordinates = (button_row, button_column)
+    def press_cell(self, cell):
         
-        # if the user hasn't added the minimum required obstacles yet, we will not allow him to add areas of attraction
-        if len(self.obstacles) < self.min_obstacles:
+        tool = self.tool_combobox.get() if self.tools_frame.winfo_exists() else "Click"
+        
+        # the source and the destination are always set with single clicks
+        if tool == "Click" or self.grid_map.end_point is None:
+            self.stroke = None
+            self.on_left_click(cell)
             return
-
-        # Let's check if the user clicked on a button that he has already clicked
-        if (button_coordinates == self.start_point) or (button_coordinates == self.end_point) or (button_coordinates in self.obstacles) or (button_coordinates in self.attraction_areas) or (button_coordinates in self.repulsion_areas):
+        
+        if tool == "Add destination":
+            self.stroke = None
+            self.add_destination(cell)
             return
         
-        # Let's check if the user has already added the maximum number of attraction areas
-        if len(self.attraction_areas) == self.max_attraction_areas:
+        self.stroke_tool = tool
+        self.stroke = [cell]
+        if tool == "Paint":
+            self.preview_obstacles(self.stroke)
+    
+    
+    def drag_cell(self, cell):
+        
+        if self.stroke is None or self.stroke_tool != "Paint" or cell == self.stroke[-1]:
             return
-
-        # if the above conditions are passed, we will allow the user to add an area of attraction
         
-        # the moment the user starts adding areas of attraction or repulsion, we will make the buttons left-unclickable to prevent the user from adding more obstacles
-        if self.obstacles_bind_still:
-            self.obstacles_bind_still = False
-            # keep a copy the graph before the user starts adding areas of attraction or repulsion to compare the two later
-            self.old_graph = deepcopy(self.graph)
-            
-            for row in self.map:
-                for button in row:
-                    button.unbind("<Button-1>")  # unbind the left mouse button from each button so that the user cannot add more obstacles
+        # a fast drag skips cells, so the cells between two events are joined with a line
+        new_cells = line_cells(self.stroke[-1], cell)[1:]
+        self.stroke.extend(new_cells)
+        self.preview_obstacles(new_cells)
+    
+    
+    def release_cell(self, cell):
         
-        # Let's add the coordinates of the area of attraction to the attraction_areas list
-        self.attraction_areas.append(button_coordinates)
+        if self.stroke is None:
+            return
         
-        # the button that the user clicked will be an area of attraction
-        # the button itself will have a reduction of 50% in its cost and the buttons around it will have a reduction of 25% in their cost
-                    
-        self.update_adjacent_node(button_row, button_column, self.attraction_cost_mult)
+        start = self.stroke[0]
+        if self.stroke_tool == "Paint":
+            cells = self.stroke
+        elif self.stroke_tool == "Rectangle":
+            cells = rectangle_cells(start, cell)
+        elif self.stroke_tool == "Line":
+            cells = line_cells(start, cell)
+        else:  # "Fill terrain": the region of the type of area of the cell where the button was pressed
+            cells = flood_fill(self.grid_map, start)
+        
+        self.stroke = None
+        self.add_obstacles(cells)
+    
+    
+    def add_destination(self, cell):
         
-        # Update the adjacent nodes of the button that the user clicked
+        if self.is_end_point(cell) or self.grid_map.is_obstacle(cell):
+            return
         
-        # Let's check if the node is not in the first row
-        if button_row != 0:
-            self.update_adjacent_node(button_row - 1, button_column, self.attraction_cost_mult_adj)
-            
-        # Let's check if the node is not in the last row
-        if button_row != self.rows - 1:            
-            self.update_adjacent_node(button_row + 1, button_column, self.attraction_cost_mult_adj)
-
-        # Let's check if the node is not in the first column
-        if button_column != 0:
-            self.update_adjacent_node(button_row, button_column - 1, self.attraction_cost_mult_adj)
-            
-        # Let's check if the node is not in the last column
-        if button_column != self.columns - 1:
-            self.update_adjacent_node(button_row, button_column + 1, self.attraction_cost_mult_adj)
-            
+        # Let's change the color of the button like the first destination
+        self.renderer.configure_cell(cell, bg=self.end_point_color, text="F", fg="black")
+        self.destinations.append(cell)
+        self.record("destination", *cell)
+    
+    
+    def can_be_obstacle(self, cell):
+        return not self.is_end_point(cell) and self.grid_map.is_free(cell)
+    
+    
+    def preview_obstacles(self, cells):
+        # the painted cells are shown at once, they become obstacles when the button is released
+        self.renderer.configure_cells([cell for cell in cells if self.can_be_obstacle(cell)], bg=self.obstacle_color)
+    
     
-    def repulsion(self, event):
-        # Let's get the button that the user clicked
-        button = event.widget
-        button_row = button.row
-        button_column = button.column
-        button_coordinates = (button_row, button_column)
+    def add_obstacles(self, cells):
         
-        # if the user hasn't added the minimum required obstacles yet, we will not allow him to add areas of repulsion
-        if len(self.obstacles) < self.min_obstacles:
+        # the map and its listeners are updated once and the renderer paints all the new obstacles in one batch
+        added = self.grid_map.add_obstacles([cell for cell in cells if not self.is_end_point(cell)])
+        if not added:
             return
-
-        # Let's check if the user clicked on a button that he has already clicked
-        if (button_coordinates == self.start_point) or (button_coordinates == self.end_point) or (button_coordinates in self.obstacles) or (button_coordinates in self.attraction_areas) or (button_coordinates in self.repulsion_areas):
+        
+        self.record("obstacles", [self.grid_map.index(cell) for cell in added])
+        self.renderer.configure_cells(added, bg=self.obstacle_color, text="X")
+        
+        if self.planner is not None:
+            self.replan()
+        else:
+            self.clicked_buttons_count += len(added)
+            self.show_find_button()
+    
+    
+    def load_obstacle_mask(self):
+        
+        if self.grid_map.end_point is None:
+            messagebox.showinfo("Obstacle mask", "Please set the source and the destination first.")
+            return
+        
+        file_name = filedialog.askopenfilename(title="Load obstacle mask", filetypes=[("Mask files", "*.txt *.npy"), ("All files", "*.*")])
+        if not file_name:
             return
         
-        # Let's check if the user has already added the maximum number of repulsion areas
-        if len(self.repulsion_areas) == self.max_repulsion_areas:
+        try:
+            cells = load_mask(file_name, self.rows, self.columns)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Error", f"The mask could not be loaded: {error}")
             return
+        
+        self.add_obstacles(cells)
+    
+    
+    def add_influence_area(self, button_coordinates, attraction):
+        # button_coordinates is the (row, column) of the cell that the user clicked
+        # it returns the list of (cell, new_weight) tuples of the cells that changed, empty if no area was added
+        
+        # if the user hasn't added the minimum required obstacles yet, we will not allow him to add areas of attraction or repulsion
+        if len(self.grid_map.obstacles) < self.min_obstacles:
+            return []
 
-        # if the above conditions are passed, we will allow the user to add an area of repulsion
+        # Let's check if the user clicked on a button that he has already clicked
+        if self.is_end_point(button_coordinates) or self.grid_map.is_obstacle(button_coordinates) or (button_coordinates in self.grid_map.attraction_areas) or (button_coordinates in self.grid_map.repulsion_areas):
+            return []
+        
+        # if the above conditions are passed, we will allow the user to add the area
         
         # the moment the user starts adding areas of attraction or repulsion, we will make the buttons left-unclickable to prevent the user from adding more obstacles
         if self.obstacles_bind_still:
             self.obstacles_bind_still = False
-            # keep a copy the graph before the user starts adding areas of attraction or repulsion to compare the two later
-            self.old_graph = deepcopy(self.graph)
             
-            for row in self.map:
-                for button in row:
-                    button.unbind("<Button-1>")  # unbind the left mouse button from each button so that the user cannot add more obstacles
-        
-        # Let's add the coordinates of the area of repulsion to the repulsion_areas list
-        self.repulsion_areas.append(button_coordinates)
+            self.renderer.unbind_left()  # unbind the left mouse button from the map so that the user cannot add more obstacles
+            self.tools_frame.destroy()
         
-        # the button that the user clicked will be an area of repulsion
-        # the button itself will have an increase of 100% in its cost and the buttons around it will have an increase of 50% in their cost
-                    
-        self.update_adjacent_node(button_row, button_column, self.repulsion_cost_mult)
+        if attraction:  # the user wants to add an area of attraction
+            fg_color = self.attraction_fg_color
+            letter = "A"  # A for attraction
+        else:  # the user wants to add an area of repulsion
+            fg_color = self.repulsion_fg_color
+            letter = "R"  # R for repulsion
         
-        # Update the adjacent nodes of the button that the user clicked
+        # the cell that the user clicked and the cells within the radius will get a new cost (see GridMap.add_influence_area)
+        self.record("attraction" if attraction else "repulsion", *button_coordinates)
+        changed_cells = self.grid_map.add_influence_area(button_coordinates, attraction)
+        for cell, new_weight in changed_cells:
+            self.renderer.configure_cell(cell, text=f"{letter}.{new_weight}", fg=fg_color)
         
-        # Let's check if the node is not in the first row
-        if button_row != 0:
-            self.update_adjacent_node(button_row - 1, button_column, self.repulsion_cost_mult_adj)
-            
-        # Let's check if the node is not in the last row
-        if button_row != self.rows - 1:            
-            self.update_adjacent_node(button_row + 1, button_column, self.repulsion_cost_mult_adj)
-
-        # Let's check if the node is not in the first column
-        if button_column != 0:
-            self.update_adjacent_node(button_row, button_column - 1, self.repulsion_cost_mult_adj)
+        return changed_cells
+    
+    
+    def attraction(self, button_coordinates):
+        # the button itself will have a reduction of 50% in its cost and the buttons around it a smaller reduction (see costfield.py)
+        self.add_influence_area(button_coordinates, attraction=True)
             
-        # Let's check if the node is not in the last column
-        if button_column != self.columns - 1:
-            self.update_adjacent_node(button_row, button_column + 1, self.repulsion_cost_mult_adj)
+    
+    def repulsion(self, button_coordinates):
+        # the button itself will have an increase of 100% in its cost and the buttons around it a smaller increase (see costfield.py)
+        self.add_influence_area(button_coordinates, attraction=False)
             
     
+    def path_to_string(self, title, encoded):
+        
+        # the label only shows the start and the first moves of the path (see view_path for the whole path)
+        text = f"{title}{len(encoded)} cells, {encoded.preview()}"
+        if self.destinations:
+            text += f", to the destination {encoded.end}"
+        return text
+    
+    
     def find_shortest_path(self):
         
-        # if the user hasn't added areas of attraction or repulsion and the old_graph variable is still None, we will make now a deepcopy of the graph to avoid bugs
-        if self.old_graph is None:
-            self.old_graph = deepcopy(self.graph)  # in this case both graphs will be the same
+        self.record("find")
         
         # Let's destroy the bottom part of the root window
         self.bottom_frame.destroy()
         
-        # Let's also make the buttons unclickable and remove the bindings
-        for row in self.map:
-            for button in row:
-                button.configure(state="disabled")
-                button.unbind("<Button-1>")
-                button.unbind("<Button-2>")
-                button.unbind("<Button-3>")
+        # Let's also make the map unclickable and remove the bindings
+        self.renderer.disable()
         
-        # Add all edges to the graph
-        # We will add an edge between two nodes if they are not obstacles and they are adjacent to each other (up, down, left, right)
-        # each node will have 2, 3 or 4 edges depending on its position on the map
+        solver = self.solver
+        old_solver = self.old_solver
+        
+        # Let's create a frame to hold the results. Each label is filled in as soon as its search finishes
+        self.bottom_frame = tk.Frame(self.root, bg=self.bg)
+        self.bottom_frame.pack(pady=self.base_padding)
+        
+        # Let's create a label to tell the user the cost of the Dijkstra algorithm
+        self.cost_label_dijkstra = tk.Label(self.bottom_frame, text="Searching with Dijkstra...", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.cost_label_dijkstra.grid(row=0, column=0, columnspan=4, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to tell the user the cost of the A* algorithm
+        self.cost_label_a_star = tk.Label(self.bottom_frame, text="Waiting for A*...", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.cost_label_a_star.grid(row=1, column=0, columnspan=4, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a label to tell the user the cost of the A* algorithm without areas of attraction or repulsion
+        self.cost_label_a_star_old = tk.Label(self.bottom_frame, text="Waiting for A* without areas of attraction/repulsion...", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.cost_label_a_star_old.grid(row=2, column=0, columnspan=4, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a button to stop the searches
+        self.cancel_button = tk.Button(self.bottom_frame, text="Cancel", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.cancel_search)
+        self.cancel_button.grid(row=3, column=0, padx=self.base_padding, pady=self.base_padding)
         
-        for i in range(self.rows):
-            for j in range(self.columns):
-                
-                if (i, j) not in self.obstacles:  # check if the node is not an obstacle
-                    
-                    if i != 0:  # check if the node is not in the first row
-                        if (i - 1, j) not in self.obstacles:  # check if the node above it is not an obstacle
-                            self.graph.add_edge((i, j), (i - 1, j), weight=self.graph.nodes[(i - 1, j)]['weight'])
-                            self.graph.add_edge((i - 1, j), (i, j), weight=self.graph.nodes[(i, j)]['weight'])
-                            
-                            # add the edges to the old graph as well to compare the results of the A* algorithm when the user adds areas of attraction/repulsion
-                            self.old_graph.add_edge((i, j), (i - 1, j), weight=self.old_graph.nodes[(i - 1, j)]['weight'])
-                            self.old_graph.add_edge((i - 1, j), (i, j), weight=self.old_graph.nodes[(i, j)]['weight'])
-
-                    if i != self.rows - 1:  # check if the node is not in the last row
-                        if (i + 1, j) not in self.obstacles:  # check if the node below it is not an obstacle
-                            self.graph.add_edge((i, j), (i + 1, j), weight=self.graph.nodes[(i + 1, j)]['weight'])
-                            self.graph.add_edge((i + 1, j), (i, j), weight=self.graph.nodes[(i, j)]['weight'])
-                            
-                            self.old_graph.add_edge((i, j), (i + 1, j), weight=self.old_graph.nodes[(i + 1, j)]['weight'])
-                            self.old_graph.add_edge((i + 1, j), (i, j), weight=self.old_graph.nodes[(i, j)]['weight'])  
-                    
-                    if j != 0:  # check if the node is not in the first column
-                        if (i, j - 1) not in self.obstacles:  # check if the node on the left is not an obstacle
-                            self.graph.add_edge((i, j), (i, j - 1), weight=self.graph.nodes[(i, j - 1)]['weight'])
-                            self.graph.add_edge((i, j - 1), (i, j), weight=self.graph.nodes[(i, j)]['weight'])
-                            
-                            self.old_graph.add_edge((i, j), (i, j - 1), weight=self.old_graph.nodes[(i, j - 1)]['weight'])
-                            self.old_graph.add_edge((i, j - 1), (i, j), weight=self.old_graph.nodes[(i, j)]['weight'])
-                    
-                    if j != self.columns - 1:  # check if the node is not in the last column
-                        if (i, j + 1) not in self.obstacles:  # check if the node on the right is not an obstacle
-                            self.graph.add_edge((i, j), (i, j + 1), weight=self.graph.nodes[(i, j + 1)]['weight'])
-                            self.graph.add_edge((i, j + 1), (i, j), weight=self.graph.nodes[(i, j)]['weight'])
-                            
-                            self.old_graph.add_edge((i, j), (i, j + 1), weight=self.old_graph.nodes[(i, j + 1)]['weight'])
-                            self.old_graph.add_edge((i, j + 1), (i, j), weight=self.old_graph.nodes[(i, j)]['weight'])
-        
-        # # Let's print the graph
-        # print(f"Nodes of the graph: {self.graph.nodes}\n")
-        
-        # # Let's print the edges and the cost of each node
-        # for node in self.graph.nodes:
-        #     print(f"Edges of node {node}: {self.graph.edges(node)}")
-        #     print(f"Cost of node {node}: {self.graph.nodes[node]['weight']}")
-        #     print("=" * 150)
-        
-        # # print the cost of each edge
-        # for edge in self.graph.edges:
-        #     print(f"Cost of edge {edge}: {self.graph.edges[edge]['weight']}")
-        #     print("=" * 150)
-
         # ================================================================================================================
-        # Let's find the shortest path using the Dijkstra algorithm
+        # The searches run one after the other on a background thread, so the window stays responsive.
+        # The Dijkstra algorithm runs first: if it finds no path, there is no path for the A* algorithm either
+        
+        self.search_results = {}  # the work of every search, in the order that the statistics label shows them
+        self.encoded_paths = {}  # the paths of the searches as a start cell and run-length encoded moves
+        
+        # With several destinations every search is a single search towards the nearest of them, not one search per destination
+        targets = self.targets()
+        if len(targets) > 1:
+            search = lambda searching_solver, algorithm: searching_solver.nearest_path([self.grid_map.start_point], targets, algorithm)
+        else:
+            search = lambda searching_solver, algorithm: searching_solver.shortest_path(algorithm=algorithm)
+        
+        self.worker = SearchWorker([
+            ("Dijkstra", lambda: search(solver, "dijkstra")),
+            ("Dijkstra without areas", lambda: search(old_solver, "dijkstra")),
+            ("A*", lambda: search(solver, "astar")),  # A* algorithm with areas of attraction or repulsion
+            ("A* without areas", lambda: search(old_solver, "astar"))  # A* algorithm without areas of attraction or repulsion
+        ])
+        solver.set_cancel_event(self.worker.cancel_event)
+        old_solver.set_cancel_event(self.worker.cancel_event)
+        
+        self.worker.start()
+        self.poll_id = self.root.after(self.poll_interval, self.poll_search)
+    
+    
+    def cancel_search(self):
+        self.worker.cancel()
+        self.cancel_button.configure(text="Cancelling...", state="disabled")
+    
+    
+    def poll_search(self):
+        # This function runs on the main thread every poll_interval milliseconds until the worker has finished all its searches
         
-        try:
-            self.shortest_path_dijkstra = nx.shortest_path(G=self.graph, source=self.start_point, target=self.end_point, method='dijkstra', weight="weight")
-            self.shortest_path_dijkstra_old = nx.shortest_path(G=self.old_graph, source=self.start_point, target=self.end_point, method='dijkstra', weight="weight")
-        except nx.exception.NetworkXNoPath:
-            if messagebox.askyesno("Warning", "There is no valid path between the start point and the end point!\nPlay again?"):
-                self.play_again()
-            else:
-                self.root.destroy()
+        self.poll_id = None
+        
+        for job in self.worker.poll():
+            
+            if job.cancelled:
+                continue
+            
+            if isinstance(job.error, NoPathError):
+                if messagebox.askyesno("Warning", f"There is no valid path between the start point and the {'destinations' if self.destinations else 'end point'}!\nPlay again?"):
+                    self.play_again()
+                else:
+                    self.root.destroy()
+                return
+            
+            if job.error is not None:
+                messagebox.showerror("Error", f"The {job.name} search failed: {job.error}")
+                self.search_cancelled()
+                return
+            
+            self.timer.phases.append((job.name, job.seconds))
+            self.search_results[job.name] = job.result
+            self.encoded_paths[job.name] = EncodedPath.from_cells(job.result.path)
+            self.show_search_result(job.name, job.result)
+        
+        if not self.worker.finished:
+            self.poll_id = self.root.after(self.poll_interval, self.poll_search)
+        elif self.worker.cancelled:
+            self.search_cancelled()
+        else:
+            self.show_final_results()
+    
+    
+    def show_search_result(self, name, result):
+        
+        if name == "Dijkstra":
+            self.shortest_path_dijkstra = result.path
+            shortest_path_dijkstra_string = self.path_to_string("Validation - Shortest path (Dijkstra): ", self.encoded_paths[name])
+            self.cost_label_dijkstra.configure(text=f"{shortest_path_dijkstra_string}. Cost: {result.cost}")
+            self.cost_label_a_star.configure(text="Searching with A*...")
+        
+        elif name == "Dijkstra without areas":
+            self.shortest_path_dijkstra_old = result.path
+        
+        elif name == "A*":
+            self.shortest_path_a_star = result.path
+            shortest_path_a_star_string = self.path_to_string("Shortest path (A*): ", self.encoded_paths[name])
+            self.cost_label_a_star.configure(text=f"{shortest_path_a_star_string}. Cost: {result.cost}")
+            self.cost_label_a_star_old.configure(text="Searching with A* without areas of attraction/repulsion...")
+            
+            # Let's color the path in one batch
+            with self.timer.phase("draw path"):
+                self.renderer.configure_cells(self.shortest_path_a_star, bg=self.path_color)
+            
+            # Let's make sure that the start and end points have the correct text
+            self.renderer.configure_cell(self.grid_map.start_point, text="S", fg="black")
+            self.renderer.configure_cells(self.targets(), text="F", fg="black")
+        
+        elif name == "A* without areas":
+            self.shortest_path_a_star_old = result.path
+            old_shortest_path_a_star_string = self.path_to_string("Shortest path (A*) without areas of attraction/repulsion: ", self.encoded_paths[name])
+            self.cost_label_a_star_old.configure(text=f"{old_shortest_path_a_star_string}. Cost: {result.cost}")
+    
+    
+    def search_cancelled(self):
         
-        shortest_path_dijkstra_string = "Validation - Shortest path (Dijkstra): "
+        self.cancel_button.destroy()
         
-        for node in self.shortest_path_dijkstra:
-            shortest_path_dijkstra_string += f"{node} -> "
-        # remove the last arrow
-        shortest_path_dijkstra_string = shortest_path_dijkstra_string[:-3]
+        # the labels of the searches that did not finish say so
+        if "Dijkstra" not in self.search_results:
+            self.cost_label_dijkstra.configure(text="The search was cancelled.")
+        if "A*" not in self.search_results:
+            self.cost_label_a_star.configure(text="The search was cancelled.")
+        if "A* without areas" not in self.search_results:
+            self.cost_label_a_star_old.configure(text="The search was cancelled.")
         
-        # let's add some lines changes to the string to make it look better if the string is too long
-        limit = 200
-        if len(shortest_path_dijkstra_string) > limit:
-            shortest_path_dijkstra_string = shortest_path_dijkstra_string[:limit] + "\n" + shortest_path_dijkstra_string[limit:]
+        self.create_end_buttons()
+    
+    
+    def create_end_buttons(self):
         
-        # calculate the cost of the path
-        cost_dijkstra = 0
-        for i in range(1, len(self.shortest_path_dijkstra) - 1):
-            cost_dijkstra += self.graph.nodes[self.shortest_path_dijkstra[i]]['weight']
+        # Let's create a button to play again
+        self.play_again_button = tk.Button(self.bottom_frame, text="Play Again", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.play_again)
+        self.play_again_button.grid(row=3, column=0, padx=self.base_padding, pady=self.base_padding)
         
-        # ================================================================================================================
-        # Let's find the shortest path using the A* algorithm
-        # no need to check if there is a path between the start and end points because we already checked it with the Dijkstra algorithm
+        # Let's create a button to exit the game
+        self.exit_button = tk.Button(self.bottom_frame, text="Exit Game", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.root.destroy)
+        self.exit_button.grid(row=3, column=1, padx=self.base_padding, pady=self.base_padding)
+    
+    
+    def show_final_results(self):
+        
+        self.cancel_button.destroy()
+        self.create_end_buttons()
+        
+        # Let's create a button to keep editing the map. Every edit after that repairs the path instead of searching from scratch
+        self.replanning_button = tk.Button(self.bottom_frame, text="Keep editing", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.start_replanning)
+        self.replanning_button.grid(row=3, column=2, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a button to save the statistics of the searches as JSON
+        self.export_stats_button = tk.Button(self.bottom_frame, text="Export stats", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.export_stats)
+        self.export_stats_button.grid(row=3, column=3, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a button to save the map, so that it can be played again or solved without the GUI (see batch.py)
+        self.save_map_button = tk.Button(self.bottom_frame, text="Save map", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.save_map)
+        self.save_map_button.grid(row=3, column=4, padx=self.base_padding, pady=self.base_padding)
         
-        # A* algorithm with areas of attraction or repulsion
+        # Let's create a button to scroll through the whole path and export it
+        self.view_path_button = tk.Button(self.bottom_frame, text="View path", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.view_path)
+        self.view_path_button.grid(row=3, column=5, padx=self.base_padding, pady=self.base_padding)
+        
+        # Let's create a button to show the cost from every cell to the destination as a heat map
+        self.distance_field_button = tk.Button(self.bottom_frame, text="Show distance field", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.toggle_distance_field)
+        self.distance_field_button.grid(row=3, column=6, padx=self.base_padding, pady=self.base_padding)
+        self.heatmap_shown = False
+        
+        # Let's create a label with the work that each search did and the time of each phase
+        self.stats_label = tk.Label(self.bottom_frame, text=self.stats_to_string(), font=(self.font, int(0.6 * self.font_size)), bg=self.bg, fg=self.fg, justify="left")
+        self.stats_label.grid(row=4, column=0, columnspan=7, padx=self.base_padding, pady=self.base_padding)
+
 
-        self.shortest_path_a_star = nx.astar_path(G=self.graph, source=self.start_point, target=self.end_point, heuristic=self.heuristic, weight="weight")        
+    def stats_to_string(self):
         
-        shortest_path_a_star_string = "Shortest path (A*): "
+        lines = [f"A* heuristic: {self.heuristic_name}"]
+        for name, result in self.search_results.items():
+            stats = result.stats
+            if result.cached:
+                lines.append(f"{name}: from the path cache, {1000 * stats.seconds:.2f} ms")
+            else:
+                lines.append(f"{name}: {stats.expanded} cells expanded, {stats.pushes} heap pushes, {stats.pops} heap pops, {stats.peak_open} peak open cells, {1000 * stats.seconds:.2f} ms")
         
-        for node in self.shortest_path_a_star:
-            shortest_path_a_star_string += f"{node} -> "
-        # remove the last arrow
-        shortest_path_a_star_string = shortest_path_a_star_string[:-3]
+        cache_stats = self.path_cache.stats()
+        lines.append(f"Path cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['invalidations']} invalidations")
         
-        # let's add some lines changes to the string to make it look better if the string is too long
-        if len(shortest_path_a_star_string) > limit:
-            shortest_path_a_star_string = shortest_path_a_star_string[:limit] + "\n" + shortest_path_a_star_string[limit:]
+        lines.append("Phases: " + ", ".join(f"{name} {1000 * seconds:.2f} ms" for name, seconds in self.timer.phases))
         
-        # calculate the cost of the path
-        cost_a_star = 0
-        for i in range(1, len(self.shortest_path_a_star) - 1):
-            cost_a_star += self.graph.nodes[self.shortest_path_a_star[i]]['weight']
+        return "\n".join(lines)
+    
+    
+    def export_stats(self):
         
-        # ================================================================================================================
-        # A* algorithm without areas of attraction or repulsion
+        file_name = filedialog.asksaveasfilename(title="Export stats", defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        if not file_name:
+            return
         
-        self.shortest_path_a_star_old = nx.astar_path(G=self.old_graph, source=self.start_point, target=self.end_point, heuristic=self.heuristic, weight="weight")
+        report = {
+            "rows": self.rows,
+            "columns": self.columns,
+            "obstacles": len(self.grid_map.obstacles),
+            "destinations": len(self.targets()),
+            "heuristic": self.heuristic_names[self.heuristic_name],
+            "searches": {name: dict(result.stats.to_dict(), cost=result.cost, path_length=len(result.path), cached=result.cached) for name, result in self.search_results.items()},
+            "path_cache": self.path_cache.stats(),
+            "phases": self.timer.to_dict()
+        }
+        
+        with open(file_name, "w") as f:
+            json.dump(report, f, indent=2)
+
 
-        old_shortest_path_a_star_string = "Shortest path (A*) without areas of attraction/repulsion: "
+    def view_path(self):
         
-        for node in self.shortest_path_a_star_old:
-            old_shortest_path_a_star_string += f"{node} -> "
-        # remove the last arrow
-        old_shortest_path_a_star_string = old_shortest_path_a_star_string[:-3]
+        # after the first edit the path on the map is the one that the planner repaired
+        if self.planner is not None:
+            title, encoded, cost = "Replanned path (LPA*)", EncodedPath.from_cells(self.current_path), self.current_cost
+        else:
+            title, encoded, cost = "Shortest path (A*)", self.encoded_paths["A*"], self.search_results["A*"].cost
         
-        # let's add some lines changes to the string to make it look better if the string is too long
-        if len(old_shortest_path_a_star_string) > limit:
-            old_shortest_path_a_star_string = old_shortest_path_a_star_string[:limit] + "\n" + old_shortest_path_a_star_string[limit:]
+        if not len(encoded):
+            messagebox.showinfo("Path", "There is no path to show.")
+            return
         
-        # calculate the cost of the path
-        old_cost_a_star = 0
-        for i in range(1, len(self.shortest_path_a_star_old) - 1):
-            old_cost_a_star += self.old_graph.nodes[self.shortest_path_a_star_old[i]]['weight']
-                
-        # ================================================================================================================        
+        PathViewer(self.root, encoded, title=title, properties={"algorithm": title, "cost": cost}, font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+    
+    
+    def cell_color(self, cell):
+        # the color that a cell has when it is not part of the path
+        if cell == self.grid_map.start_point:
+            return self.start_point_color
+        if cell == self.grid_map.end_point or cell in self.destinations:
+            return self.end_point_color
+        if self.grid_map.is_obstacle(cell):
+            return self.obstacle_color
+        return self.areas[self.grid_map.terrain[self.grid_map.index(cell)]]["color"]
+    
+    
+    def path_cells(self):
+        # the cells of the path that the map shows
+        return set(self.current_path if self.planner is not None else self.shortest_path_a_star)
+    
+    
+    def display_color(self, cell, path_cells):
+        # the color of a cell with the path and, if it is shown, the heat map of the distance field
+        if cell in path_cells and not self.is_end_point(cell):
+            return self.path_color
+        if self.heatmap_shown and not self.is_end_point(cell) and self.grid_map.is_free(cell):
+            distance = self.distance_field.distance[self.grid_map.index(cell)]
+            if distance != INF:
+                return self.heatmap_colors[min(int(distance * len(self.heatmap_colors) / self.heatmap_scale), len(self.heatmap_colors) - 1)]
+        return self.cell_color(cell)
+    
+    
+    def paint_cells(self, cells):
+        # the cells of the same color are painted in one batch
+        path_cells = self.path_cells()
+        groups = {}
+        for cell in cells:
+            groups.setdefault(self.display_color(cell, path_cells), []).append(cell)
+        for color, group in groups.items():
+            self.renderer.configure_cells(group, bg=color)
+    
+    
+    def toggle_distance_field(self):
+        
+        self.record("distance field", 0 if self.heatmap_shown else 1)
+        
+        if self.heatmap_shown:
+            # Let's go back to the colors of the areas
+            self.heatmap_shown = False
+            self.renderer.unbind_hover()
+            self.clear_hover_path()
+            self.paint_cells([divmod(index, self.columns) for index in range(self.rows * self.columns)])
+            self.distance_field_button.configure(text="Show distance field")
+            self.distance_field_label.destroy()
+            return
         
-        # Let's color the path
-        for i in range(len(self.shortest_path_a_star)):
-            row_astar = self.shortest_path_a_star[i][0]
-            column_astar = self.shortest_path_a_star[i][1]
-            self.map[row_astar][column_astar].configure(bg=self.path_color)
+        # The field is computed once (one reverse Dijkstra from the destinations) and after that it follows the edits of the map
+        if self.distance_field is None:
+            with self.timer.phase("distance field"):
+                self.distance_field = DistanceField(self.grid_map, self.targets(), overlay=self.grid_map.overlay)
+        else:
+            self.distance_field.update()
         
-        # Let's make sure that the start and end points have the correct text
-        self.map[self.start_point[0]][self.start_point[1]].configure(text="S", fg="black")
-        self.map[self.end_point[0]][self.end_point[1]].configure(text="F", fg="black")
+        # the colors are spread over the distances of this moment, a later edit that makes a cell more expensive gets the last color
+        finite = [distance for distance in self.distance_field.distance if distance != INF]
+        self.heatmap_scale = max(max(finite, default=1), 1) + 1
+        self.heatmap_shown = True
         
+        self.paint_cells([divmod(index, self.columns) for index in range(self.rows * self.columns)])
         
-        # Let's create a frame to hold the buttons
-        self.bottom_frame = tk.Frame(self.root, bg=self.bg)
-        self.bottom_frame.pack(pady=self.base_padding)
+        self.hover_cell = None
+        self.hover_path = []
+        self.renderer.bind_hover(self.show_cost_to_go)
         
-        # Let's create a label to tell the user the cost of the Dijkstra algorithm
-        self.cost_label_dijkstra = tk.Label(self.bottom_frame, text=f"{shortest_path_dijkstra_string}. Cost: {cost_dijkstra}", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
-        self.cost_label_dijkstra.grid(row=0, column=0, padx=self.base_padding, pady=self.base_padding)
+        self.distance_field_button.configure(text="Hide distance field")
+        self.distance_field_label = tk.Label(self.bottom_frame, text=f"Hover over a cell to see the cost of its cheapest path to the destination (field computed with {self.distance_field.expanded} expanded cells)", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.distance_field_label.grid(row=7, column=0, columnspan=7, padx=self.base_padding, pady=self.base_padding)
+    
+    
+    def clear_hover_path(self):
+        hover_path, self.hover_path = self.hover_path, []
+        self.paint_cells(hover_path)
+    
+    
+    def show_cost_to_go(self, cell):
+        # every query is a walk along the field, no search runs
         
-        # Let's create a label to tell the user the cost of the A* algorithm
-        self.cost_label_a_star = tk.Label(self.bottom_frame, text=f"{shortest_path_a_star_string}. Cost: {cost_a_star}", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
-        self.cost_label_a_star.grid(row=1, column=0, padx=self.base_padding, pady=self.base_padding)
+        if cell == self.hover_cell:
+            return
+        self.hover_cell = cell
         
-        # Let's create a label to tell the user the cost of the A* algorithm without areas of attraction or repulsion
-        self.cost_label_a_star_old = tk.Label(self.bottom_frame, text=f"{old_shortest_path_a_star_string}. Cost: {old_cost_a_star}", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
-        self.cost_label_a_star_old.grid(row=2, column=0, padx=self.base_padding, pady=self.base_padding)
+        self.clear_hover_path()
         
-        # Let's create a button to play again
-        self.play_again_button = tk.Button(self.bottom_frame, text="Play Again", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.play_again)
-        self.play_again_button.grid(row=3, column=0, padx=self.base_padding, pady=self.base_padding)
+        try:
+            result = self.distance_field.result(cell)
+        except NoPathError:
+            self.distance_field_label.configure(text=f"From {cell}: no destination can be reached")
+            return
         
-        # Let's create a button to exit the game
-        self.exit_button = tk.Button(self.bottom_frame, text="Exit Game", font=(self.font, self.font_size, "bold"), bg=self.button_bg, fg=self.button_fg, bd=5, relief="sunken", activebackground=self.button_bg, activeforeground=self.button_fg, command=self.root.destroy)
-        self.exit_button.grid(row=3, column=1, padx=self.base_padding, pady=self.base_padding)
-
-
-    def heuristic(self, src, target):
-        '''
-        This function will calculate the heuristic of the A* algorithm.
-        The heuristic will be the Manhattan distance between the two nodes.
+        self.hover_path = [path_cell for path_cell in result.path[1:-1] if not self.is_end_point(path_cell)]
+        self.renderer.configure_cells(self.hover_path, bg=self.hover_path_color)
+        self.distance_field_label.configure(text=f"From {cell}: cost {result.cost}, {len(result.path)} cells to the destination {result.path[-1]}")
+    
+    
+    def start_replanning(self):
+        
+        # The planner keeps the state of its search (LPA*), so after every edit it only searches again around the cells that changed.
+        # It repairs the path to a single destination: with several destinations, the one that the A* path reached
+        self.planner = IncrementalPlanner(self.grid_map, target=self.shortest_path_a_star[-1], overlay=self.grid_map.overlay)
+        self.current_path = self.shortest_path_a_star
+        self.current_cost = self.search_results["A*"].cost
+        self.record("keep editing")
+        
+        self.replanning_button.destroy()
         
-        @param src: the first node (the argument passes automatically by the A* algorithm)
-        @param target: the second node  (the argument passes automatically by the A* algorithm)
-        @return: the heuristic of the A* algorithm
-        '''
+        self.replanning_label = tk.Label(self.bottom_frame, text="Left click to add obstacles" + (", right click to add areas of attraction, middle click to add areas of repulsion" if self.attraction_repulsion else "") + ". The path is repaired after every edit.", font=(self.font, int(0.8 * self.font_size)), bg=self.bg, fg=self.fg)
+        self.replanning_label.grid(row=5, column=0, columnspan=7, padx=self.base_padding, pady=self.base_padding)
         
-        # The heuristic will be the Manhattan distance between the two nodes
-        heuristic = abs(src[0] - target[0]) + abs(src[1] - target[1])
+        # the first search of the planner is a full one
+        self.replan()
         
-         #wrong_heuristic = abs(src[0] - target[0]) + abs(src[1] - target[1]) + random.randint(1, 20)  # just for demonstration purposes
+        # Let's make the map clickable again. The user can add obstacles even after adding areas of attraction or repulsion,
+        # with single clicks or with the obstacle tools (every batch of obstacles is repaired once)
+        self.renderer.enable()
+        self.on_left_click = self.replan_obstacle
+        self.renderer.bind_drag(on_press=self.press_cell, on_drag=self.drag_cell, on_release=self.release_cell)
+        self.create_tools(row=6, destinations=False)
+        if self.attraction_repulsion:
+            self.obstacles_bind_still = False
+            self.renderer.bind_clicks(on_middle=self.replan_repulsion, on_right=self.replan_attraction)
+    
+    
+    def replan_obstacle(self, button_coordinates):
         
-        return heuristic
+        if self.is_end_point(button_coordinates) or self.grid_map.is_obstacle(button_coordinates):
+            return
+        
+        self.grid_map.add_obstacle(button_coordinates)
+        self.record("obstacle", *button_coordinates)
+        self.renderer.configure_cell(button_coordinates, bg=self.obstacle_color, text="X")
+        self.replan()
+    
+    
+    def replan_attraction(self, button_coordinates):
+        # the path only needs to be repaired if the area changed the weight of a cell
+        if self.add_influence_area(button_coordinates, attraction=True):
+            self.replan()
+    
+    
+    def replan_repulsion(self, button_coordinates):
+        if self.add_influence_area(button_coordinates, attraction=False):
+            self.replan()
+    
+    
+    def replan(self):
+        
+        self.record("replan")
+        try:
+            result = self.planner.shortest_path()
+            new_path = result.path
+            self.current_cost = result.cost
+            text = f"Replanned path (LPA*): {len(new_path)} cells. Cost: {result.cost}. Cells expanded by the last repair: {self.planner.expanded}"
+        except NoPathError:
+            new_path = []
+            self.current_cost = None
+            text = "There is no valid path between the start point and the end point anymore!"
+        
+        # Let's repaint only the cells that left or joined the path
+        new_cells = set(new_path)
+        old_path = [cell for cell in self.current_path if cell not in new_cells]
+        self.current_path = new_path
+        self.paint_cells(old_path)
+        self.renderer.configure_cells(new_path, bg=self.path_color)
+        
+        # the distance field repairs only the cells whose cost changed and only those get a new color
+        if self.heatmap_shown:
+            self.clear_hover_path()
+            self.hover_cell = None
+            self.paint_cells([divmod(index, self.columns) for index in self.distance_field.update()])
+        
+        self.renderer.configure_cell(self.grid_map.start_point, text="S", fg="black")
+        self.renderer.configure_cells(self.targets(), text="F", fg="black")
+        self.cost_label_a_star.configure(text=text)
 
 
     def play_again(self):
-        self.root.destroy()  # destroy the root window
-        ShortestPathFinder()  # create a new game
+        # Let's go back to the start screen in the same root window, with the values of the last round.
+        # The searches of this round are stopped and the map widgets are only hidden, so the next round can reuse them
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        
+        self.bottom_frame.destroy()
+        self.map_frame.pack_forget()
+        
+        self.welcome_label.pack(pady=40)
+        self.input_frame.pack(pady=self.base_padding)
+        self.buttons_frame.pack(pady=3 * self.base_padding)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+'''
+@Author: Spyros Tsattalios
+
+The binary map format (.spmap).
+
+A map file is a small header followed by the arrays of the map, so it can be memory-mapped and used without parsing:
+
+    magic      8 bytes   b"SPMAP\0\0\0"
+    version    uint32
+    metadata   uint32    the length of the metadata in bytes
+    data       uint64    the offset of the first array from the start of the file
+    metadata             UTF-8 JSON: rows, columns, areas, start / end points, areas of attraction / repulsion (and their
+                         radius and falloff) and, for every array, its offset (from the data offset), its number of items
+                         and its dtype
+    arrays               every array starts at a multiple of 8 bytes and is little-endian:
+                             terrain          uint8, rows x columns (the index of the area of each cell)
+                             weights          int32, rows x columns (the base weight of each cell)
+                             blocked          uint8, rows x columns (the obstacle bitmap)
+                             obstacles        uint32, the indices of the obstacles
+                             overlay_cells    uint32, the cells that the areas of attraction / repulsion changed
+                             overlay_weights  int32, their weights
+
+load_map() maps the file with mmap and the map uses memoryviews of the arrays directly, so opening a very large map takes
+no time that depends on its size (except for the set of its obstacles). The mapping is private (copy-on-write): edits
+change the map in memory, never the file. Other tools can read the same arrays, e.g. with
+numpy.memmap(path, dtype, offset=data offset + array offset, shape=items).
+'''
+
+from engine import GridMap
+from array import array
+import struct
+import mmap
+import json
+import sys
+
+
+EXTENSION = ".spmap"
+MAGIC = b"SPMAP\0\0\0"
+VERSION = 1
+
+PREFIX = struct.Struct("<8sIIQ")  # magic, version, metadata length, data offset
+ALIGNMENT = 8
+
+# the typecode of array / memoryview and the numpy dtype of every array of the file
+SECTIONS = [
+    ("terrain", "B", "uint8"),
+    ("weights", "i", "<i4"),
+    ("blocked", "B", "uint8"),
+    ("obstacles", "I", "<u4"),
+    ("overlay_cells", "I", "<u4"),
+    ("overlay_weights", "i", "<i4")
+]
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_map_file(path):
+    '''
+    @return: True if the file starts with the magic bytes of the binary map format
+    '''
+
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def save_map(grid_map, path):
+    '''
+    This function will save the map in the binary map format.
+    '''
+
+    if len(grid_map.areas) > 256:
+        raise ValueError("The binary map format supports at most 256 types of area")
+
+    columns = grid_map.columns
+    overlay = grid_map.overlay
+
+    arrays = {
+        "terrain": array("B", grid_map.terrain),
+        "weights": array("i", grid_map.weights),
+        "blocked": array("B", grid_map.blocked),
+        "obstacles": array("I", sorted(row * columns + column for row, column in grid_map.obstacles)),
+        "overlay_cells": array("I", overlay.weights.keys()),
+        "overlay_weights": array("i", overlay.weights.values())
+    }
+
+    if sys.byteorder != "little":
+        for values in arrays.values():
+            values.byteswap()
+
+    sections = {}
+    offset = 0
+    for name, typecode, dtype in SECTIONS:
+        sections[name] = {"offset": offset, "items": len(arrays[name]), "dtype": dtype}
+        offset = align(offset + len(arrays[name]) * arrays[name].itemsize)
+
+    metadata = json.dumps({
+        "rows": grid_map.rows,
+        "columns": columns,
+        "areas": [{"weight": area["weight"], "type": area["type"]} for area in grid_map.areas],
+        "start_point": grid_map.start_point,
+        "end_point": grid_map.end_point,
+        "attraction_areas": grid_map.attraction_areas,
+        "repulsion_areas": grid_map.repulsion_areas,
+        "influence": {"radius": grid_map.overlay.radius, "falloff": grid_map.overlay.falloff},
+        "sections": sections
+    }).encode("utf-8")
+
+    data_offset = align(PREFIX.size + len(metadata))
+
+    with open(path, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(metadata), data_offset))
+        f.write(metadata)
+        f.write(b"\0" * (data_offset - PREFIX.size - len(metadata)))
+
+        for name, _, _ in SECTIONS:
+            data = arrays[name].tobytes()
+            f.write(data)
+            f.write(b"\0" * (align(len(data)) - len(data)))
+
+
+def read_header(mapped):
+    '''
+    @return: the (metadata, data offset) of a mapped map file
+    @raise ValueError: if the file is not a map file of a supported version
+    '''
+
+    if len(mapped) < PREFIX.size:
+        raise ValueError("The file is too small to be a map file")
+
+    magic, version, metadata_length, data_offset = PREFIX.unpack_from(mapped, 0)
+
+    if magic != MAGIC:
+        raise ValueError("The file is not a map file")
+    if version > VERSION:
+        raise ValueError(f"The map file has version {version}, this program reads up to version {VERSION}")
+
+    metadata = json.loads(bytes(mapped[PREFIX.size:PREFIX.size + metadata_length]).decode("utf-8"))
+
+    return metadata, data_offset
+
+
+def load_map(path):
+    '''
+    This function will memory-map a map file. The terrain, the weights and the obstacle bitmap of the map are views of the
+    file, so no array is copied or parsed.
+
+    @return: a new GridMap
+    @raise ValueError: if the file is not a valid map file
+    '''
+
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)  # the mapping stays valid after the file is closed
+
+    metadata, data_offset = read_header(mapped)
+    view = memoryview(mapped)
+
+    sections = {}
+    for name, typecode, _ in SECTIONS:
+        section = metadata["sections"][name]
+        start = data_offset + section["offset"]
+        itemsize = array(typecode).itemsize
+        data = view[start:start + section["items"] * itemsize]
+
+        if len(data) != section["items"] * itemsize:
+            raise ValueError(f"The map file is truncated (the {name} array is incomplete)")
+
+        if sys.byteorder == "little" or itemsize == 1:
+            sections[name] = data.cast(typecode)
+        else:  # a big-endian machine cannot use the little-endian arrays directly, so they are copied and swapped
+            values = array(typecode, data.tobytes())
+            values.byteswap()
+            sections[name] = values
+
+    rows, columns = metadata["rows"], metadata["columns"]
+    if len(sections["terrain"]) != rows * columns or len(sections["weights"]) != rows * columns or len(sections["blocked"]) != rows * columns:
+        raise ValueError("The arrays of the map file do not match its size")
+
+    grid_map = GridMap(rows, columns, metadata["areas"], sections["terrain"], sections["weights"], copy=False)
+    grid_map.blocked = sections["blocked"]
+    grid_map.obstacles = {divmod(index, columns) for index in sections["obstacles"]}
+    grid_map.mapped_file = mapped  # keep the mapping alive as long as the map
+
+    if metadata.get("start_point") is not None:
+        grid_map.start_point = tuple(metadata["start_point"])
+    if metadata.get("end_point") is not None:
+        grid_map.end_point = tuple(metadata["end_point"])
+
+    grid_map.overlay.attraction_areas = [tuple(cell) for cell in metadata.get("attraction_areas", [])]
+    grid_map.overlay.repulsion_areas = [tuple(cell) for cell in metadata.get("repulsion_areas", [])]
+    grid_map.overlay.radius = metadata.get("influence", {}).get("radius", grid_map.overlay.radius)
+    grid_map.overlay.falloff = metadata.get("influence", {}).get("falloff", grid_map.overlay.falloff)
+    grid_map.overlay.weights = dict(zip(sections["overlay_cells"], sections["overlay_weights"]))
+
+    return grid_map
@@ -0,0 +1,120 @@
+'''
+@Author: Spyros Tsattalios
+
+Parallel batch solving with a process pool.
+
+Two kinds of work are spread over the processes:
+- many queries on one map (solve_queries): the map is packed into flat byte strings (GridMap.pack) and sent once to every
+  worker process, then every worker receives only chunks of (source, target) queries.
+- many independent maps (solve_scenarios): every worker generates its own maps from (rows, columns, obstacle density, seed),
+  so no map is sent at all.
+
+The results come back in the order of the input, whatever the number of workers and the chunk size, so the output of a run
+does not depend on how the work was split.
+'''
+
+from engine import GridMap, Solver, ALGORITHMS
+from concurrent.futures import ProcessPoolExecutor
+from pathcache import PathCache
+import batch
+
+
+# the counters of a PathCache that the workers add up (see solve_queries)
+CACHE_COUNTERS = ("hits", "misses", "invalidations", "evictions")
+
+
+# the map and the solver of a worker process, set once by init_worker
+worker_map = None
+worker_solver = None
+
+
+def init_worker(packed_map, use_overlay, backend="grid", cache_size=0):
+    global worker_map, worker_solver
+
+    worker_map = GridMap.unpack(packed_map)
+    cache = PathCache(worker_map, max_entries=cache_size) if cache_size > 0 else None
+    worker_solver = Solver(worker_map, backend=backend, overlay=worker_map.overlay if use_overlay else None, cache=cache)
+
+
+def solve_chunk(task):
+    '''
+    @return: the results of the queries of the chunk and what the chunk added to the counters of the cache of the worker
+    '''
+
+    queries, algorithms = task
+    cache = worker_solver.cache
+    before = {} if cache is None else {counter: getattr(cache, counter) for counter in CACHE_COUNTERS}
+
+    results = batch.run_queries(worker_solver, queries, algorithms)
+
+    return results, {counter: getattr(cache, counter) - value for counter, value in before.items()}
+
+
+def chunks(items, chunk_size):
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def solve_queries(grid_map, queries, algorithms=ALGORITHMS, workers=None, chunk_size=256, use_overlay=True, backend="grid", cache_size=0, cache_stats=None):
+    '''
+    This function will run every algorithm on every query, spreading the queries over a pool of processes.
+
+    @param grid_map: the map of the queries
+    @param queries: a list of (source, target) tuples
+    @param algorithms: the algorithms to run
+    @param workers: the number of processes (defaults to the number of CPUs)
+    @param chunk_size: the number of queries that a process receives at a time
+    @param use_overlay: use the areas of attraction / repulsion of the map
+    @param backend: the backend of the solvers of the workers (see Solver)
+    @param cache_size: give every worker a PathCache of this many results (0 for no cache)
+    @param cache_stats: a dictionary to add the hits, misses, invalidations and evictions of the caches of the workers to
+    @return: a list of (source, target, algorithm, cost, seconds) tuples, in the order of the queries (like batch.run_queries)
+    '''
+
+    tasks = [(chunk, tuple(algorithms)) for chunk in chunks(queries, chunk_size)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(grid_map.pack(), use_overlay, backend, cache_size)) as executor:
+        for chunk_results, counters in executor.map(solve_chunk, tasks):
+            results.extend(chunk_results)
+            if cache_stats is not None:
+                for counter, value in counters.items():
+                    cache_stats[counter] = cache_stats.get(counter, 0) + value
+
+    return results
+
+
+def solve_scenario(scenario):
+    '''
+    @param scenario: a (rows, columns, obstacle_density, seed, queries_count, algorithms) tuple
+    @return: a dictionary with the parameters of the scenario and the summary of its queries (see batch.summarize)
+    '''
+
+    rows, columns, obstacle_density, seed, queries_count, algorithms = scenario
+
+    grid_map = GridMap.generate(rows, columns, obstacle_density=obstacle_density, seed=seed)
+    solver = Solver(grid_map)
+    queries = batch.random_queries(grid_map, queries_count, seed)
+    results = batch.run_queries(solver, queries, algorithms)
+
+    return {
+        "rows": rows,
+        "columns": columns,
+        "obstacle_density": obstacle_density,
+        "seed": seed,
+        "costs": [cost for _, _, _, cost, _ in results],
+        "summary": batch.summarize(results, algorithms)
+    }
+
+
+def solve_scenarios(scenarios, workers=None, chunk_size=1):
+    '''
+    This function will solve many independent generated maps in parallel.
+
+    @param scenarios: a list of (rows, columns, obstacle_density, seed, queries_count, algorithms) tuples
+    @param workers: the number of processes (defaults to the number of CPUs)
+    @param chunk_size: the number of scenarios that a process receives at a time
+    @return: a list with the result of solve_scenario for every scenario, in the order of the scenarios
+    '''
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(solve_scenario, scenarios, chunksize=chunk_size))
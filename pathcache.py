@@ -0,0 +1,262 @@
+'''
+@Author: Spyros Tsattalios
+
+A bounded LRU cache of shortest path results.
+
+A result is stored under (view, source, target, algorithm), where the view is the cost grid that the search ran on: the
+base weights of the map, or the weights of an overlay. An overlay that changes no cell is the same cost grid as the base
+weights, so e.g. the searches "with" and "without" the areas of attraction / repulsion share their results until the first
+area is added. The cache follows the map (and every overlay that it has seen) and invalidates only the results that an
+edit can change:
+    - a new obstacle or a new weight on a cell of a cached path: the result is dropped at once (an index from every cell
+      to the results whose path goes through it finds them)
+    - a new weight on any other cell: a more expensive cell cannot make another path cheaper, and a cheaper cell c can only
+      if w(c) + (|s - c| + |c - t| - 2) is less than the cost of the path, because a path from s through c to t has at
+      least that many other cells between s and t and every weight is at least 1. The weight changes are kept in a log
+      and a result is checked against the changes after it when it is looked up, so an edit costs O(1) per cell
+    - a query without a path stays without a path: obstacles are never removed and weights never make a cell impassable
+
+The log is bounded: after more than max_pending weight changes (e.g. a rebuild of an overlay) the whole cache is cleared.
+
+The results are not keyed by a hash or a version of the weights: every edit would then drop every result, while most edits
+only change a few paths. A view is a number that the cache gives to every overlay that it sees, and the cache keeps a
+reference to the overlay (until close()), so the view of an overlay is never given to another one, even after the overlay
+is no longer used by any solver.
+'''
+
+from collections import OrderedDict
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_PENDING = 4096
+
+BASE_VIEW = None  # the view of the base weights
+ALL_VIEWS = "*"  # the view of a change of the base weights, which every overlay sees (unless it has its own weight)
+
+
+class CacheEntry(object):
+
+    '''
+    A cached PathResult (None for a query without a path) and what is needed to check it against later edits.
+    '''
+
+    def __init__(self, key, result, cells, checked):
+        self.key = key
+        self.result = result
+        self.cells = cells  # the set of the indices of the cells of the path
+        self.checked = checked  # the position in the log of the weight changes up to which the result is known to be valid
+
+
+class OverlayFollower(object):
+
+    '''
+    The listener of an overlay: it tells the cache which view a weight change belongs to.
+    '''
+
+    def __init__(self, cache, view):
+        self.cache = cache
+        self.view = view
+
+
+    def weight_changed(self, cell, weight):
+        self.cache.weight_changed(cell, weight, self.view)
+
+
+class PathCache(object):
+
+    '''
+    The results of the shortest path queries on one GridMap, shared by all its Solvers (see Solver(cache=...)).
+
+    Any optimal path is a valid answer, so a result may come from a search with another algorithm backend or heuristic, as
+    long as the key matches.
+    '''
+
+    def __init__(self, grid_map, max_entries=DEFAULT_MAX_ENTRIES, max_pending=DEFAULT_MAX_PENDING):
+
+        self.grid_map = grid_map
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+
+        self.entries = OrderedDict()  # key -> CacheEntry, from the least to the most recently used
+        self.entries_by_cell = {}  # cell index -> the set of the keys of the results whose path goes through the cell
+
+        # the weight changes as (cell index, weight, view) tuples; log_start is the position of the first one
+        self.changes = []
+        self.log_start = 0
+
+        self.followers = {}  # id(overlay) -> (overlay, OverlayFollower), the overlay is kept so that its id is not reused
+        self.next_view = 1  # the view of the next overlay that the cache sees
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+        grid_map.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map and of the overlays.
+        '''
+
+        self.grid_map.remove_listener(self)
+        for overlay, follower in self.followers.values():
+            overlay.remove_listener(follower)
+        self.followers = {}
+        self.clear()
+
+
+    def view(self, overlay):
+        '''
+        @return: the view of the cost grid of a solver with this overlay
+        '''
+
+        if overlay is None:
+            return BASE_VIEW
+
+        if id(overlay) not in self.followers:
+            follower = OverlayFollower(self, self.next_view)
+            self.next_view += 1
+            overlay.add_listener(follower)
+            self.followers[id(overlay)] = (overlay, follower)
+
+        return self.followers[id(overlay)][1].view if overlay.weights else BASE_VIEW
+
+
+    def get(self, overlay, source, target, algorithm):
+        '''
+        @return: a (found, result) tuple. result is the cached PathResult, or None if the query has no path
+        '''
+
+        key = (self.view(overlay), source, target, algorithm)
+        entry = self.entries.get(key)
+
+        if entry is not None and not self.still_valid(entry):
+            self.remove(key)
+            self.invalidations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, entry.result
+
+
+    def put(self, overlay, source, target, algorithm, result):
+        '''
+        @param result: the PathResult of the query, None if it has no path
+        '''
+
+        key = (self.view(overlay), source, target, algorithm)
+        if key in self.entries:
+            self.remove(key)
+
+        index = self.grid_map.index
+        cells = set() if result is None else {index(cell) for cell in result.path}
+
+        self.entries[key] = CacheEntry(key, result, cells, self.log_start + len(self.changes))
+        for cell in cells:
+            self.entries_by_cell.setdefault(cell, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+
+    def remove(self, key):
+
+        entry = self.entries.pop(key)
+        for cell in entry.cells:
+            keys = self.entries_by_cell[cell]
+            keys.discard(key)
+            if not keys:
+                del self.entries_by_cell[cell]
+
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries = OrderedDict()
+        self.entries_by_cell = {}
+        self.log_start += len(self.changes)
+        self.changes = []
+
+
+    def still_valid(self, entry):
+        '''
+        This function will check a result against the weight changes since it was last checked.
+        '''
+
+        position = self.log_start + len(self.changes)
+        if entry.result is None or entry.checked == position:
+            entry.checked = position
+            return True
+
+        view = entry.key[0]
+        columns = self.grid_map.columns
+        source, target = entry.key[1], entry.key[2]
+        cost = entry.result.cost
+
+        for index, weight, change_view in self.changes[entry.checked - self.log_start:]:
+            if change_view != ALL_VIEWS and change_view != view:
+                continue
+
+            row, column = divmod(index, columns)
+            if (row, column) == source or (row, column) == target:
+                continue  # the cost of a path does not include its endpoints
+
+            # the cheapest that a path from the source through the cell to the target can be
+            bound = weight + abs(row - source[0]) + abs(column - source[1]) + abs(row - target[0]) + abs(column - target[1]) - 2
+            if bound < cost:
+                return False
+
+        entry.checked = position
+        return True
+
+
+    def drop_cell(self, index, view):
+        # drop the results of the view (all views for ALL_VIEWS) whose path goes through the cell
+        for key in list(self.entries_by_cell.get(index, ())):
+            if view == ALL_VIEWS or key[0] == view:
+                self.remove(key)
+                self.invalidations += 1
+
+
+    def obstacle_added(self, cell):
+        self.drop_cell(self.grid_map.index(cell), ALL_VIEWS)
+
+
+    def obstacles_added(self, cells):
+        index = self.grid_map.index
+        for cell in cells:
+            self.drop_cell(index(cell), ALL_VIEWS)
+
+
+    def weight_changed(self, cell, weight, view=ALL_VIEWS):
+
+        index = self.grid_map.index(cell)
+        self.drop_cell(index, view)
+
+        if not self.entries:
+            self.log_start += len(self.changes)
+            self.changes = []
+            return
+
+        self.changes.append((index, weight, view))
+        if len(self.changes) > self.max_pending:
+            self.clear()
+
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,227 @@
+'''
+@Author: Spyros Tsattalios
+
+Compact paths and streaming path export.
+
+A path on the map is a start cell and a list of moves up (U), down (D), left (L) and right (R). Consecutive moves in the
+same direction are run-length encoded, so a path is stored as its start cell and runs like "R5 D3 L2". A path of hundreds
+of thousands of cells along long straight stretches takes a few thousand runs.
+
+The exporters write a path cell by cell while they walk its runs, so the list of its cells is never built in memory:
+    - CSV: one "step,row,column" line per cell
+    - JSON: the start, the moves and the list of the cells
+    - GeoJSON: a Feature with a LineString geometry, with the column as x and the row as y
+'''
+
+from bisect import bisect_right
+import json
+
+
+# the (row, column) offset of each move
+MOVES = {"U": (-1, 0), "D": (1, 0), "L": (0, -1), "R": (0, 1)}
+DIRECTIONS = {offset: move for move, offset in MOVES.items()}
+
+EXPORT_FORMATS = (".csv", ".json", ".geojson")
+
+
+class EncodedPath(object):
+
+    '''
+    A path as a start cell and run-length encoded moves.
+
+    The cells of the path are numbered from 0 (the start) to len(path) - 1. offsets[k] is the number of the cell where the
+    k-th run starts, so any cell or range of cells can be found with a binary search over the runs.
+    '''
+
+    def __init__(self, start, runs):
+        self.start = start  # the (row, column) of the first cell, None for an empty path
+        self.runs = runs  # a list of (move, count) tuples
+
+        # the number of the first cell of every run and the (row, column) where it starts
+        self.offsets = []
+        self.run_starts = []
+
+        position = 0
+        row, column = start if start is not None else (0, 0)
+        for move, count in runs:
+            self.offsets.append(position)
+            self.run_starts.append((row, column))
+            row_step, column_step = MOVES[move]
+            row += row_step * count
+            column += column_step * count
+            position += count
+
+        self.moves_count = position
+        self.end = (row, column) if start is not None else None
+
+
+    @classmethod
+    def from_cells(cls, cells):
+        '''
+        @param cells: the list (or any iterable) of the (row, column) cells of the path, each next to the previous one
+        @return: the EncodedPath of the cells
+        @raise ValueError: if two consecutive cells are not neighbours
+        '''
+
+        runs = []
+        start = None
+        previous = None
+
+        for cell in cells:
+            if previous is None:
+                start = cell
+            else:
+                move = DIRECTIONS.get((cell[0] - previous[0], cell[1] - previous[1]))
+                if move is None:
+                    raise ValueError(f"The cells {previous} and {cell} of the path are not neighbours")
+                if runs and runs[-1][0] == move:
+                    runs[-1] = (move, runs[-1][1] + 1)
+                else:
+                    runs.append((move, 1))
+            previous = cell
+
+        return cls(start, runs)
+
+
+    @classmethod
+    def parse(cls, start, moves):
+        '''
+        @param start: the (row, column) of the first cell
+        @param moves: the moves as a string, e.g. "R5 D3 L2"
+        @return: the EncodedPath
+        '''
+
+        runs = []
+        for token in moves.split():
+            move, count = token[0].upper(), int(token[1:] or 1)
+            if move not in MOVES or count < 1:
+                raise ValueError(f"Invalid move {token!r}")
+            runs.append((move, count))
+
+        return cls(tuple(start), runs)
+
+
+    def __len__(self):
+        # the number of cells of the path
+        return 0 if self.start is None else self.moves_count + 1
+
+
+    def moves(self):
+        return " ".join(f"{move}{count}" for move, count in self.runs)
+
+
+    def preview(self, runs=10):
+        '''
+        @return: the start cell and the first runs of the path, short enough for a label
+        '''
+
+        text = f"{self.start} {' '.join(f'{move}{count}' for move, count in self.runs[:runs])}".rstrip()
+        if len(self.runs) > runs:
+            text += f" ... ({len(self.runs) - runs} more runs)"
+        return text
+
+
+    def cell(self, number):
+        '''
+        @return: the (row, column) of the cell with this number
+        '''
+
+        if not 0 <= number < len(self):
+            raise IndexError("The path has no such cell")
+
+        if number == self.moves_count:
+            return self.end
+
+        run = bisect_right(self.offsets, number) - 1
+        row, column = self.run_starts[run]
+        row_step, column_step = MOVES[self.runs[run][0]]
+        steps = number - self.offsets[run]
+        return (row + row_step * steps, column + column_step * steps)
+
+
+    def cells(self, first=0, end=None):
+        '''
+        This function will generate the cells with the numbers first, ..., end - 1 without building the list of the path.
+        '''
+
+        end = len(self) if end is None else min(end, len(self))
+        if first >= end:
+            return
+
+        row, column = self.cell(first)
+        yield (row, column)
+
+        run = bisect_right(self.offsets, first) - 1
+        number = first + 1
+        while number < end and run < len(self.runs):
+            move, count = self.runs[run]
+            row_step, column_step = MOVES[move]
+            last = min(self.offsets[run] + count, end - 1)
+
+            while number <= last:
+                row += row_step
+                column += column_step
+                yield (row, column)
+                number += 1
+
+            run += 1
+
+
+    def __iter__(self):
+        return self.cells()
+
+
+def write_csv(encoded, f):
+    f.write("step,row,column\n")
+    for step, (row, column) in enumerate(encoded.cells()):
+        f.write(f"{step},{row},{column}\n")
+
+
+def write_cells_array(encoded, f, swap=False):
+    # a JSON array of [row, column] (or [column, row] with swap) pairs, written cell by cell
+    f.write("[")
+    for step, (row, column) in enumerate(encoded.cells()):
+        if step:
+            f.write(",")
+        f.write(f"[{column},{row}]" if swap else f"[{row},{column}]")
+    f.write("]")
+
+
+def write_json(encoded, f, properties=None):
+    header = dict(properties or {})
+    header.update({"start": encoded.start, "end": encoded.end, "length": len(encoded), "moves": encoded.moves()})
+
+    # the header is a normal JSON object, the cells are appended to it as they are generated
+    text = json.dumps(header)
+    f.write(text[:-1] + ', "cells": ')
+    write_cells_array(encoded, f)
+    f.write("}\n")
+
+
+def write_geojson(encoded, f, properties=None):
+    header = dict(properties or {})
+    header.update({"moves": encoded.moves(), "length": len(encoded)})
+
+    f.write('{"type": "Feature", "properties": ' + json.dumps(header) + ', "geometry": {"type": "LineString", "coordinates": ')
+    write_cells_array(encoded, f, swap=True)
+    f.write("}}\n")
+
+
+def export_path(encoded, file_name, properties=None):
+    '''
+    This function will write the path to a CSV, JSON or GeoJSON file, depending on the extension of the file name.
+
+    @param properties: extra values for the JSON / GeoJSON header, e.g. {"algorithm": "astar", "cost": 42}
+    '''
+
+    extension = file_name[file_name.rfind("."):].lower() if "." in file_name else ""
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown path format {extension!r}, expected one of {EXPORT_FORMATS}")
+
+    with open(file_name, "w", newline="") as f:
+        if extension == ".csv":
+            write_csv(encoded, f)
+        elif extension == ".json":
+            write_json(encoded, f, properties)
+        else:
+            write_geojson(encoded, f, properties)
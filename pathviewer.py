@@ -0,0 +1,94 @@
+'''
+@Author: Spyros Tsattalios
+
+A window that shows a path one cell per line.
+
+The path is an EncodedPath (see paths.py), so its cells are never all in memory. The list box of the window only holds the
+lines that are visible: the scrollbar and the mouse wheel move a window of visible_lines cells over the path and only
+those cells are generated again. A path of hundreds of thousands of cells scrolls as fast as a short one.
+'''
+
+from tkinter import filedialog
+from tkinter import messagebox
+from paths import export_path
+import tkinter as tk
+
+
+class PathViewer(object):
+
+    '''
+    A tk.Toplevel with a summary of the path, a lazily filled list of its cells and a button to export it.
+    '''
+
+    def __init__(self, parent, encoded, title="Path", properties=None, font=("Arial", 10), bg="white", fg="black", visible_lines=30):
+
+        self.encoded = encoded
+        self.properties = properties or {}  # extra values for the exported file, e.g. the algorithm and the cost
+        self.visible_lines = visible_lines
+        self.first = 0  # the number of the first visible cell
+
+        self.window = tk.Toplevel(parent, bg=bg)
+        self.window.title(title)
+
+        summary = f"{len(encoded)} cells, {len(encoded.runs)} runs of moves. Start: {encoded.start}, end: {encoded.end}"
+        tk.Label(self.window, text=summary, font=font, bg=bg, fg=fg).grid(row=0, column=0, columnspan=2, padx=5, pady=5)
+        tk.Label(self.window, text=encoded.preview(), font=font, bg=bg, fg=fg, wraplength=600, justify="left").grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+
+        self.listbox = tk.Listbox(self.window, height=visible_lines, width=40, font=font, activestyle="none")
+        self.listbox.grid(row=2, column=0, sticky="nsew")
+
+        # the scrollbar is not connected to the list box: it stands for the whole path, the list box only for what is visible
+        self.scrollbar = tk.Scrollbar(self.window, orient="vertical", command=self.on_scroll)
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.listbox.bind(sequence, self.on_wheel)
+
+        tk.Button(self.window, text="Export path", font=font, command=self.export).grid(row=3, column=0, columnspan=2, padx=5, pady=5)
+
+        self.window.rowconfigure(2, weight=1)
+        self.window.columnconfigure(0, weight=1)
+
+        self.render()
+
+
+    def scroll_to(self, first):
+        self.first = max(0, min(first, len(self.encoded) - self.visible_lines))
+        self.render()
+
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.encoded)))
+        elif action == "scroll":
+            step = self.visible_lines if unit == "pages" else 1
+            self.scroll_to(self.first + int(amount) * step)
+
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+        return "break"  # the list box must not scroll its few lines by itself
+
+
+    def render(self):
+        # Let's replace the lines of the list box with the visible cells only
+        self.listbox.delete(0, "end")
+        self.listbox.insert("end", *(f"{number:>8}  {cell}" for number, cell in enumerate(self.encoded.cells(self.first, self.first + self.visible_lines), start=self.first)))
+
+        total = max(len(self.encoded), 1)
+        self.scrollbar.set(self.first / total, min(self.first + self.visible_lines, total) / total)
+
+
+    def export(self):
+
+        file_name = filedialog.asksaveasfilename(parent=self.window, title="Export path", defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json"), ("GeoJSON files", "*.geojson")])
+        if not file_name:
+            return
+
+        try:
+            export_path(self.encoded, file_name, self.properties)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Error", f"The path could not be exported: {error}", parent=self.window)
@@ -0,0 +1,357 @@
+'''
+@Author: Spyros Tsattalios
+
+The widgets that draw the map of the game.
+
+ButtonMapRenderer creates one tk.Button per cell of the map. It is fine for small maps but every button is a separate widget,
+so a 200x200 map already needs 40,000 widgets.
+
+CanvasMapRenderer draws the whole map on a single tk.Canvas. Medium maps get one rectangle item per cell and very large maps
+are drawn as one PhotoImage bitmap. Clicks are mapped to cells from their coordinates.
+
+Both renderers have the same interface, so the game does not need to know which one draws the map. A renderer can show
+another map of the same size with reset(), so a new round of the game reuses its widgets instead of creating them again.
+Cells are (row, column) tuples and the click callbacks are called with the cell that the user clicked. The drag callbacks
+(bind_drag) are called with the cell under the mouse while the left button is held down and the hover callback (bind_hover)
+with the cell under the mouse while it moves over the map.
+'''
+
+import tkinter as tk
+
+
+class ButtonMapRenderer(object):
+
+    '''
+    Draws the map as a grid of tk.Button widgets, one per cell.
+    '''
+
+    def __init__(self, parent, grid_map, areas, font, fg, box_width=1, box_height=1, padding=2):
+
+        self.grid_map = grid_map
+        self.areas = areas
+        self.fg = fg
+
+        self.frame = tk.Frame(parent, bg=parent["bg"])
+        self.frame.pack()
+
+        # We will use a list of lists to store the buttons of the map
+        self.map = []
+
+        for i in range(grid_map.rows):
+
+            self.map.append([])
+
+            for j in range(grid_map.columns):
+
+                # Each button will have a text that will represent the cost of the specific area
+                # The background color of the button will correspond to the type of the area
+                area = areas[grid_map.terrain[grid_map.index((i, j))]]
+                new_button = tk.Button(self.frame, text=area["weight"], font=font, bg=area["color"], fg=fg, activebackground=area["color"], activeforeground="white", width=box_width, height=box_height)
+
+                # let's add additional attributes to each button to keep track of the row and column that the button is in
+                new_button.row = i
+                new_button.column = j
+
+                self.map[i].append(new_button)
+                self.map[i][j].grid(row=i, column=j, padx=padding, pady=padding)
+
+
+    def bind_clicks(self, on_left=None, on_middle=None, on_right=None):
+        for row in self.map:
+            for button in row:
+                for sequence, callback in (("<Button-1>", on_left), ("<Button-2>", on_middle), ("<Button-3>", on_right)):
+                    if callback is not None:
+                        button.bind(sequence, lambda event, callback=callback: callback((event.widget.row, event.widget.column)))
+
+
+    def button_under(self, event):
+        # while the left button is held down, the events go to the button where the drag started
+        widget = self.frame.winfo_containing(event.x_root, event.y_root)
+        if widget is not None and hasattr(widget, "row"):
+            return (widget.row, widget.column)
+        return None
+
+
+    def bind_drag(self, on_press, on_drag, on_release):
+
+        def handler(callback):
+            def on_event(event):
+                cell = self.button_under(event)
+                if cell is not None:
+                    callback(cell)
+            return on_event
+
+        for row in self.map:
+            for button in row:
+                button.bind("<Button-1>", handler(on_press))
+                button.bind("<B1-Motion>", handler(on_drag))
+                button.bind("<ButtonRelease-1>", handler(on_release))
+
+
+    def bind_hover(self, on_hover):
+        # the mouse enters a new button every time it moves to another cell
+        for row in self.map:
+            for button in row:
+                button.bind("<Enter>", lambda event: on_hover((event.widget.row, event.widget.column)))
+
+
+    def unbind_hover(self):
+        for row in self.map:
+            for button in row:
+                button.unbind("<Enter>")
+
+
+    def unbind_left(self):
+        for row in self.map:
+            for button in row:
+                for sequence in ("<Button-1>", "<B1-Motion>", "<ButtonRelease-1>"):
+                    button.unbind(sequence)
+
+
+    def disable(self):
+        for row in self.map:
+            for button in row:
+                button.configure(state="disabled")
+                for sequence in ("<Button-1>", "<Button-2>", "<Button-3>", "<B1-Motion>", "<ButtonRelease-1>", "<Enter>"):
+                    button.unbind(sequence)
+
+
+    def enable(self):
+        for row in self.map:
+            for button in row:
+                button.configure(state="normal")
+
+
+    def reset(self, grid_map, areas):
+        '''
+        This function will show another map with the same number of rows and columns on the same buttons.
+        '''
+
+        self.disable()
+        self.grid_map = grid_map
+        self.areas = areas
+
+        for i, row in enumerate(self.map):
+            for j, button in enumerate(row):
+                area = areas[grid_map.terrain[grid_map.index((i, j))]]
+                button.configure(text=area["weight"], bg=area["color"], fg=self.fg, activebackground=area["color"], state="normal")
+
+
+    def configure_cell(self, cell, bg=None, text=None, fg=None):
+        options = {key: value for key, value in (("bg", bg), ("text", text), ("fg", fg)) if value is not None}
+        self.map[cell[0]][cell[1]].configure(**options)
+
+
+    def configure_cells(self, cells, bg=None, text=None, fg=None):
+        for cell in cells:
+            self.configure_cell(cell, bg, text, fg)
+
+
+    def destroy(self):
+        self.frame.destroy()
+
+
+class CanvasMapRenderer(object):
+
+    '''
+    Draws the map on a single tk.Canvas.
+
+    Maps with at most MAX_RECTANGLES cells get a rectangle item per cell (and a text item with the cost of the cell when the
+    cells are large enough to read it). Bigger maps are drawn as a PhotoImage where each cell is a square of pixels.
+    '''
+
+    MAX_CELL_SIZE = 40  # the maximum size of a cell in pixels
+    MIN_TEXT_CELL_SIZE = 16  # the cells must be at least this big to show their cost
+    MAX_RECTANGLES = 40000  # above this number of cells the map is drawn as a bitmap
+
+    def __init__(self, parent, grid_map, areas, font, fg, max_width, max_height):
+
+        self.grid_map = grid_map
+        self.areas = areas
+        self.fg = fg
+
+        # Let's find the size of each cell so that the whole map fits in the available space (if possible)
+        self.cell_size = max(1, min(self.MAX_CELL_SIZE, max_width // grid_map.columns, max_height // grid_map.rows))
+        self.use_image = grid_map.rows * grid_map.columns > self.MAX_RECTANGLES
+        self.show_text = not self.use_image and self.cell_size >= self.MIN_TEXT_CELL_SIZE
+
+        map_width = self.cell_size * grid_map.columns
+        map_height = self.cell_size * grid_map.rows
+
+        self.frame = tk.Frame(parent, bg=parent["bg"])
+        self.frame.pack()
+
+        self.canvas = tk.Canvas(self.frame, width=min(map_width, max_width), height=min(map_height, max_height), bg=parent["bg"], highlightthickness=0, scrollregion=(0, 0, map_width, map_height))
+        self.canvas.grid(row=0, column=0)
+
+        # Let's add scrollbars when the map does not fit in the available space
+        if map_width > max_width:
+            x_scrollbar = tk.Scrollbar(self.frame, orient="horizontal", command=self.canvas.xview)
+            x_scrollbar.grid(row=1, column=0, sticky="we")
+            self.canvas.configure(xscrollcommand=x_scrollbar.set)
+        if map_height > max_height:
+            y_scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.canvas.yview)
+            y_scrollbar.grid(row=0, column=1, sticky="ns")
+            self.canvas.configure(yscrollcommand=y_scrollbar.set)
+
+        self.callbacks = {}
+
+        if self.use_image:
+            self.draw_image()
+        else:
+            self.draw_rectangles(font)
+
+
+    def draw_rectangles(self, font):
+
+        self.rectangles = []
+        self.texts = []
+
+        size = self.cell_size
+        text_font = (font[0], max(6, int(0.4 * size)))
+
+        for i in range(self.grid_map.rows):
+            for j in range(self.grid_map.columns):
+                area = self.areas[self.grid_map.terrain[self.grid_map.index((i, j))]]
+                self.rectangles.append(self.canvas.create_rectangle(j * size, i * size, (j + 1) * size, (i + 1) * size, fill=area["color"], outline="black" if size > 3 else ""))
+                if self.show_text:
+                    self.texts.append(self.canvas.create_text((j + 0.5) * size, (i + 0.5) * size, text=area["weight"], fill=self.fg, font=text_font))
+
+
+    def draw_image(self):
+
+        # Let's build the whole map as one binary PPM image (one pixel per cell) and let Tk scale it up
+        palette = [bytes.fromhex(area["color"].lstrip("#")) for area in self.areas]
+        header = f"P6 {self.grid_map.columns} {self.grid_map.rows} 255 ".encode()
+        pixels = b"".join([palette[area] for area in self.grid_map.terrain])
+
+        self.image = tk.PhotoImage(data=header + pixels, format="PPM")
+        if self.cell_size > 1:
+            self.image = self.image.zoom(self.cell_size)
+
+        self.canvas.create_image(0, 0, image=self.image, anchor="nw")
+
+
+    def cell_at(self, event):
+        '''
+        @return: the (row, column) of the cell under the mouse or None if the mouse is outside the map
+        '''
+
+        column = int(self.canvas.canvasx(event.x)) // self.cell_size
+        row = int(self.canvas.canvasy(event.y)) // self.cell_size
+
+        if self.grid_map.in_bounds((row, column)):
+            return (row, column)
+        return None
+
+
+    def on_click(self, event, sequence):
+        callback = self.callbacks.get(sequence)
+        cell = self.cell_at(event)
+        if callback is not None and cell is not None:
+            callback(cell)
+
+
+    def bind_clicks(self, on_left=None, on_middle=None, on_right=None):
+        for sequence, callback in (("<Button-1>", on_left), ("<Button-2>", on_middle), ("<Button-3>", on_right)):
+            if callback is not None:
+                self.callbacks[sequence] = callback
+                self.canvas.bind(sequence, lambda event, sequence=sequence: self.on_click(event, sequence))
+
+
+    def bind_drag(self, on_press, on_drag, on_release):
+        for sequence, callback in (("<Button-1>", on_press), ("<B1-Motion>", on_drag), ("<ButtonRelease-1>", on_release)):
+            self.callbacks[sequence] = callback
+            self.canvas.bind(sequence, lambda event, sequence=sequence: self.on_click(event, sequence))
+
+
+    def bind_hover(self, on_hover):
+        # the callback gets the cell under the mouse at every motion event, even within the same cell
+        self.callbacks["<Motion>"] = on_hover
+        self.canvas.bind("<Motion>", lambda event: self.on_click(event, "<Motion>"))
+
+
+    def unbind_hover(self):
+        self.callbacks.pop("<Motion>", None)
+        self.canvas.unbind("<Motion>")
+
+
+    def unbind_left(self):
+        for sequence in ("<Button-1>", "<B1-Motion>", "<ButtonRelease-1>"):
+            self.callbacks.pop(sequence, None)
+            self.canvas.unbind(sequence)
+
+
+    def disable(self):
+        self.callbacks = {}
+        for sequence in ("<Button-1>", "<Button-2>", "<Button-3>", "<B1-Motion>", "<ButtonRelease-1>", "<Motion>"):
+            self.canvas.unbind(sequence)
+
+
+    def enable(self):
+        pass  # the canvas has no disabled state, the clicks only need to be bound again
+
+
+    def reset(self, grid_map, areas):
+        '''
+        This function will show another map with the same number of rows and columns on the same canvas.
+        '''
+
+        self.disable()
+        self.grid_map = grid_map
+        self.areas = areas
+
+        if self.use_image:
+            self.canvas.delete("all")
+            self.draw_image()
+            return
+
+        for index, rectangle in enumerate(self.rectangles):
+            area = areas[grid_map.terrain[index]]
+            self.canvas.itemconfigure(rectangle, fill=area["color"])
+            if self.show_text:
+                self.canvas.itemconfigure(self.texts[index], text=area["weight"], fill=self.fg)
+
+
+    def configure_cell(self, cell, bg=None, text=None, fg=None):
+        self.configure_cells([cell], bg, text, fg)
+
+
+    def configure_cells(self, cells, bg=None, text=None, fg=None):
+        '''
+        This function will change many cells in one batch.
+        On a bitmap the cells of the same row that are next to each other are painted with a single call.
+        '''
+
+        if self.use_image:
+            if bg is not None:
+                self.paint_runs(cells, bg)
+            return
+
+        for cell in cells:
+            index = self.grid_map.index(cell)
+            if bg is not None:
+                self.canvas.itemconfigure(self.rectangles[index], fill=bg)
+            if self.show_text and (text is not None or fg is not None):
+                options = {key: value for key, value in (("text", text), ("fill", fg)) if value is not None}
+                self.canvas.itemconfigure(self.texts[index], **options)
+
+
+    def paint_runs(self, cells, color):
+
+        size = self.cell_size
+
+        # Let's group the cells into horizontal runs of adjacent cells
+        runs = []
+        for row, column in sorted(cells):
+            if runs and runs[-1][0] == row and runs[-1][2] == column:
+                runs[-1][2] = column + 1
+            else:
+                runs.append([row, column, column + 1])
+
+        for row, first_column, end_column in runs:
+            self.image.put(color, to=(first_column * size, row * size, end_column * size, (row + 1) * size))
+
+
+    def destroy(self):
+        self.frame.destroy()
@@ -0,0 +1,207 @@
+'''
+@Author: Spyros Tsattalios
+
+Incremental replanning with Lifelong Planning A* (LPA*).
+
+After the first search, the planner keeps its g / rhs values. When the map changes (a new obstacle, a new weight, an area of
+attraction or repulsion) only the cells whose shortest distance is affected by the change are searched again, so a stream
+of small edits costs a small fraction of a full search each.
+
+The source and the target stay fixed, so LPA* is enough. D* Lite is the same algorithm searched from the target, which is
+only needed when the source moves while the agent walks along the path.
+'''
+
+from engine import PathResult, NoPathError
+from search import GridSearch, INF
+from heapq import heappush, heappop
+
+
+class IncrementalPlanner(object):
+
+    '''
+    LPA* between two fixed cells of a GridMap.
+
+    The planner listens to the map (and to the overlay, if there is one) and collects the cells that changed.
+    The next call of shortest_path() repairs the previous search around those cells instead of starting from scratch.
+    '''
+
+    def __init__(self, grid_map, source=None, target=None, overlay=None):
+
+        self.grid_map = grid_map
+        self.overlay = overlay
+        self.columns = grid_map.columns
+
+        self.source = grid_map.index(grid_map.start_point if source is None else source)
+        self.target = grid_map.index(grid_map.end_point if target is None else target)
+        self.target_row, self.target_column = divmod(self.target, self.columns)
+
+        # GridSearch gives us the neighbours of a cell on the obstacle bitmap of the map
+        self.grid = GridSearch(grid_map.weights, grid_map.blocked, grid_map.rows, grid_map.columns)
+
+        size = grid_map.rows * grid_map.columns
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+
+        # the priority queue with lazy deletion: queue_keys has the current key of every cell in the queue
+        self.queue = []
+        self.queue_keys = {}
+
+        self.changed_cells = set()  # the cells that changed since the last search
+        self.expanded = 0  # the number of cells that the last call of shortest_path() expanded
+
+        self.rhs[self.source] = 0
+        self.push(self.source)
+
+        grid_map.add_listener(self)
+        if overlay is not None:
+            overlay.add_listener(self)
+
+
+    def close(self):
+        '''
+        Stop following the changes of the map.
+        '''
+
+        self.grid_map.remove_listener(self)
+        if self.overlay is not None:
+            self.overlay.remove_listener(self)
+
+
+    def obstacle_added(self, cell):
+        self.changed_cells.add(self.grid_map.index(cell))
+
+
+    def obstacles_added(self, cells):
+        index = self.grid_map.index
+        self.changed_cells.update(index(cell) for cell in cells)
+
+
+    def weight_changed(self, cell, weight):
+        self.changed_cells.add(self.grid_map.index(cell))
+
+
+    def weight(self, index):
+        if self.overlay is not None and index in self.overlay.weights:
+            return self.overlay.weights[index]
+        return self.grid_map.weights[index]
+
+
+    def heuristic(self, index):
+        # the Manhattan distance to the target is consistent because every weight is at least 1
+        row, column = divmod(index, self.columns)
+        return abs(row - self.target_row) + abs(column - self.target_column)
+
+
+    def key(self, index):
+        value = min(self.g[index], self.rhs[index])
+        return (value + self.heuristic(index), value)
+
+
+    def push(self, index):
+        key = self.key(index)
+        self.queue_keys[index] = key
+        heappush(self.queue, (key, index))
+
+
+    def top_key(self):
+        # drop the stale entries: cells that left the queue or were pushed again with another key
+        while self.queue:
+            key, index = self.queue[0]
+            if self.queue_keys.get(index) == key:
+                return key
+            heappop(self.queue)
+
+        return (INF, INF)
+
+
+    def update_vertex(self, index):
+
+        if index != self.source:
+            if self.grid_map.blocked[index]:
+                self.rhs[index] = INF
+            else:
+                # moving into the cell costs its weight, whatever the cell we come from
+                best = min((self.g[neighbour] for neighbour in self.grid.neighbours(index)), default=INF)
+                self.rhs[index] = best + self.weight(index)
+
+        self.queue_keys.pop(index, None)
+        if self.g[index] != self.rhs[index]:
+            self.push(index)
+
+
+    def apply_changes(self):
+        '''
+        Every changed cell gets a new rhs value. A new obstacle also changes the rhs of its neighbours, because they cannot
+        be reached through it anymore.
+        '''
+
+        for index in self.changed_cells:
+            self.update_vertex(index)
+            if self.grid_map.blocked[index]:
+                for neighbour in self.grid.neighbours(index):
+                    self.update_vertex(neighbour)
+
+        self.changed_cells = set()
+
+
+    def compute_shortest_path(self):
+
+        g, rhs, target = self.g, self.rhs, self.target
+        neighbours = self.grid.neighbours
+
+        while self.top_key() < self.key(target) or rhs[target] != g[target]:
+            _, index = heappop(self.queue)
+            del self.queue_keys[index]
+            self.expanded += 1
+
+            if g[index] > rhs[index]:
+                # overconsistent: the cell got cheaper, settle it and update its neighbours
+                g[index] = rhs[index]
+                for neighbour in neighbours(index):
+                    self.update_vertex(neighbour)
+            else:
+                # underconsistent: the cell got more expensive, reset it and let it (and its neighbours) find a new parent
+                g[index] = INF
+                self.update_vertex(index)
+                for neighbour in neighbours(index):
+                    self.update_vertex(neighbour)
+
+
+    def extract_path(self):
+        '''
+        @return: the path from the source to the target, following the cheapest neighbours backwards from the target
+        '''
+
+        g = self.g
+        path = [self.target]
+
+        while path[-1] != self.source:
+            previous = min(self.grid.neighbours(path[-1]), key=lambda neighbour: g[neighbour])
+            path.append(previous)
+
+        path.reverse()
+        return path
+
+
+    def shortest_path(self):
+        '''
+        This function will repair the previous search with the changes of the map and return the new shortest path.
+
+        @return: a PathResult with the algorithm "lpa*"
+        @raise NoPathError: if there is no valid path between the source and the target
+        '''
+
+        self.expanded = 0
+
+        if self.grid_map.blocked[self.source] or self.grid_map.blocked[self.target]:
+            raise NoPathError("The source or the target is an obstacle")
+
+        self.apply_changes()
+        self.compute_shortest_path()
+
+        if self.g[self.target] == INF:
+            raise NoPathError("There is no valid path between the source and the target")
+
+        path = [divmod(index, self.columns) for index in self.extract_path()]
+
+        return PathResult("lpa*", path, self.grid_map.path_cost(path, self.overlay))
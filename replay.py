@@ -0,0 +1,227 @@
+'''
+@Author: Spyros Tsattalios
+
+Headless replay of a session log of the game (see session.py), to time and profile a slow session again.
+
+The map of the log is built first (step 0) and then every action of the log is a step, run in order against the engine
+(see SessionReplay) and timed on its own. The GUI is not needed, so a replay runs on any machine and a slow session becomes
+a repeatable test:
+    - --memory reports the peak of the memory that every step allocated, with tracemalloc (which slows the steps down)
+    - --profile runs the steps under cProfile, writes the statistics to a file (for pstats or snakeviz) and prints the
+      functions with the largest cumulative time
+    - --repeat replays the session several times and keeps the fastest time of every step, to reduce the noise
+    - --report writes the timings as JSON, and --baseline compares the timings with such a report: a step that is more
+      than --tolerance times slower than in the baseline (and slower by at least --min-ms) is a regression and the exit
+      status is 1
+
+The map is built once before the timing starts, so the first replay does not charge the imports that only happen on
+first use to its steps (see warm_up).
+
+Examples:
+    python replay.py sessions/session-20261017-101500-123.jsonl
+    python replay.py slow.jsonl --profile slow.prof --top 20
+    python replay.py slow.jsonl --repeat 3 --memory --report slow-report.json
+    python replay.py slow.jsonl --repeat 3 --baseline slow-report.json --tolerance 1.5
+'''
+
+from session import SessionReplay, read_session
+import tracemalloc
+import importlib
+import argparse
+import cProfile
+import pstats
+import time
+import json
+import sys
+
+
+def describe_arguments(event):
+    # the cells of a batch of obstacles are only counted, the other arguments are short
+    args = event[2:]
+    if event[1] == "obstacles":
+        return [len(args[0])]
+    return args
+
+
+def run_step(function, memory=False, profiler=None):
+    '''
+    @return: the seconds of the step and, with memory=True, the peak and the net memory (in KiB) that it allocated
+    '''
+
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+
+    if profiler is not None:
+        profiler.enable()
+    start_time = time.perf_counter()
+    try:
+        function()
+    finally:
+        seconds = time.perf_counter() - start_time
+        if profiler is not None:
+            profiler.disable()
+
+    measures = {"seconds": seconds}
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        measures["peak_kib"] = (peak - before) / 1024
+        measures["allocated_kib"] = (current - before) / 1024
+
+    return measures
+
+
+def warm_up(header, map_file=None):
+    '''
+    This function will build the map of the session once without timing it, and import the modules that the engine only
+    imports when they are first needed, so the first replay does not charge the imports (e.g. numpy.random) to its steps.
+    '''
+
+    for module in ("costfield", "mapfile"):
+        importlib.import_module(module)
+
+    SessionReplay(header, map_file).start()
+
+
+def replay_session(header, events, map_file=None, memory=False, profiler=None):
+    '''
+    @return: a list with a dictionary for every step: its number, kind, arguments, measures and what it did (detail)
+    '''
+
+    replay = SessionReplay(header, map_file)
+
+    if memory:
+        tracemalloc.start()
+
+    try:
+        steps = [dict(step=0, kind="start", args=[], **run_step(replay.start, memory, profiler), detail=replay.detail)]
+
+        for number, event in enumerate(events, start=1):
+            measures = run_step(lambda: replay.run(event), memory, profiler)
+            steps.append(dict(step=number, kind=event[1], args=describe_arguments(event), **measures, detail=replay.detail))
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    return steps
+
+
+def fastest_steps(runs):
+    '''
+    @param runs: the steps of several replays of the same session
+    @return: the steps of the first replay with the fastest time (and the smallest memory) of every step
+    '''
+
+    steps = [dict(step) for step in runs[0]]
+    for run in runs[1:]:
+        for step, other in zip(steps, run):
+            for key in ("seconds", "peak_kib", "allocated_kib"):
+                if key in step:
+                    step[key] = min(step[key], other[key])
+
+    return steps
+
+
+def find_regressions(steps, baseline, tolerance, min_seconds):
+    '''
+    @param baseline: the steps of a report of the same session
+    @return: a line for every step that is slower than tolerance times its time in the baseline and by at least min_seconds
+    @raise ValueError: if the baseline is the report of another session
+    '''
+
+    if [(step["step"], step["kind"]) for step in steps] != [(step["step"], step["kind"]) for step in baseline]:
+        raise ValueError("The baseline is the report of another session")
+
+    regressions = []
+    for step, old in zip(steps, baseline):
+        if step["seconds"] > tolerance * old["seconds"] and step["seconds"] - old["seconds"] >= min_seconds:
+            regressions.append(f"step {step['step']} ({step['kind']}): {1000 * step['seconds']:.1f} ms, {1000 * old['seconds']:.1f} ms in the baseline ({step['seconds'] / max(old['seconds'], 1e-9):.1f}x)")
+
+    return regressions
+
+
+def print_steps(steps):
+
+    memory = "peak_kib" in steps[0]
+    print(f"{'step':>5}  {'action':<16}{'ms':>10}" + (f"{'peak KiB':>12}{'net KiB':>12}" if memory else "") + "  detail")
+
+    for step in steps:
+        arguments = " ".join(str(value) for value in step["args"])
+        line = f"{step['step']:>5}  {(step['kind'] + ' ' + arguments).strip():<16}{1000 * step['seconds']:>10.2f}"
+        if memory:
+            line += f"{step['peak_kib']:>12.0f}{step['allocated_kib']:>12.0f}"
+        if step["detail"]:
+            line += "  " + json.dumps(step["detail"], default=str)
+        print(line)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Replay a session log of the game without the GUI and time every step.")
+
+    parser.add_argument("session", help="the session log (see session.py)")
+    parser.add_argument("--map", default=None, help="the map file to use instead of the file of the log")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the session this many times and keep the fastest time of every step")
+    parser.add_argument("--memory", action="store_true", help="measure the memory of every step with tracemalloc (slower)")
+    parser.add_argument("--profile", default=None, help="run the steps under cProfile and write the statistics to this file")
+    parser.add_argument("--top", type=int, default=15, help="the number of functions of the profile to print")
+    parser.add_argument("--report", default=None, help="write the steps and their timings to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare the timings with a report of the same session (made with the same --memory and --profile options)")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="a step that is more than this many times slower than in the baseline is a regression")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="a regression must also be slower than the baseline by at least this many milliseconds")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        header, events = read_session(args.session)
+    except (OSError, ValueError) as error:
+        print(f"The session log could not be read: {error}", file=sys.stderr)
+        return 2
+
+    warm_up(header, args.map)
+
+    profiler = cProfile.Profile() if args.profile else None
+    runs = [replay_session(header, events, args.map, args.memory, profiler) for _ in range(max(1, args.repeat))]
+    steps = fastest_steps(runs)
+
+    if not args.quiet:
+        print_steps(steps)
+
+    total = sum(step["seconds"] for step in steps)
+    slowest = max(steps, key=lambda step: step["seconds"])
+    print(f"{len(steps)} steps in {1000 * total:.1f} ms, the slowest is step {slowest['step']} ({slowest['kind']}, {1000 * slowest['seconds']:.1f} ms)")
+
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"session": args.session, "repeat": args.repeat, "total_seconds": total, "steps": steps}, f, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["steps"]
+
+        try:
+            regressions = find_regressions(steps, baseline, args.tolerance, args.min_ms / 1000)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 2
+
+        if regressions:
+            print(f"{len(regressions)} steps are slower than the baseline:")
+            for regression in regressions:
+                print(f"    {regression}")
+            return 1
+        print("No step is slower than the baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,574 @@
+'''
+@Author: Spyros Tsattalios
+
+Dijkstra and A* directly on the grid, without building a graph.
+
+The cells are integer indices in row-major order (the cell (i, j) is the index i * columns + j) and the neighbours of a cell
+are computed on the fly: the cells above, below, left and right of it that are inside the map and are not obstacles.
+Moving into a cell costs the weight of that cell.
+
+The searches visit the neighbours in the same order and break ties in the same way as networkx on GridMap.to_graph(),
+so they return the same paths: bidirectional_dijkstra() matches nx.shortest_path(method='dijkstra') (which is a
+bidirectional search when both the source and the target are given) and astar() matches nx.astar_path.
+nearest_search() answers the queries from several sources to the nearest of several targets with a single search.
+'''
+
+from heapq import heappush, heappop
+
+
+INF = float("inf")
+
+CANCEL_CHECK_INTERVAL = 1024  # a search that can be cancelled checks its cancel event once every this many heap pops
+
+
+class SearchCancelled(Exception):
+    '''
+    Raised by a search when its cancel event is set while it is running.
+    '''
+
+
+class SearchStats(object):
+
+    '''
+    The work that a single search did.
+
+    expanded is the number of cells whose neighbours the search scanned, pushes / pops count the operations on the heap
+    (stale entries included) and peak_open is the largest size that the heap reached. seconds is the wall time of the
+    search, filled in by the caller that timed it. A count is None when the search could not measure it.
+    '''
+
+    def __init__(self, expanded=0, pushes=0, pops=0, peak_open=0, seconds=0.0):
+        self.expanded = expanded
+        self.pushes = pushes
+        self.pops = pops
+        self.peak_open = peak_open
+        self.seconds = seconds
+
+
+    def to_dict(self):
+        return {"expanded": self.expanded, "pushes": self.pushes, "pops": self.pops, "peak_open": self.peak_open, "seconds": self.seconds}
+
+
+    def __repr__(self):
+        return f"SearchStats(expanded={self.expanded}, pushes={self.pushes}, pops={self.pops}, peak_open={self.peak_open}, seconds={self.seconds:.6f})"
+
+
+class SparseArray(dict):
+
+    '''
+    A dictionary that reads like an array filled with a default value: a missing cell gives the default and costs no memory.
+    '''
+
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+
+    def __missing__(self, index):
+        return self.default
+
+
+class GridSearch(object):
+
+    '''
+    Runs searches on a flat list of weights and a flat obstacle mask (1 for an obstacle, 0 for a free cell).
+    An optional overlay ({cell index: weight}) replaces the weights of some cells, e.g. the areas of attraction / repulsion.
+
+    The weights, the mask and the overlay are not copied, so the searches always see the current state of the map.
+    The distance / parent / closed arrays are allocated once and only the entries that a search touched are reset
+    before the next search, so many queries on the same map do not pay for the size of the map every time.
+
+    With sparse=True the distance / parent / closed arrays are SparseArrays instead, so a search only uses memory for the
+    cells that it reached, e.g. on a tiled map that does not fit in memory (see tiledmap.py). The weights and the mask can
+    be any objects that are indexed by the cell index. shortest_path_tree() always builds full arrays.
+
+    A search that runs on another thread can be stopped by setting cancel_event (a threading.Event): the search checks it
+    every CANCEL_CHECK_INTERVAL heap pops and raises SearchCancelled.
+    '''
+
+    def __init__(self, weights, blocked, rows, columns, overlay=None, sparse=False):
+
+        self.weights = weights
+        self.blocked = blocked
+        self.overlay = overlay
+        self.rows = rows
+        self.columns = columns
+        self.size = rows * columns
+        self.sparse = sparse
+
+        if sparse:
+            self.distance, self.parent, self.closed = SparseArray(INF), SparseArray(-1), SparseArray(0)
+            self.distance_back, self.parent_back, self.closed_back = SparseArray(INF), SparseArray(-1), SparseArray(0)
+        else:
+            self.distance = [INF] * self.size
+            self.parent = [-1] * self.size
+            self.closed = bytearray(self.size)
+
+            # the backward search of bidirectional_dijkstra() (from the target towards the source) has its own arrays
+            self.distance_back = [INF] * self.size
+            self.parent_back = [-1] * self.size
+            self.closed_back = bytearray(self.size)
+
+        self.touched = []  # the cells whose entries must be reset before the next search
+        self.stats = SearchStats()  # the work of the last search
+        self.cancel_event = None
+
+
+    def reset(self):
+
+        if self.sparse:
+            for values in (self.distance, self.parent, self.closed, self.distance_back, self.parent_back, self.closed_back):
+                values.clear()
+            self.touched = []
+            self.stats = SearchStats()
+            return
+
+        distance, parent, closed = self.distance, self.parent, self.closed
+        distance_back, parent_back, closed_back = self.distance_back, self.parent_back, self.closed_back
+
+        for index in self.touched:
+            distance[index] = INF
+            parent[index] = -1
+            closed[index] = 0
+            distance_back[index] = INF
+            parent_back[index] = -1
+            closed_back[index] = 0
+
+        self.touched = []
+        self.stats = SearchStats()
+
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SearchCancelled("The search was cancelled")
+
+
+    def neighbours(self, index):
+        '''
+        @return: the free cells above, below, left and right of the cell (in this order)
+        '''
+
+        columns, size, blocked = self.columns, self.size, self.blocked
+        column = index % columns
+
+        result = []
+        if index >= columns and not blocked[index - columns]:
+            result.append(index - columns)
+        if index + columns < size and not blocked[index + columns]:
+            result.append(index + columns)
+        if column != 0 and not blocked[index - 1]:
+            result.append(index - 1)
+        if column != columns - 1 and not blocked[index + 1]:
+            result.append(index + 1)
+
+        return result
+
+
+    def predecessors(self, index):
+        '''
+        @return: the free cells above, left, right and below the cell (in this order, which is the order in which
+                 GridMap.to_graph() adds the edges that end at the cell)
+        '''
+
+        columns, size, blocked = self.columns, self.size, self.blocked
+        column = index % columns
+
+        result = []
+        if index >= columns and not blocked[index - columns]:
+            result.append(index - columns)
+        if column != 0 and not blocked[index - 1]:
+            result.append(index - 1)
+        if column != columns - 1 and not blocked[index + 1]:
+            result.append(index + 1)
+        if index + columns < size and not blocked[index + columns]:
+            result.append(index + columns)
+
+        return result
+
+
+    def path_to(self, target, parent=None):
+        '''
+        @return: the list of cells from the source of the last search to the target
+        '''
+
+        path = [target]
+        if parent is None:
+            parent = self.parent
+
+        while parent[path[-1]] != -1:
+            path.append(parent[path[-1]])
+
+        path.reverse()
+        return path
+
+
+    def dijkstra(self, source, target):
+        '''
+        @param source: the index of the start cell
+        @param target: the index of the end cell
+        @return: a (path, distance) tuple, where the path is a list of cell indices and the distance is the sum of the
+                 weights of every cell of the path after the source. The path is None if the target is not reachable.
+        '''
+
+        self.reset()
+
+        if self.blocked[source] or self.blocked[target]:
+            return None, INF
+
+        weights, overlay, distance, parent, closed, touched = self.weights, self.overlay, self.distance, self.parent, self.closed, self.touched
+        neighbours = self.neighbours
+
+        distance[source] = 0
+        touched.append(source)
+
+        stats = self.stats
+        counter = 1
+        heap = [(0, 0, source)]
+        expanded, pops, peak_open = 0, 0, 1
+
+        try:
+            while heap:
+                d, _, v = heappop(heap)
+                pops += 1
+                if not pops % CANCEL_CHECK_INTERVAL:
+                    self.check_cancelled()
+
+                if closed[v]:
+                    continue  # a stale entry of a cell that is already settled
+                closed[v] = 1
+
+                if v == target:
+                    return self.path_to(target), d
+                expanded += 1
+
+                for u in neighbours(v):
+                    if closed[u]:
+                        continue
+
+                    new_distance = d + (overlay.get(u, weights[u]) if overlay else weights[u])
+
+                    if new_distance < distance[u]:
+                        if distance[u] == INF:
+                            touched.append(u)
+                        distance[u] = new_distance
+                        parent[u] = v
+                        heappush(heap, (new_distance, counter, u))
+                        counter += 1
+                        if len(heap) > peak_open:
+                            peak_open = len(heap)
+
+            return None, INF
+        finally:
+            stats.expanded, stats.pushes, stats.pops, stats.peak_open = expanded, counter, pops, peak_open
+
+
+    def bidirectional_dijkstra(self, source, target):
+        '''
+        Dijkstra from the source and from the target at the same time, one step in each direction in turn.
+        The search stops when a cell has been settled by both directions.
+
+        @param source: the index of the start cell
+        @param target: the index of the end cell
+        @return: a (path, distance) tuple, like dijkstra()
+        '''
+
+        self.reset()
+
+        if self.blocked[source] or self.blocked[target]:
+            return None, INF
+
+        if source == target:
+            return [source], 0
+
+        weights, overlay, touched = self.weights, self.overlay, self.touched
+        distances = (self.distance, self.distance_back)
+        parents = (self.parent, self.parent_back)
+        closeds = (self.closed, self.closed_back)
+        expand = (self.neighbours, self.predecessors)
+
+        distances[0][source] = 0
+        distances[1][target] = 0
+        touched.append(source)
+        touched.append(target)
+
+        fringes = ([(0, 0, source)], [(0, 1, target)])
+        counter = 2
+        expanded, pops, peak_open = 0, 0, 2
+
+        # the best path found so far goes through the cell meeting[0], whose parents in the two directions were meeting[1] and meeting[2]
+        best_distance = INF
+        meeting = None
+
+        direction = 1
+        try:
+            while fringes[0] and fringes[1]:
+                direction = 1 - direction
+
+                d, _, v = heappop(fringes[direction])
+                pops += 1
+                if not pops % CANCEL_CHECK_INTERVAL:
+                    self.check_cancelled()
+
+                distance, parent, closed = distances[direction], parents[direction], closeds[direction]
+                other_distance = distances[1 - direction]
+
+                if closed[v]:
+                    continue
+                closed[v] = 1
+
+                if closeds[1 - direction][v]:
+                    # v has been settled in both directions, so the best path that we have found is the shortest one
+                    cell, forward_parent, backward_parent = meeting
+                    path = self.path_to(forward_parent) if forward_parent != -1 else []
+                    path.append(cell)
+                    if backward_parent != -1:
+                        path.extend(reversed(self.path_to(backward_parent, self.parent_back)))
+                    return path, best_distance
+                expanded += 1
+
+                for w in expand[direction](v):
+                    if closed[w]:
+                        continue
+
+                    # moving into a cell costs its weight, so the backward edge w -> v costs the weight of v
+                    moved_into = w if direction == 0 else v
+                    new_distance = d + (overlay.get(moved_into, weights[moved_into]) if overlay else weights[moved_into])
+
+                    if new_distance < distance[w]:
+                        if distance[w] == INF and other_distance[w] == INF:
+                            touched.append(w)
+                        distance[w] = new_distance
+                        parent[w] = v
+                        heappush(fringes[direction], (new_distance, counter, w))
+                        counter += 1
+                        if len(fringes[0]) + len(fringes[1]) > peak_open:
+                            peak_open = len(fringes[0]) + len(fringes[1])
+
+                        if other_distance[w] != INF and (meeting is None or best_distance > new_distance + other_distance[w]):
+                            best_distance = new_distance + other_distance[w]
+                            meeting = (w, self.parent[w], self.parent_back[w])
+
+            return None, INF
+        finally:
+            self.stats.expanded, self.stats.pushes, self.stats.pops, self.stats.peak_open = expanded, counter, pops, peak_open
+
+
+    def astar(self, source, target, heuristic=None, scale=1):
+        '''
+        @param source: the index of the start cell
+        @param target: the index of the end cell
+        @param heuristic: a function of a cell index that returns an admissible estimate of its distance to the target.
+                          Defaults to the Manhattan distance, which is admissible because every weight is at least 1.
+        @param scale: the factor of the default Manhattan distance (at most the cheapest weight of the map, see heuristics.py)
+        @return: a (path, distance) tuple, like dijkstra()
+        '''
+
+        self.reset()
+
+        if self.blocked[source] or self.blocked[target]:
+            return None, INF
+
+        weights, overlay, distance, parent, closed, touched = self.weights, self.overlay, self.distance, self.parent, self.closed, self.touched
+        neighbours = self.neighbours
+        columns = self.columns
+
+        target_row, target_column = divmod(target, columns)
+
+        distance[source] = 0
+        touched.append(source)
+
+        counter = 1
+        heap = [(0, 0, source, 0, -1)]  # (priority, counter, cell, distance, parent)
+        expanded, pops, peak_open = 0, 0, 1
+
+        try:
+            while heap:
+                _, _, v, d, p = heappop(heap)
+                pops += 1
+                if not pops % CANCEL_CHECK_INTERVAL:
+                    self.check_cancelled()
+
+                if v == target:
+                    parent[v] = p
+                    return self.path_to(target), d
+
+                if closed[v]:
+                    # skip the stale entries that were pushed before a cheaper path to the cell was found
+                    if v == source or distance[v] < d:
+                        continue
+
+                closed[v] = 1
+                parent[v] = p
+                expanded += 1
+
+                for u in neighbours(v):
+                    new_distance = d + (overlay.get(u, weights[u]) if overlay else weights[u])
+
+                    if new_distance < distance[u]:
+                        if distance[u] == INF:
+                            touched.append(u)
+                        distance[u] = new_distance
+
+                        if heuristic is None:
+                            row, column = divmod(u, columns)
+                            h = scale * (abs(row - target_row) + abs(column - target_column))
+                        else:
+                            h = heuristic(u)
+
+                        heappush(heap, (new_distance + h, counter, u, new_distance, v))
+                        counter += 1
+                        if len(heap) > peak_open:
+                            peak_open = len(heap)
+
+            return None, INF
+        finally:
+            self.stats.expanded, self.stats.pushes, self.stats.pops, self.stats.peak_open = expanded, counter, pops, peak_open
+
+
+    def nearest_search(self, sources, targets, heuristic=None):
+        '''
+        One search from several sources to the nearest of several targets, instead of one search per (source, target) pair.
+
+        Every source is pushed with distance 0, as if a virtual super-source had an edge of cost 0 to each of them, and every
+        target has an edge of cost 0 to a virtual super-target: like GridMap.path_cost, the weight of the target that a path
+        ends at is not part of its cost, so targets of different weights are compared fairly. The search stops when the
+        super-target is settled.
+
+        @param sources: the indices of the start cells
+        @param targets: the indices of the end cells
+        @param heuristic: a function of a cell index that returns a consistent estimate of the cost from the cell to the
+                          super-target (see heuristics.nearest_target_heuristic). None for Dijkstra
+        @return: a (path, cost) tuple, where the path is a list of cell indices from one of the sources to the nearest target
+                 and the cost is the sum of the weights of the cells between them. The path is None if no target is reachable.
+        '''
+
+        self.reset()
+
+        blocked = self.blocked
+        sources = [source for source in dict.fromkeys(sources) if not blocked[source]]
+        target_set = {target for target in targets if not blocked[target]}
+
+        if not sources or not target_set:
+            return None, INF
+
+        for source in sources:
+            if source in target_set:
+                return [source], 0
+
+        weights, overlay, distance, parent, closed, touched = self.weights, self.overlay, self.distance, self.parent, self.closed, self.touched
+        neighbours = self.neighbours
+        size = self.size
+
+        # the heap entry of the super-target reached through the target t is (cost, counter, size + t, cost, last cell before t)
+        reached = {}  # the cheapest cost that has been pushed for each target
+        heap = []
+        counter = 0
+        for source in sources:
+            distance[source] = 0
+            touched.append(source)
+            heap.append((heuristic(source) if heuristic else 0, counter, source, 0, -1))
+            counter += 1
+        heap.sort()
+
+        expanded, pops, peak_open = 0, 0, len(heap)
+
+        try:
+            while heap:
+                _, _, v, d, p = heappop(heap)
+                pops += 1
+                if not pops % CANCEL_CHECK_INTERVAL:
+                    self.check_cancelled()
+
+                if v >= size:
+                    return self.path_to(p) + [v - size], d
+
+                if closed[v]:
+                    continue  # the heuristic is consistent, so the first entry of a cell has its shortest distance
+                closed[v] = 1
+                parent[v] = p
+                expanded += 1
+
+                for u in neighbours(v):
+                    if u in target_set and d < reached.get(u, INF):
+                        reached[u] = d
+                        heappush(heap, (d, counter, size + u, d, v))
+                        counter += 1
+
+                    if closed[u]:
+                        continue
+
+                    new_distance = d + (overlay.get(u, weights[u]) if overlay else weights[u])
+
+                    if new_distance < distance[u]:
+                        if distance[u] == INF:
+                            touched.append(u)
+                        distance[u] = new_distance
+                        heappush(heap, (new_distance + (heuristic(u) if heuristic else 0), counter, u, new_distance, v))
+                        counter += 1
+                        if len(heap) > peak_open:
+                            peak_open = len(heap)
+
+            return None, INF
+        finally:
+            self.stats.expanded, self.stats.pushes, self.stats.pops, self.stats.peak_open = expanded, counter, pops, peak_open
+
+
+    def shortest_path_tree(self, root, reverse=False):
+        '''
+        Dijkstra from the root to every cell that it can reach.
+
+        @param root: the index of the root cell
+        @param reverse: False for the distances from the root to every cell, True for the distances from every cell to the root
+        @return: a (distance, parent) tuple of new lists (they do not share the arrays of the other searches).
+                 parent[cell] is the next cell towards the root (-1 for the root and for the cells that the search did not reach).
+        '''
+
+        weights, overlay, blocked = self.weights, self.overlay, self.blocked
+        neighbours = self.neighbours
+
+        distance = [INF] * self.size
+        parent = [-1] * self.size
+        closed = bytearray(self.size)
+
+        self.stats = SearchStats()
+        if blocked[root]:
+            return distance, parent
+
+        distance[root] = 0
+        heap = [(0, root)]
+        expanded, pushes, pops, peak_open = 0, 1, 0, 1
+
+        while heap:
+            d, v = heappop(heap)
+            pops += 1
+            if not pops % CANCEL_CHECK_INTERVAL:
+                self.check_cancelled()
+
+            if closed[v]:
+                continue
+            closed[v] = 1
+            expanded += 1
+
+            # the edge u -> v costs the weight of v, so the reverse tree pays the weight of v to reach u from v
+            if reverse:
+                cost_v = overlay.get(v, weights[v]) if overlay else weights[v]
+
+            for u in neighbours(v):
+                if closed[u]:
+                    continue
+
+                if reverse:
+                    new_distance = d + cost_v
+                else:
+                    new_distance = d + (overlay.get(u, weights[u]) if overlay else weights[u])
+
+                if new_distance < distance[u]:
+                    distance[u] = new_distance
+                    parent[u] = v
+                    heappush(heap, (new_distance, u))
+                    pushes += 1
+                    if len(heap) > peak_open:
+                        peak_open = len(heap)
+
+        self.stats = SearchStats(expanded, pushes, pops, peak_open)
+        return distance, parent
@@ -0,0 +1,536 @@
+'''
+@Author: Spyros Tsattalios
+
+A local HTTP/JSON service that keeps maps loaded in memory and answers shortest path queries.
+
+Other processes on the machine can reuse the same warmed-up maps instead of each loading the map and building its own
+solver: every map is loaded once, its heuristic tables (e.g. the ALT landmarks) are computed once and the results of the
+queries are kept in a PathCache (see pathcache.py), so a repeated query needs no search (and a query that arrives while
+the same query is being searched waits for that search).
+
+The server runs on asyncio. The searches are CPU-heavy, so they run on a thread pool (run_in_executor) and the event loop
+keeps reading and answering requests while they run; every map has one Solver per thread, because a Solver keeps the
+arrays of its searches. The maps are read-only, so the threads share them without locks. The cache is only used from the
+event loop. A connection can pipeline requests (send the next request before the previous response has arrived): the
+requests are answered concurrently and the responses are written back in the order of the requests.
+
+Endpoints (the bodies are JSON, the cells are [row, column]):
+    GET  /maps      the loaded maps
+    POST /maps      load a map: {"name": "big", "file": "big.spmap"}, or generate one:
+                    {"name": "random", "rows": 500, "columns": 500, "obstacle_density": 0.2, "seed": 1, "pattern": "clustered"}
+    POST /path      {"map": "big", "source": [0, 0], "target": [99, 99], "algorithm": "astar", "base_weights": false, "cells": false}
+                    the cost and the run-length encoded moves of the shortest path (and its cells with "cells": true)
+    POST /cost      the same query, only the cost
+    POST /batch     {"map": "big", "queries": [[[0, 0], [99, 99]], ...], "base_weights": false}
+                    the costs of many queries, from shortest path trees shared by the queries (see Solver.solve_pairs)
+    GET  /stats     the latency percentiles of every endpoint and the statistics of the path caches
+
+Examples:
+    python server.py --map big=big.spmap --port 8765
+    curl -s localhost:8765/path -d '{"map": "big", "source": [0, 0], "target": [2999, 2999]}'
+    python server.py --unix /tmp/shortest-path.sock --heuristic alt
+'''
+
+from engine import GridMap, Solver, NoPathError, ALGORITHMS
+from heuristics import HEURISTICS, make_heuristic
+from concurrent.futures import ThreadPoolExecutor
+from pathcache import PathCache, DEFAULT_MAX_ENTRIES
+from paths import EncodedPath
+from collections import deque
+import argparse
+import asyncio
+import queue
+import time
+import json
+import sys
+import os
+
+
+MAX_BODY_BYTES = 64 * 1024 * 1024  # the largest request body that the server reads
+PIPELINE_DEPTH = 64  # the number of requests of a connection that can be in progress at the same time
+LATENCY_SAMPLES = 10000  # the number of the latest latencies of every endpoint that the percentiles are computed from
+PERCENTILES = (50, 90, 99)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    '''
+    Raised by an endpoint for a request that it cannot answer. The status is the HTTP status of the response.
+    '''
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LoadedMap(object):
+
+    '''
+    A map of the service with the solvers of the threads and the path cache.
+
+    Every view of the map (with the areas of attraction / repulsion of the map and with its base weights) has a heuristic,
+    prepared once when the map is loaded, and a pool of solvers, one per thread of the executor.
+    '''
+
+    def __init__(self, name, grid_map, workers, heuristic_name="scaled", cache_size=DEFAULT_MAX_ENTRIES):
+
+        self.name = name
+        self.grid_map = grid_map
+        self.cache = PathCache(grid_map, max_entries=cache_size)
+        self.in_flight = {}  # the cache key of a query that is being searched -> the future of its result
+        self.pools = {}
+
+        for overlay in (grid_map.overlay, None):
+            heuristic = make_heuristic(heuristic_name, grid_map, overlay)
+            heuristic.prepare()
+
+            pool = queue.Queue()
+            for _ in range(workers):
+                pool.put(Solver(grid_map, overlay=overlay, heuristic=heuristic))
+            self.pools[overlay is None] = pool
+
+
+    def overlay(self, base_weights):
+        return None if base_weights else self.grid_map.overlay
+
+
+    def solve(self, base_weights, function):
+        '''
+        This function runs on a thread of the executor.
+
+        @param function: a function of a Solver, called with a solver that no other thread is using
+        @return: the result of the function
+        '''
+
+        pool = self.pools[base_weights]
+        solver = pool.get()
+        try:
+            return function(solver)
+        finally:
+            pool.put(solver)
+
+
+    def shortest_path(self, base_weights, source, target, algorithm):
+        # the PathResult of the query or None if it has no path (on a thread of the executor)
+        def search(solver):
+            try:
+                return solver.shortest_path(source, target, algorithm)
+            except NoPathError:
+                return None
+
+        return self.solve(base_weights, search)
+
+
+    def summary(self):
+        grid_map = self.grid_map
+        return {
+            "name": self.name,
+            "rows": grid_map.rows,
+            "columns": grid_map.columns,
+            "obstacles": len(grid_map.obstacles),
+            "attraction_areas": len(grid_map.attraction_areas),
+            "repulsion_areas": len(grid_map.repulsion_areas)
+        }
+
+
+class LatencyStats(object):
+
+    '''
+    The latencies of the latest requests of every endpoint.
+    '''
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = samples
+        self.latencies = {}  # endpoint -> deque of seconds
+        self.counts = {}  # endpoint -> the number of requests since the start
+
+
+    def record(self, endpoint, seconds):
+        self.latencies.setdefault(endpoint, deque(maxlen=self.samples)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+
+    def report(self):
+        '''
+        @return: the count, the mean, the percentiles and the maximum (in milliseconds) of every endpoint
+        '''
+
+        report = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            stats = {"count": self.counts[endpoint], "mean_ms": 1000 * sum(ordered) / len(ordered)}
+            for percentile in PERCENTILES:
+                # the nearest rank: the smallest latency that at least percentile% of the requests did not exceed
+                rank = max(0, -(-percentile * len(ordered) // 100) - 1)
+                stats[f"p{percentile}_ms"] = 1000 * ordered[rank]
+            stats["max_ms"] = 1000 * ordered[-1]
+            report[endpoint] = stats
+
+        return report
+
+
+def parse_cell(body, key, grid_map):
+    '''
+    @return: the cell body[key] as a (row, column) tuple
+    @raise ServiceError: if it is missing, it is not a pair of integers or it is outside the map
+    '''
+
+    value = body.get(key)
+    # type() and not isinstance(): a JSON true / false is a bool, which is a subclass of int
+    if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(type(number) is int for number in value):
+        raise ServiceError(400, f"{key!r} must be a [row, column] pair of integers")
+
+    cell = (value[0], value[1])
+    if not grid_map.in_bounds(cell):
+        raise ServiceError(400, f"{key!r} {list(cell)} is outside the {grid_map.rows}x{grid_map.columns} map")
+
+    return cell
+
+
+async def read_request(reader):
+    '''
+    @return: the (method, path, headers, body) of the next request of the connection, None at the end of the connection
+    @raise ServiceError: if the request is malformed
+    '''
+
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ServiceError(400, "Malformed request line")
+    method, path, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        line = line.decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    # HTTP/1.1 keeps the connection open unless the client asks to close it, HTTP/1.0 the other way round
+    connection = headers.get("connection", "").lower()
+    headers["keep-alive"] = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise ServiceError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise ServiceError(413, "The request body is too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+def encode_response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    return head.encode("latin-1") + body
+
+
+class PathService(object):
+
+    '''
+    The maps, the executor and the endpoints of the server.
+    '''
+
+    def __init__(self, workers=None, heuristic_name="scaled", cache_size=DEFAULT_MAX_ENTRIES):
+
+        self.workers = workers or os.cpu_count() or 1
+        self.heuristic_name = heuristic_name
+        self.cache_size = cache_size
+
+        self.maps = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.latency = LatencyStats()
+
+        self.routes = {
+            ("GET", "/maps"): self.list_maps,
+            ("POST", "/maps"): self.load_map,
+            ("POST", "/path"): self.path_query,
+            ("POST", "/cost"): self.cost_query,
+            ("POST", "/batch"): self.batch_query,
+            ("GET", "/stats"): self.stats
+        }
+
+
+    async def run_in_executor(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+
+    def add_map(self, name, grid_map):
+        # this function runs on a thread of the executor: the heuristic tables are computed here
+        loaded_map = LoadedMap(name, grid_map, self.workers, self.heuristic_name, self.cache_size)
+        return loaded_map
+
+
+    def get_map(self, body):
+        name = body.get("map")
+        if name not in self.maps:
+            raise ServiceError(404, f"There is no map {name!r}, load it with POST /maps")
+        return self.maps[name]
+
+
+    async def list_maps(self, body):
+        return {"maps": [loaded_map.summary() for loaded_map in self.maps.values()]}
+
+
+    async def load_map(self, body):
+
+        name = body.get("name")
+        if not isinstance(name, str) or not name:
+            raise ServiceError(400, "The map needs a name")
+
+        def load():
+            if "file" in body:
+                grid_map = GridMap.load(body["file"])
+            else:
+                rows, columns = int(body["rows"]), int(body["columns"])
+                obstacle_density = float(body.get("obstacle_density", 0.0))
+                if body.get("pattern") is not None:
+                    from terrain import generate_map
+                    grid_map = generate_map(rows, columns, pattern=body["pattern"], obstacle_density=obstacle_density, seed=body.get("seed"))
+                else:
+                    grid_map = GridMap.generate(rows, columns, obstacle_density=obstacle_density, seed=body.get("seed"))
+            return self.add_map(name, grid_map)
+
+        try:
+            loaded_map = await self.run_in_executor(load)
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            raise ServiceError(400, f"The map could not be loaded: {error}")
+
+        if name in self.maps:
+            self.maps[name].cache.close()
+        self.maps[name] = loaded_map
+
+        return loaded_map.summary()
+
+
+    async def find_path(self, body):
+        '''
+        @return: the PathResult of the query (None if there is no path) and whether it came from the cache or from a
+                 search of the same query that was already running
+        '''
+
+        loaded_map = self.get_map(body)
+        grid_map = loaded_map.grid_map
+
+        source = parse_cell(body, "source", grid_map)
+        target = parse_cell(body, "target", grid_map)
+        algorithm = body.get("algorithm", "astar")
+        if algorithm not in ALGORITHMS:
+            raise ServiceError(400, f"Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+
+        base_weights = bool(body.get("base_weights", False))
+        overlay = loaded_map.overlay(base_weights)
+
+        # the cache is only used on the event loop, so it needs no lock
+        found, result = loaded_map.cache.get(overlay, source, target, algorithm)
+        if found:
+            return result, True
+
+        # the same query can arrive again (e.g. pipelined) before its search is over: it waits for that search
+        key = (loaded_map.cache.view(overlay), source, target, algorithm)
+        future = loaded_map.in_flight.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = loaded_map.in_flight[key] = asyncio.ensure_future(self.run_in_executor(loaded_map.shortest_path, base_weights, source, target, algorithm))
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del loaded_map.in_flight[key]
+        loaded_map.cache.put(overlay, source, target, algorithm, result)
+
+        return result, False
+
+
+    async def path_query(self, body):
+
+        result, cached = await self.find_path(body)
+        if result is None:
+            return {"found": False, "cached": cached}
+
+        encoded = EncodedPath.from_cells(result.path)
+        payload = {"found": True, "cost": result.cost, "length": len(encoded), "start": list(encoded.start), "moves": encoded.moves(), "cached": cached}
+        if body.get("cells"):
+            payload["cells"] = [list(cell) for cell in result.path]
+
+        return payload
+
+
+    async def cost_query(self, body):
+
+        result, cached = await self.find_path(body)
+        return {"found": result is not None, "cost": None if result is None else result.cost, "cached": cached}
+
+
+    async def batch_query(self, body):
+
+        loaded_map = self.get_map(body)
+        grid_map = loaded_map.grid_map
+
+        queries = body.get("queries")
+        if not isinstance(queries, list):
+            raise ServiceError(400, "'queries' must be a list of [source, target] pairs")
+        pairs = [(parse_cell({"source": query[0]}, "source", grid_map), parse_cell({"target": query[1]}, "target", grid_map)) if isinstance(query, list) and len(query) == 2 else (None, None) for query in queries]
+        if any(source is None for source, _ in pairs):
+            raise ServiceError(400, "'queries' must be a list of [source, target] pairs")
+
+        results = await self.run_in_executor(loaded_map.solve, bool(body.get("base_weights", False)), lambda solver: solver.solve_pairs(pairs))
+
+        return {"costs": [None if result is None else result.cost for result in results]}
+
+
+    async def stats(self, body):
+        return {
+            "workers": self.workers,
+            "latency": self.latency.report(),
+            "caches": {name: loaded_map.cache.stats() for name, loaded_map in self.maps.items()}
+        }
+
+
+    async def respond(self, method, path, body):
+        '''
+        @return: the (status, payload) of a request
+        '''
+
+        start_time = time.perf_counter()
+        endpoint = f"{method} {path}"
+
+        try:
+            handler = self.routes.get((method, path))
+            if handler is None:
+                if any(route_path == path for _, route_path in self.routes):
+                    raise ServiceError(405, f"{method} is not allowed on {path}")
+                raise ServiceError(404, f"There is no endpoint {path}")
+
+            try:
+                request = json.loads(body) if body.strip() else {}
+            except ValueError as error:
+                raise ServiceError(400, f"The body is not valid JSON: {error}")
+            if not isinstance(request, dict):
+                raise ServiceError(400, "The body must be a JSON object")
+
+            status, payload = 200, await handler(request)
+        except ServiceError as error:
+            status, payload = error.status, {"error": str(error)}
+        except Exception as error:  # a bug must not close the connection of the client
+            status, payload = 500, {"error": f"{type(error).__name__}: {error}"}
+
+        self.latency.record(endpoint, time.perf_counter() - start_time)
+        return status, payload
+
+
+    async def handle_connection(self, reader, writer):
+        '''
+        The requests of the connection are read as they arrive and answered concurrently; the responses are written in the
+        order of the requests by write_responses.
+        '''
+
+        responses = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        writer_task = asyncio.ensure_future(self.write_responses(responses, writer))
+
+        try:
+            while not writer_task.done():
+                try:
+                    request = await read_request(reader)
+                except ServiceError as error:
+                    await responses.put((asyncio.ensure_future(asyncio.sleep(0, (error.status, {"error": str(error)}))), False))
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                await responses.put((asyncio.ensure_future(self.respond(method, path, body)), headers["keep-alive"]))
+                if not headers["keep-alive"]:
+                    break
+        finally:
+            if not writer_task.done():
+                await responses.put(None)
+            await writer_task
+
+
+    async def write_responses(self, responses, writer):
+
+        try:
+            while True:
+                item = await responses.get()
+                if item is None:
+                    break
+
+                task, keep_alive = item
+                status, payload = await task
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def parse_map_argument(text):
+    name, separator, file_name = text.partition("=")
+    if not separator or not name or not file_name:
+        raise argparse.ArgumentTypeError("expected NAME=FILE")
+    return name, file_name
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve shortest path queries on maps kept in memory, as HTTP/JSON.")
+
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on (the service has no authentication, keep it local)")
+    parser.add_argument("--port", type=int, default=8765, help="the TCP port to listen on")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--map", type=parse_map_argument, action="append", default=[], help="load a map at start-up, given as NAME=FILE (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="the number of threads that run the searches (defaults to the number of CPUs)")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="scaled", help="the heuristic of the A* searches (the ALT tables are computed once per map)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="the number of path results that every map keeps in its cache")
+
+    return parser
+
+
+async def serve(args):
+
+    service = PathService(args.workers, args.heuristic, args.cache_size)
+
+    for name, file_name in args.map:
+        start_time = time.perf_counter()
+        service.maps[name] = await service.run_in_executor(service.add_map, name, GridMap.load(file_name))
+        print(f"Loaded {name} from {file_name} ({time.perf_counter() - start_time:.2f} s)", file=sys.stderr)
+
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.unix)
+        print(f"Listening on {args.unix}", file=sys.stderr)
+    else:
+        server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+        print(f"Listening on http://{args.host}:{args.port}", file=sys.stderr)
+
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
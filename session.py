@@ -0,0 +1,251 @@
+'''
+@Author: Spyros Tsattalios
+
+Recording of the sessions of the game and their headless replay.
+
+A session log is a JSON Lines file. The first line describes the map (the parameters of the start screen and the seed of a
+generated map, or the file of a loaded map) and the options of the game; every other line is one action of the user:
+
+    [milliseconds since the start, kind, arguments...]
+
+    "source", "end point", "obstacle", "destination", "attraction", "repulsion"   row, column
+    "obstacles"                                                                   the cell indices of a batch of obstacles
+    "distance field"                                                              1 to show the field, 0 to hide it
+    "find", "keep editing", "replan"                                              no arguments
+
+The GUI records the actions that changed the game (a click on a cell that cannot change is not recorded) and writes every
+line as soon as it happens, so the log of a session that was killed is still complete up to its last action.
+
+SessionReplay runs the actions of a log against the engine, with the same map, solvers, planner and distance field as the
+GUI but without any widget, so a slow session can be timed and profiled again and again (see replay.py).
+'''
+
+from engine import GridMap, Solver, NoPathError
+from distancefield import DistanceField
+from replanning import IncrementalPlanner
+from heuristics import make_heuristic
+from pathcache import PathCache
+import time
+import json
+import os
+
+
+VERSION = 1
+
+CELL_EVENTS = ("source", "end point", "obstacle", "destination", "attraction", "repulsion")
+
+
+class SessionRecorder(object):
+
+    '''
+    Appends the actions of one session of the game to a session log.
+    '''
+
+    def __init__(self, path, header):
+        '''
+        @param header: the map and the options of the session (see SessionReplay.start)
+        @raise FileExistsError: if the file exists, a session log is never overwritten
+        '''
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.start_time = time.perf_counter()
+        self.file = open(path, "x")
+        self.write(dict(header, version=VERSION, started=time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+
+    @classmethod
+    def in_directory(cls, directory, header):
+        '''
+        @return: a SessionRecorder with a new log in the directory, named after the time (in milliseconds) of its start
+        '''
+
+        now = time.time()
+        name = f"session-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(1000 * now) % 1000:03d}"
+
+        # two rounds that start in the same millisecond get a counter after the time
+        for counter in range(1000):
+            try:
+                return cls(os.path.join(directory, f"{name}-{counter}.jsonl" if counter else f"{name}.jsonl"), header)
+            except FileExistsError:
+                continue
+
+        raise FileExistsError(f"Too many session logs named {name} in {directory}")
+
+
+    def write(self, line):
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+
+    def record(self, kind, *args):
+        if self.file is not None:
+            self.write([round(1000 * (time.perf_counter() - self.start_time), 1), kind, *args])
+
+
+    def record_cell(self, kind, cell):
+        self.record(kind, cell[0], cell[1])
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_session(path):
+    '''
+    @return: the (header, events) of a session log, where every event is a [milliseconds, kind, arguments...] list
+    @raise ValueError: if the file is not a session log of a supported version
+    '''
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+
+    if not lines or not isinstance(lines[0], dict) or "version" not in lines[0]:
+        raise ValueError("The file is not a session log")
+    if lines[0]["version"] > VERSION:
+        raise ValueError(f"The session log has version {lines[0]['version']}, this program reads up to version {VERSION}")
+
+    return lines[0], lines[1:]
+
+
+class SessionReplay(object):
+
+    '''
+    The state of the game without its widgets: the map, the two solvers, the planner of "Keep editing" and the distance field.
+    Every function does the work that the GUI does for the same action, in the same order.
+    '''
+
+    def __init__(self, header, map_file=None):
+        '''
+        @param map_file: the map to use instead of the file of the log (e.g. a copy of the map of a slow session)
+        '''
+
+        self.header = header
+        self.map_file = map_file or header.get("file")
+
+        self.grid_map = None
+        self.destinations = []
+        self.planner = None
+        self.distance_field = None
+        self.distance_field_shown = False
+        self.a_star_path = None
+        self.detail = {}  # what the last action did, e.g. the seconds of every search of "find"
+
+
+    def start(self):
+        '''
+        The map of the session and the solvers of the game.
+        '''
+
+        header = self.header
+
+        if self.map_file is not None:
+            self.grid_map = GridMap.load(self.map_file)
+            if self.grid_map.start_point is None:
+                self.grid_map.end_point = None  # like main.show_loaded_map: the source is set first, then the destination
+        else:
+            from terrain import generate_map  # like main.py, NumPy is only imported when a map is generated (see replay.warm_up)
+
+            self.grid_map = generate_map(header["rows"], header["columns"], header["areas"], pattern=header["pattern"], seed=header["seed"])
+            self.grid_map.overlay.radius = header["radius"]
+            self.grid_map.overlay.falloff = header["falloff"]
+
+        grid_map = self.grid_map
+        self.path_cache = PathCache(grid_map)
+        self.solver = Solver(grid_map, overlay=grid_map.overlay, heuristic=make_heuristic(header["heuristic"], grid_map, grid_map.overlay), cache=self.path_cache)
+        self.old_solver = Solver(grid_map, heuristic=make_heuristic(header["heuristic"], grid_map), cache=self.path_cache)
+
+        self.detail = {"rows": grid_map.rows, "columns": grid_map.columns}
+
+
+    def run(self, event):
+        '''
+        @param event: a [milliseconds, kind, arguments...] line of the log
+        '''
+
+        kind, args = event[1], event[2:]
+        self.detail = {}
+
+        if kind in CELL_EVENTS:
+            cell = (args[0], args[1])
+            if kind == "source":
+                self.grid_map.start_point = cell
+            elif kind == "end point":
+                self.grid_map.end_point = cell
+            elif kind == "obstacle":
+                self.grid_map.add_obstacle(cell)
+            elif kind == "destination":
+                self.destinations.append(cell)
+            else:
+                self.detail["changed_cells"] = len(self.grid_map.add_influence_area(cell, kind == "attraction"))
+        elif kind == "obstacles":
+            columns = self.grid_map.columns
+            self.detail["added"] = len(self.grid_map.add_obstacles([divmod(index, columns) for index in args[0]]))
+        elif kind == "find":
+            self.find()
+        elif kind == "keep editing":
+            self.keep_editing()
+        elif kind == "replan":
+            self.replan()
+        elif kind == "distance field":
+            self.toggle_distance_field(bool(args[0]))
+        else:
+            raise ValueError(f"Unknown event {kind!r}")
+
+
+    def find(self):
+        # Dijkstra, Dijkstra without areas, A*, A* without areas, like main.find_shortest_path
+
+        targets = [self.grid_map.end_point] + self.destinations
+        for name, solver, algorithm in (("Dijkstra", self.solver, "dijkstra"), ("Dijkstra without areas", self.old_solver, "dijkstra"), ("A*", self.solver, "astar"), ("A* without areas", self.old_solver, "astar")):
+            start_time = time.perf_counter()
+            try:
+                if len(targets) > 1:
+                    result = solver.nearest_path([self.grid_map.start_point], targets, algorithm)
+                else:
+                    result = solver.shortest_path(algorithm=algorithm)
+            except NoPathError:
+                self.detail[name] = {"found": False, "seconds": time.perf_counter() - start_time}
+                return  # the game stops at the first search without a path
+
+            self.detail[name] = {"cost": result.cost, "cached": result.cached, "expanded": result.stats.expanded, "seconds": time.perf_counter() - start_time}
+            if name == "A*":
+                self.a_star_path = result.path
+
+
+    def keep_editing(self):
+        # the first search of the planner is the "replan" that the log has right after this action
+        self.planner = IncrementalPlanner(self.grid_map, target=self.a_star_path[-1], overlay=self.grid_map.overlay)
+
+
+    def replan(self):
+
+        try:
+            result = self.planner.shortest_path()
+            self.detail["cost"] = result.cost
+        except NoPathError:
+            self.detail["cost"] = None
+        self.detail["expanded"] = self.planner.expanded
+
+        # the GUI repairs the distance field that it shows after every repair of the path
+        if self.distance_field_shown:
+            self.detail["field_changed_cells"] = len(self.distance_field.update())
+
+
+    def toggle_distance_field(self, shown):
+
+        self.distance_field_shown = shown
+        if not shown:
+            return
+
+        if self.distance_field is None:
+            self.distance_field = DistanceField(self.grid_map, [self.grid_map.end_point] + self.destinations, overlay=self.grid_map.overlay)
+        else:
+            self.distance_field.update()
+
+        self.detail["expanded"] = self.distance_field.expanded
@@ -0,0 +1,33 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the modules of the game are at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import NoPathError
+
+
+@pytest.fixture
+def random_pairs():
+    # random (source, target) pairs of distinct free cells of a map
+    def pairs(grid_map, count, seed=0):
+        rng = random.Random(seed)
+        free = grid_map.free_cells()
+        return [tuple(rng.sample(free, 2)) for _ in range(count)]
+
+    return pairs
+
+
+@pytest.fixture
+def path_cost():
+    # the cost of the shortest path of a solver, None if there is no path
+    def cost(solver, source, target, algorithm="dijkstra"):
+        try:
+            return solver.shortest_path(source, target, algorithm).cost
+        except NoPathError:
+            return None
+
+    return cost
@@ -0,0 +1,30 @@
+import pytest
+
+import batch
+
+
+def test_trees_with_the_networkx_backend(capsys):
+    batch.main(["--rows", "12", "--columns", "12", "--queries", "5", "--seed", "1", "--backend", "networkx", "--trees", "--quiet"])
+
+    assert "dijkstra-tree: 5 queries" in capsys.readouterr().err
+
+
+def test_workers_use_the_backend_and_the_cache():
+    import parallel
+    from engine import GridMap, Solver
+
+    grid_map = GridMap.generate(20, 20, obstacle_density=0.1, seed=2)
+    queries = batch.random_queries(grid_map, 4, seed=2) * 3
+    cache_stats = {}
+
+    results = parallel.solve_queries(grid_map, queries, ["dijkstra"], workers=2, chunk_size=6, backend="networkx", cache_size=8, cache_stats=cache_stats)
+
+    assert [cost for _, _, _, cost, _ in results] == [cost for _, _, _, cost, _ in batch.run_queries(Solver(grid_map, overlay=grid_map.overlay), queries, ["dijkstra"])]
+    assert cache_stats["hits"] + cache_stats["misses"] == len(queries) and cache_stats["hits"] > 0
+
+
+def test_a_one_cell_map_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch.main(["--rows", "1", "--columns", "1", "--queries", "3"])
+
+    assert exit_info.value.code == 2 and "two cells" in capsys.readouterr().err
@@ -0,0 +1,25 @@
+import pytest
+
+from engine import GridMap, DEFAULT_AREAS, validate
+
+
+def test_grid_backend_matches_networkx(random_pairs):
+    grid_map = GridMap.generate(25, 25, obstacle_density=0.2, seed=7)
+
+    assert validate(grid_map, random_pairs(grid_map, 30)) == []
+
+
+def test_grid_backend_matches_networkx_with_an_overlay(random_pairs):
+    grid_map = GridMap.generate(25, 25, obstacle_density=0.2, seed=8)
+    grid_map.overlay.radius = 2
+    grid_map.add_influence_area((5, 5), attraction=True)
+    grid_map.add_influence_area((18, 12), attraction=False)
+
+    assert validate(grid_map, random_pairs(grid_map, 30, seed=1), overlay=grid_map.overlay) == []
+
+
+def test_a_map_needs_two_cells():
+    with pytest.raises(ValueError):
+        GridMap(1, 1, DEFAULT_AREAS, [0])
+
+    assert GridMap(1, 2, DEFAULT_AREAS, [0, 0]).rows == 1
@@ -0,0 +1,24 @@
+import threading
+
+import pytest
+
+from engine import GridMap, Solver
+from heuristics import make_heuristic
+from search import SearchCancelled
+
+
+def test_cancel_stops_the_landmark_tables():
+    grid_map = GridMap.generate(80, 80, obstacle_density=0.1, seed=6)  # larger than search.CANCEL_CHECK_INTERVAL cells
+    heuristic = make_heuristic("alt", grid_map)
+    solver = Solver(grid_map, heuristic=heuristic)
+    source, target = grid_map.free_cells()[0], grid_map.free_cells()[-1]
+
+    event = threading.Event()
+    event.set()
+    solver.set_cancel_event(event)
+    with pytest.raises(SearchCancelled):
+        solver.shortest_path(source, target, "astar")
+    assert heuristic.stale
+
+    event.clear()
+    assert solver.shortest_path(source, target, "astar").cost == Solver(grid_map).shortest_path(source, target, "dijkstra").cost
@@ -0,0 +1,50 @@
+import random
+
+from engine import Solver
+from hierarchical import HierarchicalPlanner
+from terrain import generate_map
+
+
+def assert_valid_path(grid_map, path, source, target):
+    assert path[0] == source and path[-1] == target
+    assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 and not grid_map.is_obstacle(b) for a, b in zip(path, path[1:]))
+
+
+def test_smoothing_never_makes_a_path_worse(random_pairs, path_cost):
+    grid_map = generate_map(60, 60, pattern="clustered", obstacle_density=0.2, seed=1)
+    solver = Solver(grid_map)
+    rough = HierarchicalPlanner(grid_map, 10, corridor=None)
+    smooth = HierarchicalPlanner(grid_map, 10, corridor=1)
+
+    for source, target in random_pairs(grid_map, 30, seed=1):
+        exact = path_cost(solver, source, target)
+        if exact is None:
+            continue
+
+        result = smooth.shortest_path(source, target)
+        assert_valid_path(grid_map, result.path, source, target)
+        assert exact <= result.cost <= rough.shortest_path(source, target).cost
+        assert smooth.smoothing_gain >= 0
+
+
+def test_paths_stay_valid_after_edits(random_pairs, path_cost):
+    grid_map = generate_map(40, 40, obstacle_density=0.1, seed=2)
+    planner = HierarchicalPlanner(grid_map, 8, overlay=grid_map.overlay)
+    queries = random_pairs(grid_map, 10, seed=2)
+    endpoints = {cell for query in queries for cell in query}
+
+    rng = random.Random(2)
+    for edit in range(20):
+        cell = (rng.randrange(40), rng.randrange(40))
+        if edit % 2:
+            grid_map.add_influence_area(cell, attraction=False)
+        elif cell not in endpoints:
+            grid_map.add_obstacle(cell)
+
+        solver = Solver(grid_map, overlay=grid_map.overlay)
+        for source, target in queries:
+            exact = path_cost(solver, source, target)
+            if exact is not None:
+                result = planner.shortest_path(source, target)
+                assert_valid_path(grid_map, result.path, source, target)
+                assert result.cost >= exact
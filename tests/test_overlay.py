@@ -0,0 +1,42 @@
+import random
+
+from engine import Solver
+from terrain import generate_map
+
+
+def test_rebuild_keeps_existing_solvers_in_sync(random_pairs, path_cost):
+    grid_map = generate_map(30, 30, obstacle_density=0.1, seed=3)
+    solver = Solver(grid_map, overlay=grid_map.overlay)
+
+    grid_map.overlay.add_influence_area((10, 10), attraction=True)
+    grid_map.overlay.add_influence_area((20, 15), attraction=False)
+    grid_map.overlay.rebuild(radius=6)
+
+    for source, target in random_pairs(grid_map, 20, seed=1):
+        assert path_cost(solver, source, target) == path_cost(Solver(grid_map, overlay=grid_map.overlay), source, target)
+
+
+def test_areas_added_one_by_one_match_a_rebuild():
+    grid_map = generate_map(30, 30, obstacle_density=0.1, seed=5)
+    overlay = grid_map.overlay
+    overlay.radius = 3
+
+    rng = random.Random(2)
+    for _ in range(12):
+        overlay.add_influence_area((rng.randrange(30), rng.randrange(30)), attraction=rng.random() < 0.5)
+
+    incremental = [overlay.weight(cell) for cell in grid_map.free_cells()]
+    overlay.rebuild()
+
+    assert incremental == [overlay.weight(cell) for cell in grid_map.free_cells()]
+
+
+def test_added_areas_only_report_changed_cells():
+    grid_map = generate_map(20, 20, seed=1)
+    overlay = grid_map.overlay
+    overlay.radius, overlay.falloff = 3, "gaussian"
+
+    before = {cell: overlay.weight(cell) for cell in grid_map.free_cells()}
+    changed = overlay.add_influence_area((10, 10), attraction=True)
+
+    assert changed and all(before[cell] != weight for cell, weight in changed)
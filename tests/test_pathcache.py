@@ -0,0 +1,63 @@
+import random
+
+from engine import GridMap, Solver
+from pathcache import PathCache
+
+
+def test_every_overlay_gets_its_own_view():
+    grid_map = GridMap.generate(20, 20, obstacle_density=0.1, seed=4)
+    grid_map.overlay.add_influence_area((10, 10), attraction=False)
+    cache = PathCache(grid_map)
+
+    copies = [grid_map.overlay.copy() for _ in range(3)]
+    assert len({cache.view(overlay) for overlay in copies}) == 3
+
+    # the overlays are kept by the cache, so a new overlay never gets the view of an old one
+    views = {cache.view(grid_map.overlay.copy()) for _ in range(50)}
+    assert len(views) == 50
+
+
+def test_an_obstacle_on_a_cached_path_drops_it(random_pairs, path_cost):
+    grid_map = GridMap.generate(20, 20, obstacle_density=0.05, seed=5)
+    solver = Solver(grid_map, cache=PathCache(grid_map))
+    source, target = random_pairs(grid_map, 1, seed=5)[0]
+
+    path = solver.shortest_path(source, target).path
+    assert solver.shortest_path(source, target).cached
+
+    grid_map.add_obstacles([path[len(path) // 2]])
+    result = solver.shortest_path(source, target)
+    assert not result.cached and result.cost == path_cost(Solver(grid_map), source, target)
+
+
+def test_a_new_weight_on_a_cached_path_drops_it(random_pairs):
+    grid_map = GridMap.generate(20, 20, obstacle_density=0.05, seed=6)
+    solver = Solver(grid_map, overlay=grid_map.overlay, cache=PathCache(grid_map))
+    source, target = random_pairs(grid_map, 1, seed=6)[0]
+
+    path = solver.shortest_path(source, target).path
+    grid_map.overlay.set_weight(path[len(path) // 2], 50)
+
+    assert not solver.shortest_path(source, target).cached
+
+
+def test_cached_results_follow_the_edits(random_pairs, path_cost):
+    grid_map = GridMap.generate(25, 25, obstacle_density=0.1, seed=7)
+    cache = PathCache(grid_map)
+    solver = Solver(grid_map, overlay=grid_map.overlay, cache=cache)
+    queries = random_pairs(grid_map, 8, seed=7)
+    endpoints = {cell for query in queries for cell in query}
+
+    rng = random.Random(7)
+    for edit in range(30):
+        cell = (rng.randrange(25), rng.randrange(25))
+        if edit % 2:
+            grid_map.add_influence_area(cell, attraction=rng.random() < 0.5)
+        elif cell not in endpoints:
+            grid_map.add_obstacles([cell])
+
+        fresh = Solver(grid_map, overlay=grid_map.overlay)
+        for source, target in queries:
+            assert path_cost(solver, source, target) == path_cost(fresh, source, target)
+
+    assert cache.hits > 0 and cache.invalidations > 0
@@ -0,0 +1,24 @@
+import random
+
+from engine import GridMap, Solver, NoPathError
+from replanning import IncrementalPlanner
+
+
+def test_repairs_match_a_fresh_dijkstra(random_pairs, path_cost):
+    grid_map = GridMap.generate(30, 30, obstacle_density=0.1, seed=9)
+    source, target = random_pairs(grid_map, 1, seed=9)[0]
+    planner = IncrementalPlanner(grid_map, source, target, overlay=grid_map.overlay)
+
+    rng = random.Random(9)
+    for edit in range(40):
+        cell = (rng.randrange(30), rng.randrange(30))
+        if edit % 3 == 0:
+            grid_map.add_influence_area(cell, attraction=rng.random() < 0.5)
+        elif cell not in (source, target):
+            grid_map.add_obstacle(cell)
+
+        try:
+            repaired = planner.shortest_path().cost
+        except NoPathError:
+            repaired = None
+        assert repaired == path_cost(Solver(grid_map, overlay=grid_map.overlay), source, target)
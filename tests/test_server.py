@@ -0,0 +1,13 @@
+import pytest
+
+from server import ServiceError, parse_cell
+from terrain import generate_map
+
+
+def test_parse_cell_rejects_booleans():
+    grid_map = generate_map(10, 10, seed=1)
+
+    assert parse_cell({"source": [1, 0]}, "source", grid_map) == (1, 0)
+    with pytest.raises(ServiceError) as error:
+        parse_cell({"source": [True, 0]}, "source", grid_map)
+    assert error.value.status == 400
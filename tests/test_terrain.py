@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+
+from terrain import generate_terrain
+
+
+@pytest.mark.parametrize("pattern", ["uniform", "clustered"])
+@pytest.mark.parametrize("probabilities", [[1, 1, 1, 1, 1, 0], [1, 0, 1, 1, 1, 1], [0.3, 0.7, 0, 0, 0, 0]])
+def test_areas_without_probability_get_no_cells(pattern, probabilities):
+    terrain = generate_terrain(120, 150, probabilities=probabilities, pattern=pattern, seed=3)
+
+    counts = np.bincount(terrain.ravel(), minlength=len(probabilities))
+    assert all(counts[area] == 0 for area, probability in enumerate(probabilities) if probability == 0)
+    assert all(counts[area] > 0 for area, probability in enumerate(probabilities) if probability > 0)
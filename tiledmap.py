@@ -0,0 +1,452 @@
+'''
+@Author: Spyros Tsattalios
+
+Out-of-core tiled maps, for maps that do not fit in memory.
+
+A tiled map is a directory with a small metadata file and one file per tile of tile_size x tile_size cells:
+
+    tiles.json               rows, columns, tile size, areas, start / end points and the cheapest weight of the map
+    tile_<row>_<column>.bin  the tile in the row and column of tiles: its weights (int32, little-endian), its terrain
+                             (uint8, the index of the area of each cell) and its obstacle bitmap (uint8), row by row.
+                             The tiles at the right and bottom edges are padded to the full size with obstacles
+
+A TiledMap never reads the whole map. Its weights, terrain and obstacle bitmap are TiledLayers, which look like the flat
+arrays of a GridMap (indexed by the cell index i * columns + j) but find the cell in its tile, and the tiles are paged in
+from disk through a TileCache that keeps at most max_tiles of them in memory (the least recently used tile is dropped).
+The searches are GridSearches with sparse arrays (see search.py), so a search reads the tiles that its frontier reaches and
+keeps state only for the cells that it reached: the memory of a query is max_tiles tiles plus the explored region, however
+big the map is.
+
+A tiled map is read-only and has no areas of attraction / repulsion: save_tiled_map() writes the weights of a GridMap with
+or without its overlay, and generate_tiled_map() writes a random map tile by tile (one tile in memory at a time).
+
+Examples:
+    python tiledmap.py generate huge --rows 100000 --columns 100000 --tile-size 256 --obstacle-density 0.2 --seed 1
+    python tiledmap.py path huge --source 0,0 --target 5000,5000 --max-tiles 256
+'''
+
+from engine import PathResult, NoPathError, ALGORITHMS, DEFAULT_AREAS
+from search import GridSearch, INF
+from collections import OrderedDict
+from array import array
+import argparse
+import time
+import json
+import sys
+import os
+
+
+METADATA_FILE = "tiles.json"
+DEFAULT_TILE_SIZE = 256
+DEFAULT_MAX_TILES = 64
+
+
+def tile_file(directory, tile_row, tile_column):
+    return os.path.join(directory, f"tile_{tile_row}_{tile_column}.bin")
+
+
+class Tile(object):
+
+    '''
+    The cells of one tile, row by row (tile_size x tile_size).
+    '''
+
+    def __init__(self, weights, terrain, blocked):
+        self.weights = weights  # array("i")
+        self.terrain = terrain  # bytearray
+        self.blocked = blocked  # bytearray
+
+
+    def nbytes(self):
+        return len(self.weights) * self.weights.itemsize + len(self.terrain) + len(self.blocked)
+
+
+def write_tile(path, tile):
+
+    weights = array("i", tile.weights)
+    if sys.byteorder != "little":
+        weights.byteswap()
+
+    with open(path, "wb") as f:
+        f.write(weights.tobytes())
+        f.write(bytes(tile.terrain))
+        f.write(bytes(tile.blocked))
+
+
+def read_tile(path, tile_size):
+    '''
+    @raise ValueError: if the file does not have the size of a tile
+    '''
+
+    cells = tile_size * tile_size
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) != 6 * cells:
+        raise ValueError(f"The tile {os.path.basename(path)} has {len(data)} bytes, expected {6 * cells}")
+
+    weights = array("i")
+    weights.frombytes(data[:4 * cells])
+    if sys.byteorder != "little":
+        weights.byteswap()
+
+    return Tile(weights, bytearray(data[4 * cells:5 * cells]), bytearray(data[5 * cells:]))
+
+
+class TileCache(object):
+
+    '''
+    A bounded LRU cache of the tiles of a tiled map. The tiles are read from disk the first time they are needed.
+    '''
+
+    def __init__(self, directory, tile_size, max_tiles=DEFAULT_MAX_TILES):
+
+        if max_tiles < 1:
+            raise ValueError("The tile cache needs room for at least one tile")
+
+        self.directory = directory
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()  # (tile row, tile column) -> Tile, from the least to the most recently used
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+
+    def tile(self, key):
+        '''
+        @param key: the (tile row, tile column) of the tile
+        @return: the Tile, read from disk if it is not in the cache
+        '''
+
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+        start_time = time.perf_counter()
+        tile = read_tile(tile_file(self.directory, *key), self.tile_size)
+        self.load_seconds += time.perf_counter() - start_time
+        self.loads += 1
+
+        self.tiles[key] = tile
+        if len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+            self.evictions += 1
+
+        return tile
+
+
+    def clear(self):
+        self.tiles = OrderedDict()
+
+
+    def stats(self):
+        return {
+            "tiles": len(self.tiles),
+            "max_tiles": self.max_tiles,
+            "resident_bytes": sum(tile.nbytes() for tile in self.tiles.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_seconds": self.load_seconds
+        }
+
+
+class TiledLayer(object):
+
+    '''
+    One layer of a tiled map ("weights", "terrain" or "blocked") as a read-only flat array indexed by the cell index.
+
+    The searches read many cells of the same tile in a row, so the layer remembers the last tile that it used and only asks
+    the cache when the cell is in another tile. That tile stays usable even if the cache has dropped it meanwhile (it is
+    read-only), so the layer never holds more than one tile beyond the cache.
+    '''
+
+    def __init__(self, cache, name, rows, columns):
+        self.cache = cache
+        self.name = name
+        self.rows = rows
+        self.columns = columns
+        self.tile_size = cache.tile_size
+
+        self.last_key = None
+        self.last_values = None
+
+
+    def __len__(self):
+        return self.rows * self.columns
+
+
+    def __getitem__(self, index):
+
+        row, column = divmod(index, self.columns)
+        tile_size = self.tile_size
+        tile_row, row = divmod(row, tile_size)
+        tile_column, column = divmod(column, tile_size)
+
+        if (tile_row, tile_column) != self.last_key:
+            self.last_values = getattr(self.cache.tile((tile_row, tile_column)), self.name)
+            self.last_key = (tile_row, tile_column)
+
+        return self.last_values[row * tile_size + column]
+
+
+class TiledMap(object):
+
+    '''
+    A read-only map on disk, split into tiles that are loaded lazily (see the module docstring).
+    '''
+
+    def __init__(self, directory, max_tiles=DEFAULT_MAX_TILES):
+
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+
+        self.directory = directory
+        self.rows = metadata["rows"]
+        self.columns = metadata["columns"]
+        self.tile_size = metadata["tile_size"]
+        self.areas = metadata["areas"]
+        self.cheapest_weight = metadata["cheapest_weight"]
+        self.start_point = None if metadata["start_point"] is None else tuple(metadata["start_point"])
+        self.end_point = None if metadata["end_point"] is None else tuple(metadata["end_point"])
+
+        self.tile_rows = (self.rows + self.tile_size - 1) // self.tile_size
+        self.tile_columns = (self.columns + self.tile_size - 1) // self.tile_size
+
+        self.cache = TileCache(directory, self.tile_size, max_tiles)
+        self.weights = TiledLayer(self.cache, "weights", self.rows, self.columns)
+        self.terrain = TiledLayer(self.cache, "terrain", self.rows, self.columns)
+        self.blocked = TiledLayer(self.cache, "blocked", self.rows, self.columns)
+
+        self.search = GridSearch(self.weights, self.blocked, self.rows, self.columns, sparse=True)
+
+
+    def index(self, cell):
+        return cell[0] * self.columns + cell[1]
+
+
+    def in_bounds(self, cell):
+        return 0 <= cell[0] < self.rows and 0 <= cell[1] < self.columns
+
+
+    def is_free(self, cell):
+        return self.in_bounds(cell) and not self.blocked[self.index(cell)]
+
+
+    def tile(self, tile_row, tile_column):
+        '''
+        @return: the Tile, through the tile cache (e.g. to draw it)
+        '''
+
+        return self.cache.tile((tile_row, tile_column))
+
+
+    def set_cancel_event(self, cancel_event):
+        self.search.cancel_event = cancel_event
+
+
+    def shortest_path(self, source=None, target=None, algorithm="astar"):
+        '''
+        @param algorithm: "dijkstra" (bidirectional) or "astar" (with the Manhattan distance times the cheapest weight)
+        @return: a PathResult, whose stats are the SearchStats of the search
+        @raise NoPathError: if there is no valid path between the source and the target
+        '''
+
+        if source is None:
+            source = self.start_point
+        if target is None:
+            target = self.end_point
+
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+
+        if not (self.in_bounds(source) and self.in_bounds(target)):
+            raise NoPathError(f"There is no valid path between {source} and {target}")
+
+        start_time = time.perf_counter()
+        search = self.search
+
+        try:
+            if algorithm == "dijkstra":
+                path, distance = search.bidirectional_dijkstra(self.index(source), self.index(target))
+            else:
+                path, distance = search.astar(self.index(source), self.index(target), scale=self.cheapest_weight)
+        finally:
+            search.stats.seconds = time.perf_counter() - start_time
+            stats = search.stats
+            search.reset()  # the explored region is only kept until the search is over
+
+        if path is None or distance == INF:
+            raise NoPathError(f"There is no valid path between {source} and {target}")
+
+        # the distance of the search includes the weight of the target, the cost of a path does not (see GridMap.path_cost)
+        cost = distance - self.weights[path[-1]] if len(path) > 1 else 0
+        columns = self.columns
+
+        return PathResult(algorithm, [divmod(index, columns) for index in path], cost, stats)
+
+
+    def close(self):
+        self.cache.clear()
+
+
+def write_metadata(directory, rows, columns, tile_size, areas, cheapest_weight, start_point, end_point):
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump({
+            "rows": rows,
+            "columns": columns,
+            "tile_size": tile_size,
+            "areas": [{"weight": area["weight"], "type": area["type"]} for area in areas],
+            "cheapest_weight": cheapest_weight,
+            "start_point": None if start_point is None else list(start_point),
+            "end_point": None if end_point is None else list(end_point)
+        }, f)
+
+
+def save_tiled_map(grid_map, directory, tile_size=DEFAULT_TILE_SIZE, overlay=None):
+    '''
+    This function will write a GridMap as a tiled map.
+
+    @param overlay: if given, the weights of its cells replace the base weights (e.g. grid_map.overlay)
+    '''
+
+    os.makedirs(directory, exist_ok=True)
+
+    rows, columns = grid_map.rows, grid_map.columns
+    weights, terrain, blocked = grid_map.weights, grid_map.terrain, grid_map.blocked
+    overlay_weights = {} if overlay is None else overlay.weights
+    cheapest_weight = None
+
+    for top in range(0, rows, tile_size):
+        for left in range(0, columns, tile_size):
+
+            tile = Tile(array("i", bytes(4 * tile_size * tile_size)), bytearray(tile_size * tile_size), bytearray(b"\1" * tile_size * tile_size))
+
+            for row in range(top, min(top + tile_size, rows)):
+                first, width = row * columns + left, min(tile_size, columns - left)
+                offset = (row - top) * tile_size
+
+                tile.weights[offset:offset + width] = array("i", weights[first:first + width])
+                tile.terrain[offset:offset + width] = bytes(terrain[first:first + width])
+                tile.blocked[offset:offset + width] = bytes(blocked[first:first + width])
+
+                if overlay_weights:
+                    for index in range(first, first + width):
+                        if index in overlay_weights:
+                            tile.weights[offset + index - first] = overlay_weights[index]
+
+            free_weights = [weight for weight, obstacle in zip(tile.weights, tile.blocked) if not obstacle]
+            if free_weights:
+                cheapest_weight = min(free_weights) if cheapest_weight is None else min(cheapest_weight, min(free_weights))
+
+            write_tile(tile_file(directory, top // tile_size, left // tile_size), tile)
+
+    write_metadata(directory, rows, columns, tile_size, grid_map.areas, max(cheapest_weight or 1, 1), grid_map.start_point, grid_map.end_point)
+
+
+def generate_tiled_map(directory, rows, columns, tile_size=DEFAULT_TILE_SIZE, areas=None, probabilities=None, obstacle_density=0.0, seed=None):
+    '''
+    This function will write a random tiled map without ever holding more than one tile in memory. Every cell gets a type
+    of area independently (the "uniform" pattern of terrain.py) and is an obstacle with probability obstacle_density.
+    The start point is the top left cell and the end point the bottom right cell; both are always free.
+
+    @param seed: every tile gets its own generator, seeded with (seed, tile row, tile column)
+    '''
+
+    import numpy as np
+    from terrain import generate_terrain
+
+    if areas is None:
+        areas = DEFAULT_AREAS
+
+    os.makedirs(directory, exist_ok=True)
+
+    area_weights = np.asarray([area["weight"] for area in areas], dtype="<i4")
+    start_point, end_point = (0, 0), (rows - 1, columns - 1)
+    cheapest_weight = None
+
+    for tile_row in range((rows + tile_size - 1) // tile_size):
+        for tile_column in range((columns + tile_size - 1) // tile_size):
+
+            tile_seed = None if seed is None else [seed, tile_row, tile_column]
+            terrain = generate_terrain(tile_size, tile_size, areas, probabilities, "uniform", tile_seed)
+            blocked = np.random.default_rng(None if seed is None else [seed, tile_row, tile_column, 1]).random((tile_size, tile_size)) < obstacle_density
+
+            # the padding outside the map is blocked, the start and end points are free
+            blocked[max(0, rows - tile_row * tile_size):, :] = True
+            blocked[:, max(0, columns - tile_column * tile_size):] = True
+            for row, column in (start_point, end_point):
+                if (row // tile_size, column // tile_size) == (tile_row, tile_column):
+                    blocked[row % tile_size, column % tile_size] = False
+
+            weights = area_weights[terrain]
+            if (~blocked).any():
+                tile_cheapest = int(weights[~blocked].min())
+                cheapest_weight = tile_cheapest if cheapest_weight is None else min(cheapest_weight, tile_cheapest)
+
+            with open(tile_file(directory, tile_row, tile_column), "wb") as f:
+                f.write(weights.tobytes())
+                f.write(terrain.tobytes())
+                f.write(blocked.astype(np.uint8).tobytes())
+
+    write_metadata(directory, rows, columns, tile_size, areas, max(cheapest_weight or 1, 1), start_point, end_point)
+
+
+def parse_cell(text):
+    row, column = text.split(",")
+    return (int(row), int(column))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate tiled maps and search them with a bounded tile cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a random tiled map, one tile at a time")
+    generate.add_argument("directory")
+    generate.add_argument("--rows", type=int, required=True)
+    generate.add_argument("--columns", type=int, required=True)
+    generate.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE, help="the number of rows and columns of a tile")
+    generate.add_argument("--obstacle-density", type=float, default=0.0, help="the fraction of the cells that are obstacles")
+    generate.add_argument("--seed", type=int, default=None)
+
+    path = commands.add_parser("path", help="find a shortest path on a tiled map")
+    path.add_argument("directory")
+    path.add_argument("--source", type=parse_cell, default=None, help="the start cell as row,column (defaults to the start point of the map)")
+    path.add_argument("--target", type=parse_cell, default=None, help="the end cell as row,column (defaults to the end point of the map)")
+    path.add_argument("--algorithm", choices=ALGORITHMS, default="astar")
+    path.add_argument("--max-tiles", type=int, default=DEFAULT_MAX_TILES, help="the number of tiles that the tile cache keeps in memory")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "generate":
+        start_time = time.perf_counter()
+        generate_tiled_map(args.directory, args.rows, args.columns, args.tile_size, obstacle_density=args.obstacle_density, seed=args.seed)
+        print(f"Wrote a {args.rows}x{args.columns} tiled map to {args.directory} in {time.perf_counter() - start_time:.2f} s")
+        return 0
+
+    tiled_map = TiledMap(args.directory, args.max_tiles)
+
+    try:
+        result = tiled_map.shortest_path(args.source, args.target, args.algorithm)
+    except NoPathError as error:
+        print(error)
+        return 1
+
+    stats = tiled_map.cache.stats()
+    print(f"{args.algorithm}: cost {result.cost}, {len(result.path)} cells, {result.stats.expanded} expanded cells, {result.stats.seconds:.2f} s")
+    print(f"Tile cache: {stats['loads']} tiles loaded ({stats['load_seconds']:.2f} s), {stats['evictions']} evicted, {stats['tiles']}/{stats['max_tiles']} in memory ({stats['resident_bytes'] / 2 ** 20:.1f} MiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
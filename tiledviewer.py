@@ -0,0 +1,262 @@
+'''
+@Author: Spyros Tsattalios
+
+A window that shows a tiled map (see tiledmap.py) and finds paths on it.
+
+The map can be far bigger than the memory, so the window never draws all of it. The canvas has the size of the whole map
+(as its scroll region) but it only holds one image per visible tile: when the view moves, the tiles that came into view are
+read through the tile cache and drawn, and the images of the tiles that left the view are deleted. A path is drawn into
+the images of the tiles that it crosses, so it is only drawn where it is visible too.
+
+The window reads its tiles through its own TiledMap, and the searches (on a SearchWorker thread) through another one, so
+the two threads never share a tile cache.
+'''
+
+from tiledmap import TiledMap, DEFAULT_MAX_TILES
+from engine import NoPathError
+from worker import SearchWorker
+import tkinter as tk
+
+
+class TiledMapViewer(object):
+
+    '''
+    A tk.Toplevel with the visible tiles of a tiled map. A left click sets the start point, a right click the end point.
+    '''
+
+    def __init__(self, parent, directory, colors, obstacle_color="#000000", path_color="#FFFF00", point_color="#FFFFFF", font=("Arial", 10), bg="white", fg="black", cell_size=4, max_tiles=DEFAULT_MAX_TILES, width=800, height=600, poll_interval=50):
+
+        self.view_map = TiledMap(directory, max_tiles)  # the tiles that the window draws
+        self.search_map = TiledMap(directory, max_tiles)  # the tiles that the searches read
+
+        # the color of every type of area, of the obstacles and of the path, as PPM pixels
+        self.palette = [bytes.fromhex(colors.get(area["type"], "#808080").lstrip("#")) for area in self.view_map.areas]
+        self.obstacle_pixel = bytes.fromhex(obstacle_color.lstrip("#"))
+        self.path_pixel = bytes.fromhex(path_color.lstrip("#"))
+        self.point_color = point_color
+
+        self.cell_size = cell_size
+        self.poll_interval = poll_interval
+
+        self.source = self.view_map.start_point
+        self.target = self.view_map.end_point
+        self.path_by_tile = {}  # (tile row, tile column) -> the cells of the path in that tile
+        self.images = {}  # (tile row, tile column) -> (canvas item, PhotoImage) of the visible tiles
+        self.worker = None
+        self.render_id = None
+
+        self.window = tk.Toplevel(parent, bg=bg)
+        self.window.title(f"Tiled map {self.view_map.rows}x{self.view_map.columns}")
+
+        map_width = cell_size * self.view_map.columns
+        map_height = cell_size * self.view_map.rows
+
+        self.canvas = tk.Canvas(self.window, width=min(width, map_width), height=min(height, map_height), bg=bg, highlightthickness=0, scrollregion=(0, 0, map_width, map_height))
+        self.canvas.grid(row=0, column=0, columnspan=3, sticky="nsew")
+
+        # the scrollbars move the canvas and then draw the tiles that came into view
+        x_scrollbar = tk.Scrollbar(self.window, orient="horizontal", command=lambda *args: self.scroll(self.canvas.xview, *args))
+        x_scrollbar.grid(row=1, column=0, columnspan=3, sticky="we")
+        y_scrollbar = tk.Scrollbar(self.window, orient="vertical", command=lambda *args: self.scroll(self.canvas.yview, *args))
+        y_scrollbar.grid(row=0, column=3, sticky="ns")
+        self.canvas.configure(xscrollcommand=x_scrollbar.set, yscrollcommand=y_scrollbar.set)
+
+        self.canvas.bind("<Configure>", lambda event: self.schedule_render())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self.on_wheel)
+        self.canvas.bind("<Button-1>", lambda event: self.set_point(event, "source"))
+        self.canvas.bind("<Button-3>", lambda event: self.set_point(event, "target"))
+
+        self.find_button = tk.Button(self.window, text="Find path", font=font, command=self.find_path)
+        self.find_button.grid(row=2, column=0, padx=5, pady=5)
+        self.cancel_button = tk.Button(self.window, text="Cancel", font=font, command=self.cancel, state="disabled")
+        self.cancel_button.grid(row=2, column=1, padx=5, pady=5)
+
+        self.status_label = tk.Label(self.window, text="Left click: start point, right click: end point", font=font, bg=bg, fg=fg, justify="left")
+        self.status_label.grid(row=3, column=0, columnspan=3, padx=5, pady=5)
+
+        self.window.rowconfigure(0, weight=1)
+        self.window.columnconfigure(2, weight=1)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.render()
+
+
+    def scroll(self, view, *args):
+        view(*args)
+        self.schedule_render()
+
+
+    def on_wheel(self, event):
+        self.scroll(self.canvas.yview, "scroll", -3 if event.num == 4 or getattr(event, "delta", 0) > 0 else 3, "units")
+
+
+    def schedule_render(self):
+        # many scroll events can arrive before the next redraw, the tiles are only drawn once for all of them
+        if self.render_id is None:
+            self.render_id = self.window.after_idle(self.render)
+
+
+    def visible_tiles(self):
+
+        tiled_map = self.view_map
+        tile_pixels = tiled_map.tile_size * self.cell_size
+
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        right, bottom = self.canvas.canvasx(self.canvas.winfo_width()), self.canvas.canvasy(self.canvas.winfo_height())
+
+        tile_rows = range(max(0, int(top // tile_pixels)), min(tiled_map.tile_rows, int(bottom // tile_pixels) + 1))
+        tile_columns = range(max(0, int(left // tile_pixels)), min(tiled_map.tile_columns, int(right // tile_pixels) + 1))
+
+        return {(tile_row, tile_column) for tile_row in tile_rows for tile_column in tile_columns}
+
+
+    def render(self):
+
+        self.render_id = None
+        visible = self.visible_tiles()
+
+        # Let's delete the tiles that left the view and draw the tiles that came into it
+        for key in list(self.images):
+            if key not in visible:
+                self.canvas.delete(self.images.pop(key)[0])
+
+        for key in sorted(visible):
+            if key not in self.images:
+                self.draw_tile(key)
+
+        self.draw_points()
+
+
+    def draw_tile(self, key):
+
+        tiled_map = self.view_map
+        tile_size = tiled_map.tile_size
+        tile = tiled_map.tile(*key)
+
+        top, left = key[0] * tile_size, key[1] * tile_size
+        height, width = min(tile_size, tiled_map.rows - top), min(tile_size, tiled_map.columns - left)
+
+        # Let's build the tile as a binary PPM image (one pixel per cell) without the padding of the edge tiles
+        palette, obstacle_pixel = self.palette, self.obstacle_pixel
+        pixels = bytearray()
+        for row in range(height):
+            start = row * tile_size
+            pixels += b"".join([obstacle_pixel if blocked else palette[area] for area, blocked in zip(tile.terrain[start:start + width], tile.blocked[start:start + width])])
+
+        for row, column in self.path_by_tile.get(key, ()):
+            offset = 3 * ((row - top) * width + column - left)
+            pixels[offset:offset + 3] = self.path_pixel
+
+        image = tk.PhotoImage(data=f"P6 {width} {height} 255 ".encode() + bytes(pixels), format="PPM")
+        if self.cell_size > 1:
+            image = image.zoom(self.cell_size)
+
+        item = self.canvas.create_image(left * self.cell_size, top * self.cell_size, image=image, anchor="nw")
+        self.images[key] = (item, image)
+
+
+    def draw_points(self):
+
+        self.canvas.delete("point")
+        size = max(self.cell_size, 3)
+
+        for cell in (self.source, self.target):
+            if cell is not None:
+                x, y = (cell[1] + 0.5) * self.cell_size, (cell[0] + 0.5) * self.cell_size
+                self.canvas.create_oval(x - size, y - size, x + size, y + size, outline=self.point_color, width=2, tags="point")
+
+
+    def set_point(self, event, name):
+
+        if self.worker is not None:
+            return  # the points cannot move while a search is running
+
+        cell = (int(self.canvas.canvasy(event.y)) // self.cell_size, int(self.canvas.canvasx(event.x)) // self.cell_size)
+        if not self.view_map.is_free(cell):
+            return
+
+        setattr(self, name, cell)
+        self.draw_points()
+
+
+    def show_path(self, path):
+        '''
+        This function will draw the path again on the visible tiles that it crosses (the old path too, to erase it).
+        '''
+
+        tile_size = self.view_map.tile_size
+        redraw = set(self.path_by_tile)
+
+        self.path_by_tile = {}
+        for cell in path:
+            self.path_by_tile.setdefault((cell[0] // tile_size, cell[1] // tile_size), []).append(cell)
+        redraw.update(self.path_by_tile)
+
+        for key in redraw:
+            if key in self.images:
+                self.canvas.delete(self.images.pop(key)[0])
+        self.render()
+
+
+    def find_path(self):
+
+        if self.source is None or self.target is None:
+            self.status_label.configure(text="Choose the start point and the end point first")
+            return
+
+        source, target = self.source, self.target
+        self.worker = SearchWorker([("A*", lambda: self.search_map.shortest_path(source, target, "astar"))])
+        self.search_map.set_cancel_event(self.worker.cancel_event)
+
+        self.find_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.status_label.configure(text=f"Searching from {source} to {target}...")
+
+        self.worker.start()
+        self.window.after(self.poll_interval, self.poll)
+
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.configure(state="disabled")
+
+
+    def poll(self):
+
+        if self.worker is None:
+            return  # the window was closed
+
+        for job in self.worker.poll():
+            if job.cancelled:
+                self.status_label.configure(text="The search was cancelled")
+            elif isinstance(job.error, NoPathError):
+                self.status_label.configure(text=str(job.error))
+            elif job.error is not None:
+                self.status_label.configure(text=f"The search failed: {job.error}")
+            else:
+                result = job.result
+                stats = self.search_map.cache.stats()
+                self.status_label.configure(text=(
+                    f"Cost: {result.cost}, {len(result.path)} cells, {result.stats.expanded} expanded cells in {result.stats.seconds:.2f} s\n"
+                    f"Tile cache: {stats['loads']} tiles loaded, {stats['evictions']} evicted, {stats['tiles']}/{stats['max_tiles']} in memory ({stats['resident_bytes'] / 2 ** 20:.1f} MiB)"))
+                self.show_path(result.path)
+
+        if not self.worker.finished:
+            self.window.after(self.poll_interval, self.poll)
+            return
+
+        self.worker = None
+        self.find_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+
+
+    def close(self):
+
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+        self.view_map.close()
+        self.window.destroy()
@@ -0,0 +1,105 @@
+'''
+@Author: Spyros Tsattalios
+
+Runs the searches of the game on a background thread, so the Tk event loop keeps running while they work.
+
+The GUI gives the worker a list of named jobs and polls it with root.after(). Every finished job is put in a queue, so the
+GUI can show each result as soon as it is ready. Tk widgets must only be touched by the main thread, so the worker never
+calls the GUI; it only fills the queue.
+'''
+
+from search import SearchCancelled
+import threading
+import queue
+import time
+
+
+class JobResult(object):
+
+    '''
+    The outcome of a single job: either its result or the exception that it raised.
+    '''
+
+    def __init__(self, name, result=None, error=None, seconds=0.0):
+        self.name = name
+        self.result = result
+        self.error = error  # None if the job succeeded
+        self.seconds = seconds
+
+
+    @property
+    def cancelled(self):
+        return isinstance(self.error, SearchCancelled)
+
+
+class SearchWorker(object):
+
+    '''
+    Runs (name, function) jobs one after the other on a daemon thread.
+
+    cancel() stops the worker: the job that is running stops at its next check of the cancel event (see
+    Solver.set_cancel_event) and the jobs after it are not started.
+    '''
+
+    def __init__(self, jobs):
+
+        self.jobs = list(jobs)
+        self.results = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.finished = False  # True after poll() has returned the last result
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+    def run(self):
+
+        for name, function in self.jobs:
+            if self.cancel_event.is_set():
+                self.results.put(JobResult(name, error=SearchCancelled("The search was cancelled")))
+                break
+
+            start_time = time.perf_counter()
+            try:
+                result = JobResult(name, result=function())
+            except Exception as error:  # the error is reported to the main thread instead of killing the worker
+                result = JobResult(name, error=error)
+            result.seconds = time.perf_counter() - start_time
+
+            self.results.put(result)
+            if result.error is not None:
+                break
+
+        self.results.put(None)  # the end of the jobs
+
+
+    def poll(self):
+        '''
+        @return: the list of the JobResults that finished since the last call (it never blocks)
+        '''
+
+        finished_jobs = []
+
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if result is None:
+                self.finished = True
+            else:
+                finished_jobs.append(result)
+
+        return finished_jobs